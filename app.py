@@ -1,13 +1,29 @@
 import streamlit as st
-import tensorflow as tf
-from tensorflow import keras
-import numpy as np
-from PIL import Image
 import json
-import cv2
-import base64
-from pathlib import Path
-import requests
+import os
+import tempfile
+import time
+from PIL import UnidentifiedImageError
+from cascade import CASCADE, Cascade, cascade_version, load_student
+from field_analysis import TILE_SIZE, TILE_STRIDE, analyze_field, field_preview, heatmap_overlay
+from inference import BACKEND, backend_model_path, load_backend, model_version, predict_diseases
+from metrics import CACHE_LOOKUPS, MODEL_LOAD_SECONDS, STAGES, record_stages, stage_timer, start_metrics_server
+from model_loader import BACKGROUND_LOAD, BackgroundLoader, start_health_server
+from model_registry import ModelRegistry, ModelWatcher, smoke_test
+from near_duplicates import NearDuplicateIndex, perceptual_hash
+from page_html import (DISEASE_INFO_HTML, FOOTER_HTML, HEADER_HTML, PAGE_CSS, WEATHER_WIDGET_HTML,
+                       prediction_card_html, probability_cards_html)
+from prediction_cache import PredictionCache, cache_key, image_digest
+from prediction_log import LOG_DIR, PredictionLog
+from quality_gate import QualityGate
+from preprocessing import load_image
+from similar_cases import load_similar_cases
+from tta import tta_version, with_tta
+from video_analysis import SAMPLE_FPS, VIDEO_TYPES, analyze_video
+from worker_pool import WORKERS, WorkerPool
+
+# Show per-stage timings under the results (also enabled with ?debug=1)
+DEBUG_PANEL = os.environ.get("RICE_DEBUG_PANEL") == "1"
 
 # Page configuration
 st.set_page_config(
@@ -17,635 +33,474 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# Custom CSS with modern design
-st.markdown("""
-    <style>
-    /* Import Google Fonts */
-    @import url('https://fonts.googleapis.com/css2?family=Playfair+Display:wght@700;900&family=Inter:wght@300;400;500;600;700&display=swap');
-    
-    /* Global Styles */
-    .stApp {
-        background: #0B1D26;
-    }
-    
-    /* Hide Streamlit branding */
-    #MainMenu {visibility: hidden;}
-    footer {visibility: hidden;}
-    header {visibility: hidden;}
-    
-    /* Hero Section */
-    .hero-section {
-        position: relative;
-        width: 115%;
-        height: 100vh;
-        min-height: 800px;
-        overflow: hidden;
-        background: linear-gradient(330.24deg, rgba(11, 29, 38, 0.4) 31.06%, #0B1D26 108.93%),
-                    url('https://images.unsplash.com/photo-1574943320219-553eb213f72d?w=1920&h=1200&fit=crop') center/cover;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        margin: -6rem -5rem 2rem -5rem;
-        padding: 0;
-    }
-    
-    .hero-overlay {
-        position: absolute;
-        top: 0;
-        left: 0;
-        width: 100%;
-        height: 100%;
-        background: linear-gradient(180deg, rgba(11, 29, 38, 0.3) 0%, rgba(11, 29, 38, 0.8) 100%);
-        z-index: 1;
-    }
-    
-    .hero-content {
-        position: relative;
-        z-index: 2;
-        max-width: 950px;
-        padding: 0 2rem;
-        animation: fadeInUp 1s ease-out;
-    }
-    
-    @keyframes fadeInUp {
-        from {
-            opacity: 0;
-            transform: translateY(30px);
-        }
-        to {
-            opacity: 1;
-            transform: translateY(0);
-        }
-    }
-    
-    .hero-badge {
-        display: inline-block;
-        padding: 8px 20px;
-        background: rgba(255, 255, 255, 0.1);
-        backdrop-filter: blur(10px);
-        border-radius: 50px;
-        color: #FBD784;
-        font-size: 0.9rem;
-        font-weight: 600;
-        letter-spacing: 3px;
-        text-transform: uppercase;
-        margin-bottom: 2rem;
-        border: 1px solid rgba(251, 215, 132, 0.3);
-    }
-    
-    .hero-title {
-        font-family: 'Playfair Display', serif;
-        font-size: 5rem;
-        font-weight: 900;
-        color: #FFFFFF;
-        line-height: 1.1;
-        margin: 0 0 1.5rem 0;
-        text-shadow: 2px 4px 20px rgba(0, 0, 0, 0.5);
-    }
-    
-    .hero-subtitle {
-        font-family: 'Inter', sans-serif;
-        font-size: 1.3rem;
-        font-weight: 300;
-        color: rgba(255, 255, 255, 0.8);
-        line-height: 1.6;
-        margin-bottom: 2.5rem;
-        max-width: 700px;
-    }
-    
-    .hero-button {
-        display: inline-block;
-        padding: 16px 40px;
-        background: linear-gradient(135deg, #FBD784 0%, #F4A261 100%);
-        color: #0B1D26;
-        font-family: 'Inter', sans-serif;
-        font-size: 1.1rem;
-        font-weight: 700;
-        text-decoration: none;
-        border-radius: 8px;
-        transition: all 0.3s ease;
-        box-shadow: 0 10px 30px rgba(251, 215, 132, 0.3);
-        cursor: pointer;
-        border: none;
-    }
-    
-    .hero-button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 15px 40px rgba(251, 215, 132, 0.5);
-    }
-    
-    /* Scroll Indicator */
-    .scroll-indicator {
-        position: absolute;
-        bottom: 40px;
-        left: 50%;
-        transform: translateX(-50%);
-        z-index: 3;
-        animation: bounce 2s infinite;
-    }
-    
-    @keyframes bounce {
-        0%, 20%, 50%, 80%, 100% {
-            transform: translateX(-50%) translateY(0);
-        }
-        40% {
-            transform: translateX(-50%) translateY(-10px);
-        }
-        60% {
-            transform: translateX(-50%) translateY(-5px);
-        }
-    }
-    
-    .scroll-text {
-        color: rgba(255, 255, 255, 0.6);
-        font-size: 0.8rem;
-        letter-spacing: 2px;
-        text-transform: uppercase;
-        margin-bottom: 10px;
-    }
-    
-    /* Main Content Section */
-    .main-content {
-        max-width: 1400px;
-        margin: 0 auto;
-        padding: 4rem 2rem;
-    }
-    
-    .section-title {
-        font-family: 'Playfair Display', serif;
-        font-size: 3.5rem;
-        font-weight: 700;
-        color: #FFFFFF;
-        text-align: center;
-        margin-bottom: 1rem;
-    }
-    
-    .section-subtitle {
-        font-family: 'Inter', sans-serif;
-        font-size: 1.2rem;
-        color: rgba(255, 255, 255, 0.6);
-        text-align: center;
-        margin-bottom: 4rem;
-    }
-    
-    /* Upload Section */
-    .upload-container {
-        background: rgba(255, 255, 255, 0.05);
-        backdrop-filter: blur(20px);
-        border-radius: 20px;
-        padding: 3rem;
-        border: 1px solid rgba(255, 255, 255, 0.1);
-        box-shadow: 0 20px 60px rgba(0, 0, 0, 0.3);
-        margin-bottom: 3rem;
-    }
-    
-    /* Prediction Card */
-    .prediction-card {
-        background: linear-gradient(135deg, rgba(251, 215, 132, 0.1) 0%, rgba(244, 162, 97, 0.1) 100%);
-        backdrop-filter: blur(20px);
-        border-radius: 20px;
-        padding: 2.5rem;
-        border: 1px solid rgba(251, 215, 132, 0.2);
-        box-shadow: 0 20px 60px rgba(0, 0, 0, 0.3);
-        margin: 2rem 0;
-    }
-    
-    .prediction-label {
-        font-family: 'Inter', sans-serif;
-        font-size: 0.9rem;
-        font-weight: 600;
-        color: #FBD784;
-        letter-spacing: 2px;
-        text-transform: uppercase;
-        margin-bottom: 1rem;
-    }
-    
-    .prediction-disease {
-        font-family: 'Playfair Display', serif;
-        font-size: 2.5rem;
-        font-weight: 700;
-        color: #FFFFFF;
-        margin-bottom: 1rem;
-    }
-    
-    .confidence-badge {
-        display: inline-block;
-        padding: 8px 20px;
-        background: rgba(251, 215, 132, 0.2);
-        border-radius: 50px;
-        color: #FBD784;
-        font-size: 1.1rem;
-        font-weight: 600;
-    }
-    
-    
-    /* Stats Grid */
-.stats-grid {
-    display: grid;
-    grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
-    gap: 1.5rem; 
-    margin: 1.5rem 0; 
-}
-
-.stat-card {
-    background: rgba(255, 255, 255, 0.05);
-    backdrop-filter: blur(20px);
-    border-radius: 15px;
-    padding: 2rem;
-    border: 1px solid rgba(255, 255, 255, 0.1);
-    text-align: center;
-    transition: all 0.3s ease;
-}
-
-.stat-card:hover {
-    transform: translateY(-5px);
-    border-color: rgba(251, 215, 132, 0.5);
-}
-
-.stat-number {
-    font-family: 'Playfair Display', serif;
-    font-size: 3rem;
-    font-weight: 700;
-    color: #FBD784;
-    margin-bottom: 0.5rem;
-}
-
-.stat-label {
-    font-family: 'Inter', sans-serif;
-    font-size: 1rem;
-    color: rgba(255, 255, 255, 0.7);
-}
-
-    /* Disease Cards */
-    .disease-grid {
-    display: grid;
-    grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-    row-gap: 1.5rem; 
-    column-gap: 1.5rem; 
-    margin: 4rem 0 1.5rem 0; 
-}
+# Custom CSS with modern design, minified once per process (see page_html.py)
+st.markdown(PAGE_CSS, unsafe_allow_html=True)
 
-    
-    .disease-card {
-        background: rgba(255, 255, 255, 0.05);
-        backdrop-filter: blur(20px);
-        border-radius: 12px;
-        padding: 1.5rem;
-        border: 1px solid rgba(255, 255, 255, 0.1);
-        transition: all 0.3s ease;
-        cursor: pointer;
-    }
-    
-    .disease-card:hover {
-        border-color: #FBD784;
-        transform: scale(1.05);
-    }
-    
-    .disease-name {
-        font-family: 'Inter', sans-serif;
-        font-size: 1rem;
-        font-weight: 600;
-        color: #FFFFFF;
-        margin-bottom: 0.5rem;
-    }
-    
-    .disease-prob {
-        font-size: 0.9rem;
-        color: #FBD784;
-        font-weight: 600;
-    }
-    
-    /* Progress Bar */
-    .custom-progress {
-        width: 100%;
-        height: 8px;
-        background: rgba(255, 255, 255, 0.1);
-        border-radius: 10px;
-        overflow: hidden;
-        margin-top: 0.5rem;
-    }
-    
-    .progress-fill {
-        height: 100%;
-        background: linear-gradient(90deg, #FBD784 0%, #F4A261 100%);
-        border-radius: 10px;
-        transition: width 1s ease;
-    }
-    
-    /* Streamlit Override */
-    .stButton button {
-        background: linear-gradient(135deg, #FBD784 0%, #F4A261 100%);
-        color: #0B1D26;
-        font-family: 'Inter', sans-serif;
-        font-size: 1.1rem;
-        font-weight: 700;
-        border: none;
-        border-radius: 8px;
-        padding: 16px 40px;
-        width: 100%;
-        transition: all 0.3s ease;
-        box-shadow: 0 10px 30px rgba(251, 215, 132, 0.3);
-    }
-    
-    .stButton button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 15px 40px rgba(251, 215, 132, 0.5);
-    }
-    
-    /* File Uploader */
-    [data-testid="stFileUploader"] {
-        background: rgba(255, 255, 255, 0.05);
-        border: 2px dashed rgba(251, 215, 132, 0.3);
-        border-radius: 15px;
-        padding: 2rem;
-    }
-    
-    [data-testid="stFileUploader"]:hover {
-        border-color: #FBD784;
-    }
-    
-    /* Alert Boxes */
-    .stAlert {
-        background: rgba(251, 215, 132, 0.1);
-        border: 1px solid rgba(251, 215, 132, 0.3);
-        border-radius: 12px;
-        color: #FFFFFF;
-    }
-    
-    /* Responsive */
-    @media (max-width: 768px) {
-        .hero-title {
-            font-size: 3rem;
-        }
-        .hero-subtitle {
-            font-size: 1.1rem;
-        }
-        .section-title {
-            font-size: 2.5rem;
-        }
-    }
-    /* Disease link hover */
-    .disease-link:hover h5 {
-        text-decoration: underline;
-        color: #F4A261;
-    }
-    </style>
-""", unsafe_allow_html=True)
-
-# Load model and class names
-@st.cache_resource
+# Load a model version and its class names; raises if the model fails the smoke test
+def load_model_bundle(model_path, class_names_path, version):
+    with open(class_names_path, 'r') as f:
+        class_names = json.load(f)
+    start = time.perf_counter()
+    if WORKERS:
+        # Worker-pool mode: inference runs in separate core-pinned processes
+        model = None
+        pool = WorkerPool(WORKERS, len(class_names), BACKEND, model_path=model_path)
+        predict_fn = pool.predict
+        _worker_pools[predict_fn] = pool
+    else:
+        model, predict_fn = load_backend(BACKEND, model_path)
+    try:
+        smoke_test(predict_fn, len(class_names))
+    except Exception:
+        close_model_bundle((model, class_names, predict_fn, version, None))
+        raise
+    MODEL_LOAD_SECONDS.labels(BACKEND).set(time.perf_counter() - start)
+    # Reference index of confirmed cases (see similar_cases.py); None when not built
+    similar_cases = load_similar_cases(model, model_version(model_path))
+    if CASCADE:
+        # The distilled student answers confident images; the loaded model handles the rest
+        cascade_fn = Cascade(load_student(), predict_fn).predict
+        if predict_fn in _worker_pools:
+            _worker_pools[cascade_fn] = _worker_pools.pop(predict_fn)
+        predict_fn = cascade_fn
+        version = cascade_version(version)
+    return model, class_names, predict_fn, version, similar_cases
+
+# Worker pools by the predict_fn of the model bundle they serve
+_worker_pools = {}
+
+def close_model_bundle(bundle):
+    """Stop the worker processes of a model that was swapped out"""
+    pool = _worker_pools.pop(bundle[2], None)
+    if pool is not None:
+        pool.stop()
+
+def worker_pool_health():
+    """Readiness of the worker pools in use: unhealthy once a worker is down for good"""
+    pools = [pool.health() for pool in list(_worker_pools.values())]
+    return {"healthy": all(pool["healthy"] for pool in pools), "worker_pools": pools}
+
+# The model being served: the registry's active version, hot-swapped when another one
+# is activated (see model_registry.py), or the files next to app.py without a registry
 def load_model_and_classes():
+    registry = ModelRegistry()
+    if not registry.exists():
+        registry = None
+    return ModelWatcher(load_model_bundle, registry, close_fn=close_model_bundle).start()
+
+# Model loading starts on the first page run and is shared by all sessions;
+# TensorFlow is only imported inside this background thread
+@st.cache_resource
+def get_model_loader():
+    loader = BackgroundLoader(load_model_and_classes).start()
+    start_health_server(loader, health_fn=worker_pool_health)
+    return loader
+
+# Prometheus endpoint, started once per server process when RICE_METRICS_PORT is set
+@st.cache_resource
+def metrics_server():
+    return start_metrics_server()
+
+# Prediction cache shared by all sessions, so reruns and repeat uploads skip the model
+@st.cache_resource
+def get_prediction_cache():
+    return PredictionCache()
+
+# Parquet log of every prediction the model makes, when RICE_PREDICTION_LOG is set
+@st.cache_resource
+def get_prediction_log():
+    return PredictionLog() if LOG_DIR else None
+
+# Perceptual hashes of recent predictions, one index per model version
+@st.cache_resource(max_entries=2)
+def get_duplicate_index(version):
+    return NearDuplicateIndex()
+
+# Quality checks between decoding and the model, remembered per upload for reruns
+@st.cache_resource
+def get_quality_gate():
+    return QualityGate()
+
+def predict_uploaded_files(predict_fn, uploaded_files, class_names, version):
+    """Predict uploaded files, decoding only cache misses and running the model only for new, usable images.
+
+    Returns the results (None for an image the quality gate rejected),
+    per file the hash distance to the near-duplicate whose prediction was
+    reused (None if it wasn't), and per file the quality gate's
+    [(check, message)] reasons, and the images decoded on this run by
+    position. A file that can't be decoded gets no result and the reason
+    ("unreadable", message); the rest of the batch goes on. Every result
+    served is logged with its source: the model, the cache or a
+    near-duplicate.
+    """
+    cache = get_prediction_cache()
+    gate = get_quality_gate()
+    version = tta_version(version)
+    digests = [image_digest(uploaded_file.getvalue()) for uploaded_file in uploaded_files]
+    keys = [cache_key(None, version, digest) for digest in digests]
+    results = [cache.get(key) for key in keys]
+    sources = ["cache" if result is not None else None for result in results]
+    issues = [gate.recall(digest) for digest in digests]
+    near_duplicates = [None] * len(uploaded_files)
+    images = {}
+    CACHE_LOOKUPS.labels("hit").inc(sum(result is not None for result in results))
+    # Images the gate already rejected aren't decoded again, and cached predictions only if the gate
+    # hasn't seen them (e.g. from the disk cache)
+    to_decode = [i for i, result in enumerate(results)
+                 if (result is None and not (gate.rejects and issues[i])) or (gate.enabled and issues[i] is None)]
+    if to_decode:
+        with stage_timer("decode"):
+            for i in to_decode:
+                try:
+                    images[i] = load_image(uploaded_files[i])
+                except (UnidentifiedImageError, OSError, ValueError) as e:
+                    results[i] = None
+                    issues[i] = [("unreadable", f"could not be read as an image ({e})")]
+        to_decode = [i for i in to_decode if i in images]
+        for i in to_decode:
+            issues[i] = gate.check(images[i], digests[i])
+        missing = [i for i in to_decode if results[i] is None and not (gate.rejects and issues[i])]
+        duplicate_index = get_duplicate_index(version)
+        with stage_timer("dedupe"):
+            hashes = [perceptual_hash(images[i]) for i in missing]
+            matches = duplicate_index.match_batch(hashes)
+        new = [j for j, match in enumerate(matches) if match is None]
+        CACHE_LOOKUPS.labels("near_duplicate").inc(len(missing) - len(new))
+        CACHE_LOOKUPS.labels("miss").inc(len(new))
+        for j, result in zip(new, predict_diseases(with_tta(predict_fn), [images[missing[j]] for j in new], class_names)):
+            i = missing[j]
+            cache.put(keys[i], result)
+            duplicate_index.add(hashes[j], result)
+            results[i] = result
+            sources[i] = "model"
+        # Near-duplicates stay out of the exact cache, so they are flagged again on every rerun
+        for j, match in enumerate(matches):
+            if match is not None:
+                source, distance = match
+                results[missing[j]] = results[missing[source]] if isinstance(source, int) else source
+                near_duplicates[missing[j]] = distance
+                sources[missing[j]] = "duplicate"
+    # A byte-identical copy of an earlier file shares its cache entry, so it is only a cache hit on
+    # reruns; its digest alone shows it is a duplicate (distance 0) on every run
+    first_position = {}
+    for i, digest in enumerate(digests):
+        if first_position.setdefault(digest, i) != i and results[i] is not None and near_duplicates[i] is None:
+            near_duplicates[i] = 0
+    issues = [reasons or [] for reasons in issues]
+    if gate.rejects:
+        results = [None if reasons else result for result, reasons in zip(results, issues)]
+    prediction_log = get_prediction_log()
+    if prediction_log is not None:
+        for digest, result, source in zip(digests, results, sources):
+            if result is not None:
+                prediction_log.log(digest, result, version, class_names, source)
+    return results, near_duplicates, issues, images
+
+# Closest confirmed cases of the last few uploads, so reruns don't embed the image again
+@st.cache_data(max_entries=64, show_spinner=False)
+def find_similar_cases(key, _similar_cases, _load_image):
+    return _similar_cases.find(_load_image())
+
+# Tiled analyses of the last few field photos, so reruns don't classify every tile again
+@st.cache_data(max_entries=8, show_spinner=False)
+def analyze_field_upload(key, _predict_fn, _uploaded_file, _class_names):
+    with stage_timer("decode"):
+        image = load_image(_uploaded_file, target_size=None)
+    analysis = analyze_field(_predict_fn, image, _class_names)
+    analysis["preview"] = field_preview(image)
+    return analysis
+
+def render_field_analysis(analysis, class_names):
+    """Heatmap of one class over the field and the share of tiles per class"""
+    st.markdown("### 🗺️ Field Analysis")
+    summary = analysis["summary"]
+    st.caption(f"{summary['tiles']} tiles of {analysis['tile_size']}px · "
+               f"{summary['affected_share']:.1f}% of the field shows disease")
+    col1, col2 = st.columns([3, 2], gap="large")
+    with col2:
+        rows = [{"Disease": c["class"], "Share of Tiles (%)": round(c["tile_share"], 1),
+                 "Mean (%)": round(c["mean_probability"], 1), "Peak (%)": round(c["max_probability"], 1)}
+                for c in summary["classes"]]
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+        shown = st.selectbox("Heatmap for", [c["class"] for c in summary["classes"]])
+    with col1:
+        overlay = heatmap_overlay(analysis["preview"], analysis, class_names.index(shown))
+        st.image(overlay, caption=f"Probability of {shown} per tile", use_container_width=True)
+
+def is_video(filename):
+    return os.path.splitext(filename)[1].lower().lstrip(".") in VIDEO_TYPES
+
+# Video timelines, cached like field analyses; OpenCV reads videos from disk, so the upload is spilled to a temp file
+@st.cache_data(max_entries=8, show_spinner=False)
+def analyze_video_upload(key, _predict_fn, _uploaded_file, _class_names):
+    suffix = os.path.splitext(_uploaded_file.name)[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+        f.write(_uploaded_file.getvalue())
     try:
-        model = keras.models.load_model('rice_disease_classifier_final.keras')
-        with open('class_names.json', 'r') as f:
-            class_names = json.load(f)
-        return model, class_names
-    except Exception as e:
-        st.error(f"Error loading model: {e}")
-        return None, None
-
-def preprocess_image(image, target_size=(224, 224)):
-    """Preprocess uploaded image for prediction"""
-    img_array = np.array(image)
-    img_resized = cv2.resize(img_array, target_size)
-    img_normalized = img_resized / 255.0
-    img_batch = np.expand_dims(img_normalized, axis=0)
-    return img_batch
-
-def predict_disease(model, image, class_names):
-    """Make prediction on uploaded image"""
-    processed_image = preprocess_image(image)
-    predictions = model.predict(processed_image, verbose=0)
-    predicted_class_idx = np.argmax(predictions[0])
-    confidence = predictions[0][predicted_class_idx] * 100
-    
-    # Get all predictions sorted
-    all_predictions = [(class_names[i], predictions[0][i] * 100) for i in range(len(class_names))]
-    all_predictions.sort(key=lambda x: x[1], reverse=True)
-    
-    return class_names[predicted_class_idx], confidence, all_predictions
+        return analyze_video(_predict_fn, f.name, _class_names)
+    finally:
+        os.remove(f.name)
 
-# Main app
-def main():
-    # Hero Section
-    st.markdown("""
-        <div class="hero-section">
-            <div class="hero-overlay"></div>
-            <div class="hero-content">
-                <div class="hero-badge">🌾 AI-Powered Agriculture</div>
-                <h1 class="hero-title">Rice Leaf Disease<br/>Classifier</h1>
-                <h5><p class="hero-subtitle">
-                    Advanced deep learning technology to identify rice plant diseases instantly. 
-                    Upload a leaf image and get accurate diagnosis in seconds, helping farmers 
-                    protect their crops and increase yield.
-                </p></h5>
-                <a href="#upload-section" class="hero-button">Start Diagnosis →</a>
-            </div>
-            <div class="scroll-indicator">
-                <div class="scroll-text">Scroll Down</div>
-                <div style="text-align: center; font-size: 1.5rem; color: rgba(255,255,255,0.6);">↓</div>
-            </div>
-        </div>
-    """, unsafe_allow_html=True)
+def render_video_analysis(uploaded_video, predict_fn, class_names, version):
+    """Per-segment disease timeline of one video"""
+    st.markdown("---")
+    st.markdown(f"### 🎬 Video Timeline: {uploaded_video.name}")
+    key = f"{cache_key(uploaded_video.getvalue(), version)}-{SAMPLE_FPS}"
+    with st.spinner('🔄 Analyzing video frames...'):
+        try:
+            timeline, stats = analyze_video_upload(key, predict_fn, uploaded_video, class_names)
+        except ValueError as e:
+            st.error(f"⚠️ {e}")
+            return
+    if not timeline:
+        st.info("ℹ️ No frames could be read from this video")
+        return
+    st.caption(f"{stats['duration_seconds']:.0f}s of video · {stats['sampled']} frames sampled · "
+               f"{stats['duplicates']} near-duplicates reused · {stats['throughput_fps']:.0f} video frames/s end to end")
+    st.line_chart({name: [segment["probabilities"][name] for segment in timeline] for name in class_names})
+    rows = [{"Segment": f"{segment['start']:.0f}-{segment['end']:.0f}s", "Detected Disease": segment["predicted_class"],
+             "Confidence (%)": round(segment["confidence"], 1), "Frames Analysed": segment["analysed"]}
+            for segment in timeline]
+    st.dataframe(rows, use_container_width=True, hide_index=True)
+
+def render_similar_cases(similar):
+    """Show the closest confirmed cases from the reference index"""
+    st.markdown("#### 🔎 Most Similar Confirmed Cases")
+    for col, (label, path, similarity) in zip(st.columns(len(similar)), similar):
+        with col:
+            if os.path.exists(path):
+                st.image(path, use_container_width=True)
+            st.markdown(f"""
+                <div class="disease-card">
+                    <div class="disease-name">{label}</div>
+                    <div class="disease-prob">{similarity * 100:.0f}% similar</div>
+                </div>
+            """, unsafe_allow_html=True)
+
+def render_prediction(image, predicted_class, confidence, all_predictions, similar=None, version=None,
+                      near_duplicate=None, quality_issues=()):
+    """Render the analysis results for one image"""
+    col1, col2 = st.columns([1, 1], gap="large")
     
-    # Stats Section
-    st.markdown('<div class="main-content">', unsafe_allow_html=True)
+    with col1:
+        st.markdown("### 📸 Uploaded Image")
+        st.image(image, use_container_width=True)
     
-    st.markdown("""
-        <div class="stats-grid">
-            <div class="stat-card">
-                <div class="stat-number">7</div>
-                <div class="stat-label">Disease Types Detected</div>
-            </div>
-            <div class="stat-card">
-                <div class="stat-number">95%+</div>
-                <div class="stat-label">Accuracy Rate</div>
-            </div>
-            <div class="stat-card">
-                <div class="stat-number">&lt;2s</div>
-                <div class="stat-label">Analysis Time</div>
-            </div>
-            <div class="stat-card">
-                <div class="stat-number">24/7</div>
-                <div class="stat-label">Available</div>
-            </div>
-        </div>
-    """, unsafe_allow_html=True)
+    with col2:
+        st.markdown("### 🔬 Analysis Results")
+        
+        # Main Prediction Card
+        st.markdown(prediction_card_html(predicted_class, confidence), unsafe_allow_html=True)
+        
+        # Confidence indicator
+        if confidence > 80:
+            st.success("✅ High confidence detection")
+        elif confidence > 60:
+            st.warning("⚠️ Moderate confidence - consider retaking image")
+        else:
+            st.info("ℹ️ Low confidence - please upload a clearer image")
+        
+        if quality_issues:
+            st.warning(f"📷 Check the photo: {quality_message(quality_issues)}")
+        
+        if near_duplicate is not None:
+            st.info(f"♻️ Near-duplicate of an earlier image ({near_duplicate} of 64 hash bits differ), "
+                    "so its prediction was reused")
+        
+        if version:
+            st.caption(f"Model version {version}")
+    
+    # All Predictions
+    st.markdown("---")
+    st.markdown("### 📊 Detailed Analysis")
     
-    # Main Content Section
-    st.markdown('<div id="upload-section"></div>', unsafe_allow_html=True)
-    st.markdown('<h2 class="section-title">Upload & Analyze</h2>', unsafe_allow_html=True)
-    st.markdown('<p class="section-subtitle">Upload a clear image of a rice leaf to get instant disease detection</p>', unsafe_allow_html=True)
+    # One element for every class card instead of one per class
+    st.markdown(probability_cards_html(all_predictions), unsafe_allow_html=True)
     
-    # Load model
-    model, class_names = load_model_and_classes()
+    if similar:
+        render_similar_cases(similar)
     
-    if model is None:
-        st.error("⚠️ Model not found. Please ensure 'rice_disease_classifier_final.keras' is in the current directory.")
-        st.stop()
+    # Recommendations
+    st.markdown("---")
+    st.markdown("### 💡 Recommendations")
     
+    if predicted_class == "Healthy Rice Leaf":
+        st.success("""
+        **Great News! Your rice plant appears healthy.**
+        
+        ✅ Continue regular monitoring  
+        ✅ Maintain proper irrigation  
+        ✅ Follow standard fertilization schedule  
+        ✅ Keep the field clean and weed-free
+        """)
+    else:
+        st.warning(f"""
+        **Action Required: {predicted_class} Detected**
+        
+        ⚠️ **Immediate Steps:**
+        - Isolate affected plants if possible
+        - Consult with a local agricultural expert
+        - Consider appropriate fungicide/pesticide treatment
+        - Improve field drainage and ventilation
+        - Monitor surrounding plants closely
+        
+        📞 **Need Help?** Contact your local agricultural extension office for specific treatment recommendations.
+        """)
+
+@st.fragment(run_every=1)
+def render_model_loading(loader):
+    """Readiness indicator that reruns the page once the model has loaded"""
+    if loader.state != "loading":
+        st.rerun()
+    elapsed = loader.status()["load_seconds"] or 0
+    st.info(f"⏳ Loading the disease detection model ({elapsed:.0f}s)... uploads will be enabled as soon as it is ready.")
+
+def render_debug_panel(timings, version):
+    """Show how long each stage of this run took"""
+    with st.expander("🛠️ Debug: stage timings"):
+        rows = [{"Stage": stage, "Time (ms)": round(timings[stage] * 1000, 2)} for stage in STAGES if stage in timings]
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+        st.caption(f"Prediction cache: {get_prediction_cache().stats()}")
+        st.caption(f"Near-duplicate index: {get_duplicate_index(tta_version(version)).stats()}")
+        if get_prediction_log() is not None:
+            st.caption(f"Prediction log: {get_prediction_log().stats()}")
+
+def quality_message(quality_issues):
+    return "; ".join(message for _, message in quality_issues)
+
+def is_unreadable(quality_issues):
+    return any(check == "unreadable" for check, _ in quality_issues)
+
+def render_rejected(uploaded_file, quality_issues):
+    """Explain why an image was not analysed"""
+    if is_unreadable(quality_issues):
+        st.error(f"🚫 {uploaded_file.name} {quality_message(quality_issues)}. "
+                 "Please upload it again as a JPEG or PNG photo.")
+        return
+    col1, col2 = st.columns([1, 1], gap="large")
+    with col1:
+        st.image(uploaded_file, use_container_width=True)
+    with col2:
+        st.error(f"🚫 {uploaded_file.name} was not analysed: {quality_message(quality_issues)}. "
+                 "Please upload a sharp, well-lit close-up of a rice leaf.")
+
+def render_batch_results(uploaded_files, results, version, near_duplicates, quality_issues):
+    """Render a results table with one row per uploaded image"""
+    st.markdown("### 🗂️ Batch Results")
+    rows = []
+    for i, result in enumerate(results):
+        if result is None:
+            status = "Unreadable file" if is_unreadable(quality_issues[i]) else "Not analysed"
+            rows.append({"Image": uploaded_files[i].name, "Detected Disease": status,
+                         "Quality Issues": quality_message(quality_issues[i]), "Model Version": version})
+            continue
+        predicted_class, confidence, all_predictions = result
+        row = {"Image": uploaded_files[i].name, "Detected Disease": predicted_class, "Confidence (%)": round(float(confidence), 1)}
+        row.update({disease: round(float(prob), 1) for disease, prob in all_predictions})
+        row["Near Duplicate"] = near_duplicates[i] is not None
+        row["Quality Issues"] = quality_message(quality_issues[i])
+        row["Model Version"] = version
+        rows.append(row)
+    st.dataframe(rows, use_container_width=True, hide_index=True)
+
+def render_upload_section(model, class_names, predict_fn, version, similar_cases):
+    """Upload widget and analysis results, shown once the model is ready"""
     # Upload Section
     st.markdown('<div class="upload-container">', unsafe_allow_html=True)
     
-    uploaded_file = st.file_uploader(
-        "Choose a rice leaf image",
-        type=['jpg', 'jpeg', 'png'],
-        help="Upload a clear, well-lit image of a rice leaf"
+    uploaded_files = st.file_uploader(
+        "Choose rice leaf images or field videos",
+        type=['jpg', 'jpeg', 'png'] + VIDEO_TYPES,
+        accept_multiple_files=True,
+        help="Upload one or more clear, well-lit images of rice leaves, or walk-through videos of the field"
+    )
+    uploaded_videos = [f for f in uploaded_files if is_video(f.name)]
+    uploaded_files = [f for f in uploaded_files if not is_video(f.name)]
+    
+    field_mode = st.toggle(
+        "🗺️ Field mode",
+        help="For high-resolution drone or wide-angle shots: classify the image tile by tile and show a disease heatmap"
     )
     
     st.markdown('</div>', unsafe_allow_html=True)
     
-    if uploaded_file is not None:
-        col1, col2 = st.columns([1, 1], gap="large")
-        
-        with col1:
-            st.markdown("### 📸 Uploaded Image")
-            image = Image.open(uploaded_file)
-            st.image(image, use_container_width=True)
-        
-        with col2:
-            st.markdown("### 🔬 Analysis Results")
-            
-            with st.spinner('🔄 Analyzing image...'):
-                predicted_class, confidence, all_predictions = predict_disease(
-                    model, image, class_names
-                )
-            
-            # Main Prediction Card
-            st.markdown(f"""
-                <div class="prediction-card">
-                    <div class="prediction-label">Detected Disease</div>
-                    <div class="prediction-disease">{predicted_class}</div>
-                    <span class="confidence-badge">{confidence:.1f}% Confidence</span>
-                </div>
-            """, unsafe_allow_html=True)
+    if uploaded_files or uploaded_videos:
+        with record_stages() as timings:
+            if uploaded_files:
+                with st.spinner('🔄 Analyzing image...' if len(uploaded_files) == 1 else f'🔄 Analyzing {len(uploaded_files)} images...'):
+                    results, near_duplicates, quality_issues, decoded = predict_uploaded_files(
+                        predict_fn, uploaded_files, class_names, version)
+                
+                with stage_timer("render"):
+                    if len(uploaded_files) > 1:
+                        render_batch_results(uploaded_files, results, version, near_duplicates, quality_issues)
+                        st.markdown("---")
+                        selected = st.selectbox(
+                            "Show detailed analysis for",
+                            range(len(uploaded_files)),
+                            format_func=lambda i: uploaded_files[i].name
+                        )
+                    else:
+                        selected = 0
+                    
+                    if results[selected] is None:
+                        render_rejected(uploaded_files[selected], quality_issues[selected])
+                    else:
+                        similar = None
+                        if similar_cases is not None:
+                            # Keyed by content and model, decoding only if this run didn't decode the upload already
+                            similar = find_similar_cases(
+                                cache_key(uploaded_files[selected].getvalue(), version), similar_cases,
+                                lambda: decoded[selected] if selected in decoded else load_image(uploaded_files[selected]))
+                        render_prediction(uploaded_files[selected], *results[selected], similar=similar, version=version,
+                                          near_duplicate=near_duplicates[selected], quality_issues=quality_issues[selected])
+                
+                if field_mode and results[selected] is not None:
+                    key = f"{cache_key(uploaded_files[selected].getvalue(), version)}-{TILE_SIZE}-{TILE_STRIDE}"
+                    with st.spinner('🔄 Analyzing the field tile by tile...'):
+                        analysis = analyze_field_upload(key, predict_fn, uploaded_files[selected], class_names)
+                    render_field_analysis(analysis, class_names)
             
-            # Confidence indicator
-            if confidence > 80:
-                st.success("✅ High confidence detection")
-            elif confidence > 60:
-                st.warning("⚠️ Moderate confidence - consider retaking image")
-            else:
-                st.info("ℹ️ Low confidence - please upload a clearer image")
-        
-        # All Predictions
-        st.markdown("---")
-        st.markdown("### 📊 Detailed Analysis")
-        
-        st.markdown('<div class="disease-grid">', unsafe_allow_html=True)
-        for disease, prob in all_predictions:
-            st.markdown(f"""
-                <div class="disease-card">
-                    <div class="disease-name">{disease}</div>
-                    <div class="disease-prob">{prob:.1f}%</div>
-                    <div class="custom-progress">
-                        <div class="progress-fill" style="width: {prob}%"></div>
-                    </div>
-                </div>
-            """, unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-        
-        # Recommendations
-        st.markdown("---")
-        st.markdown("### 💡 Recommendations")
+            for uploaded_video in uploaded_videos:
+                render_video_analysis(uploaded_video, predict_fn, class_names, version)
         
-        if predicted_class == "Healthy Rice Leaf":
-            st.success("""
-            **Great News! Your rice plant appears healthy.**
-            
-            ✅ Continue regular monitoring  
-            ✅ Maintain proper irrigation  
-            ✅ Follow standard fertilization schedule  
-            ✅ Keep the field clean and weed-free
-            """)
-        else:
-            st.warning(f"""
-            **Action Required: {predicted_class} Detected**
-            
-            ⚠️ **Immediate Steps:**
-            - Isolate affected plants if possible
-            - Consult with a local agricultural expert
-            - Consider appropriate fungicide/pesticide treatment
-            - Improve field drainage and ventilation
-            - Monitor surrounding plants closely
-            
-            📞 **Need Help?** Contact your local agricultural extension office for specific treatment recommendations.
-            """)
+        if DEBUG_PANEL or st.query_params.get("debug") == "1":
+            render_debug_panel(timings, version)
+
+# Main app
+def main():
+    loader = get_model_loader()
+    if not BACKGROUND_LOAD:
+        loader.wait()
+    
+    # Hero, stats and the upload heading as one pre-rendered element
+    st.markdown(HEADER_HTML, unsafe_allow_html=True)
+    
+    metrics_server()
+    
+    if loader.state == "ready":
+        # Taken once per run, so a model swap never changes the model under a run in flight,
+        # and a swapped-out model is only closed once the runs using it have finished
+        with loader.result().serving() as bundle:
+            render_upload_section(*bundle)
+    elif loader.state == "failed":
+        st.error(f"Error loading model: {loader.error}")
+        st.error(f"⚠️ Model not found. Please ensure '{backend_model_path(BACKEND)}' is in the current directory.")
+    else:
+        render_model_loading(loader)
     
     # Disease Information Section
     st.markdown("---")
-    st.markdown('<h2 class="section-title">Disease Information</h2>', unsafe_allow_html=True)
-    st.markdown('<p class="section-subtitle">Learn about the diseases we can detect</p>', unsafe_allow_html=True)
-    
-    col1, col2 = st.columns(2, gap="large")
-    
-    diseases_info = {
-        "Bacterial Blight": {
-            "description": "Caused by Xanthomonas oryzae. Symptoms include water-soaked lesions on leaves.",
-            "url": "https://en.wikipedia.org/wiki/Xanthomonas_oryzae_pv._oryzae"
-        },
-        "Brown Spot": {
-            "description": "Fungal disease causing brown spots with gray centers on leaves and grains.",
-            "url": "https://en.wikipedia.org/wiki/Cochliobolus_miyabeanus"
-        },
-        "Leaf Smut": {
-            "description": "Fungal infection producing black powdery spores on leaves.",
-            "url": "https://en.wikipedia.org/wiki/Eballistra_oryzae"
-        },
-        "Leaf Blast": {
-            "description": "Most destructive rice disease, causing diamond-shaped lesions.",
-            "url": "https://en.wikipedia.org/wiki/Magnaporthe_oryzae"
-        },
-        "Leaf Scald": {
-            "description": "Bacterial disease causing scalded appearance on leaf tips.",
-            "url": "https://en.wikipedia.org/wiki/Monographella_albescens"
-        },
-        "Sheath Blight": {
-            "description": "Fungal disease affecting leaf sheaths near water line.",
-            "url": "https://en.wikipedia.org/wiki/Sheath_blight"
-        }
-    }
-
-    for i, (name, data) in enumerate(diseases_info.items()):
-        with col1 if i % 2 == 0 else col2:
-            icon = "✅" if name == "Healthy Rice Leaf" else "⚠️"
-            url_attr = f'href="{data["url"]}" target="_blank" rel="noopener noreferrer"' if data.get("url") else ""
-            st.markdown(f"""
-                <div class="stat-card" style="text-align: left;">
-                    <div style="font-size: 1.5rem; margin-bottom: 0.5rem;">{icon}</div>
-                    <a {url_attr} class="disease-link" style="text-decoration:none;">
-                        <h5 style="margin:0; color:#FBD784;">{name}</h5>
-                    </a>
-                    <p style="color: rgba(255,255,255,0.6); font-size: 0.9rem; margin-top:0.5rem;">{data['description']}</p>
-                </div>
-            """, unsafe_allow_html=True)
-    
-    st.markdown('</div>', unsafe_allow_html=True)
+    st.markdown(DISEASE_INFO_HTML, unsafe_allow_html=True)
 
     # 🌤 Local Weather (below Disease Information)
     st.markdown('<h2 style="text-align:center;">🌤 Local Weather</h2>', unsafe_allow_html=True)
     import streamlit.components.v1 as components
-    weather_widget = """
-    <div id="weatherapi-weather-widget-2"></div>
-    <script type="text/javascript"
-        src="https://www.weatherapi.com/weather/widget.ashx?loc=2850955&wid=2&tu=2&div=weatherapi-weather-widget-2"></script>
-    <noscript>
-        <a href="https://www.weatherapi.com/weather/q/polonnaruwa-2850955"
-        alt="Hour by hour Polonnaruwa weather">
-        10 day hour by hour Polonnaruwa weather
-        </a>
-    </noscript>
-    """
-    components.html(weather_widget, height=400, scrolling=False)
+    components.html(WEATHER_WIDGET_HTML, height=400, scrolling=False)
 
     # Footer (moved to the very end of the page)
     st.markdown("---")
-    st.markdown("""
-        <div style="text-align: center; padding: 2rem; color: rgba(255,255,255,0.5);">
-            <p style="font-size: 0.9rem;">🌾 Rice Leaf Disease Classifier | Powered by Deep Learning & TensorFlow</p>
-            <p style="font-size: 0.8rem; margin-top: 0.5rem;">© 2024 All Rights Reserved</p>
-        </div>
-    """, unsafe_allow_html=True)
+    st.markdown(FOOTER_HTML, unsafe_allow_html=True)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,74 @@
+"""Cascade latency and fidelity against the full model alone.
+
+Runs every held-out validation image one at a time, as the page does for
+a single upload, through the full model and through the cascade at several
+thresholds. For each threshold it reports mean/p50/p95 latency, the share
+of images the student answered on its own, and top-1 agreement with the
+full model. Held out means the half of each class's validation images
+distill_student.py did not pick the student's checkpoint on, so agreement
+and accuracy aren't biased towards the student.
+
+Usage:
+    python benchmarks/bench_cascade.py --dataset dataset/ --thresholds 60 70 80 90
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from common import percentiles
+
+from cascade import STUDENT_PATH, Cascade, load_student
+from distill_student import split_holdout
+from inference import MODEL_PATH, build_predict_fn, build_serving_model, preprocess_images
+from preprocessing import load_image
+from training_data import list_image_files
+
+def timed_predictions(predict_fn, batch):
+    probabilities, samples = [], []
+    for image in batch:
+        start = time.perf_counter()
+        probabilities.append(predict_fn(image[None])[0])
+        samples.append((time.perf_counter() - start) * 1000)
+    return np.array(probabilities), samples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dataset", default="dataset/")
+    parser.add_argument("--class-names", default="class_names.json")
+    parser.add_argument("--teacher", default=MODEL_PATH)
+    parser.add_argument("--student", default=STUDENT_PATH)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[60, 70, 80, 90])
+    parser.add_argument("--limit", type=int, help="use at most this many held-out images")
+    args = parser.parse_args()
+
+    from tensorflow import keras
+    with open(args.class_names, 'r') as f:
+        class_names = json.load(f)
+    _, _, val_files, val_labels, _ = list_image_files(args.dataset, class_names)
+    _, _, val_files, val_labels = split_holdout(val_files, val_labels)
+    val_files, val_labels = val_files[:args.limit], np.array(val_labels[:args.limit])
+    batch = preprocess_images([load_image(path) for path in val_files])
+
+    teacher_fn = build_predict_fn(build_serving_model(keras.models.load_model(args.teacher)))
+    student_fn = load_student(args.student)
+
+    teacher_probabilities, samples = timed_predictions(teacher_fn, batch)
+    teacher_top = teacher_probabilities.argmax(axis=1)
+    p = percentiles(samples)
+    print(f"{len(batch)} held-out validation images, batch size 1\n")
+    print(f"{'':<16}{'mean ms':>9}{'p50 ms':>9}{'p95 ms':>9}{'student':>9}{'agree':>8}{'accuracy':>10}")
+    print(f"{'full model':<16}{np.mean(samples):>9.1f}{p['p50']:>9.1f}{p['p95']:>9.1f}{'0.0%':>9}{'100.0%':>8}"
+          f"{np.mean(teacher_top == val_labels):>10.1%}")
+    for threshold in args.thresholds:
+        cascade = Cascade(student_fn, teacher_fn, threshold)
+        probabilities, samples = timed_predictions(cascade.predict, batch)
+        top = probabilities.argmax(axis=1)
+        p = percentiles(samples)
+        print(f"{f'cascade @ {threshold:g}%':<16}{np.mean(samples):>9.1f}{p['p50']:>9.1f}{p['p95']:>9.1f}"
+              f"{cascade.stats()['student_share']:>9.1%}{np.mean(top == teacher_top):>8.1%}"
+              f"{np.mean(top == val_labels):>10.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Peak memory and time of decode + preprocess for large phone photos.
+
+Compares the original path (Image.open -> np.array -> cv2.resize) with
+preprocessing.load_image, which decodes JPEGs at reduced scale. Each case
+runs in a fresh process so peak RSS (Linux VmHWM) is measured independently.
+
+Usage:
+    python benchmarks/bench_decode.py --megapixels 12 24 48 --runs 5
+"""
+import argparse
+import io
+import time
+
+from common import current_rss_mb, peak_rss_mb, reset_peak_rss, run_isolated
+
+import cv2
+import numpy as np
+from PIL import Image
+
+def synthetic_jpeg(megapixels, quality=90):
+    """Encode a smooth, leaf-coloured synthetic photo of the given size"""
+    height = int((megapixels * 1e6 * 3 / 4) ** 0.5)
+    width = int(height * 4 / 3)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    image = np.empty((height, width, 3), np.uint8)
+    image[..., 0] = (60 + 40 * np.sin(x / 97.0)).astype(np.uint8)
+    image[..., 1] = (140 + 60 * np.cos(y / 131.0)).astype(np.uint8)
+    image[..., 2] = (50 + 30 * np.sin((x + y) / 53.0)).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+def original_path(data):
+    image = Image.open(io.BytesIO(data))
+    img_array = np.array(image)
+    img_resized = cv2.resize(img_array, (224, 224))
+    return np.expand_dims(img_resized / 255.0, axis=0)
+
+def reduced_path(data):
+    from inference import preprocess_image
+    from preprocessing import load_image
+    return preprocess_image(load_image(data))
+
+PATHS = {"original": original_path, "reduced": reduced_path}
+
+def measure(name, data, runs):
+    fn = PATHS[name]
+    # Import everything up front so only the decode itself shows in peak RSS
+    if name == "reduced":
+        import inference  # noqa: F401
+    reset_peak_rss()
+    before = current_rss_mb()
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(data)
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples)), peak_rss_mb() - before
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--megapixels", type=float, nargs="+", default=[12, 24, 48])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'image':<10}{'path':<10}{'median ms':>12}{'peak MB':>10}")
+    for megapixels in args.megapixels:
+        data = synthetic_jpeg(megapixels)
+        for name in PATHS:
+            median_ms, peak_mb = run_isolated(measure, name, data, args.runs)
+            print(f"{f'{megapixels:g} MP':<10}{name:<10}{median_ms:>12.1f}{peak_mb:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Tiled field analysis: time and peak memory on a synthetic high-resolution photo.
+
+Reports decode time, tile count, tiles/sec through the model and the peak
+RSS added by the analysis, next to the size all tiles would take if they
+were materialised at once.
+
+Usage:
+    python benchmarks/bench_field.py --megapixels 12 50 --backend keras
+"""
+import argparse
+import json
+import time
+
+from common import current_rss_mb, peak_rss_mb, reset_peak_rss
+
+from bench_decode import synthetic_jpeg
+from field_analysis import TILE_BATCH_SIZE, TILE_SIZE, TILE_STRIDE, analyze_field
+from inference import BACKEND, load_backend
+from preprocessing import load_image
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--megapixels", type=float, nargs="+", default=[12, 50])
+    parser.add_argument("--backend", default=BACKEND)
+    parser.add_argument("--tile", type=int, default=TILE_SIZE)
+    parser.add_argument("--stride", type=int, default=TILE_STRIDE)
+    parser.add_argument("--batch-size", type=int, default=TILE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    with open('class_names.json', 'r') as f:
+        class_names = json.load(f)
+    _, predict_fn = load_backend(args.backend)
+    # Let the runtime allocate its buffers for this batch size before measuring
+    analyze_field(predict_fn, load_image(synthetic_jpeg(0.5), target_size=None), class_names,
+                  args.tile, args.stride, args.batch_size)
+
+    for megapixels in args.megapixels:
+        data = synthetic_jpeg(megapixels)
+        reset_peak_rss()
+        before = current_rss_mb()
+        start = time.perf_counter()
+        image = load_image(data, target_size=None)
+        decode_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        analysis = analyze_field(predict_fn, image, class_names, args.tile, args.stride, args.batch_size)
+        analyze_s = time.perf_counter() - start
+        tiles = analysis["summary"]["tiles"]
+        all_tiles_mb = tiles * args.tile * args.tile * 3 / 2**20
+        print(f"{megapixels:>5.0f} MP {image.size[0]}x{image.size[1]}: decode {decode_s:.2f}s, "
+              f"{tiles} tiles in {analyze_s:.2f}s ({tiles / analyze_s:.0f} tiles/s), "
+              f"peak +{peak_rss_mb() - before:.0f} MB (all tiles at once: {all_tiles_mb:.0f} MB)")
+        del image, analysis
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Training input throughput: ImageDataGenerator vs the tf.data pipeline.
+
+Reports images/sec for the input pipeline alone (iterating batches) and end
+to end (model.fit on the notebook's MobileNetV2 transfer-learning model).
+The tf.data pipeline is measured on its first epoch, which decodes and
+fills the cache, and on a later epoch, which reads from the cache.
+
+Usage:
+    python benchmarks/bench_input_pipeline.py --dataset dataset/ --batch-size 32 --steps 50
+"""
+import argparse
+import time
+
+from common import REPO_ROOT  # noqa: F401  (puts the repo root on sys.path)
+
+from tensorflow import keras
+from tensorflow.keras import layers, models
+from tensorflow.keras.applications import MobileNetV2
+from tensorflow.keras.preprocessing.image import ImageDataGenerator
+
+from training_data import AUGMENTATION, make_datasets
+
+def notebook_generator(dataset_path, batch_size):
+    datagen = ImageDataGenerator(rescale=1./255, fill_mode='nearest', validation_split=0.2, **AUGMENTATION)
+    return datagen.flow_from_directory(
+        dataset_path,
+        target_size=(224, 224),
+        batch_size=batch_size,
+        class_mode='categorical',
+        subset='training',
+        shuffle=True
+    )
+
+def create_transfer_learning_model(num_classes, weights):
+    base_model = MobileNetV2(input_shape=(224, 224, 3), include_top=False, weights=weights)
+    base_model.trainable = False
+    model = models.Sequential([
+        base_model,
+        layers.GlobalAveragePooling2D(),
+        layers.Dense(256, activation='relu'),
+        layers.Dropout(0.5),
+        layers.Dense(128, activation='relu'),
+        layers.Dropout(0.3),
+        layers.Dense(num_classes, activation='softmax')
+    ])
+    model.compile(optimizer=keras.optimizers.Adam(0.001), loss='categorical_crossentropy', metrics=['accuracy'])
+    return model
+
+def iterate(batches, steps):
+    start = time.perf_counter()
+    images = 0
+    for step, (x, _) in enumerate(batches):
+        images += len(x)
+        if step + 1 >= steps:
+            break
+    return images / (time.perf_counter() - start)
+
+def fit_throughput(model, data, steps, batch_size):
+    start = time.perf_counter()
+    model.fit(data, steps_per_epoch=steps, epochs=1, verbose=0)
+    return steps * batch_size / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dataset", default="dataset/")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--steps", type=int, default=50, help="batches per measurement")
+    parser.add_argument("--weights", default=None, help="MobileNetV2 weights for the end-to-end run, e.g. imagenet")
+    args = parser.parse_args()
+
+    generator = notebook_generator(args.dataset, args.batch_size)
+    train_ds, _, class_names = make_datasets(args.dataset, batch_size=args.batch_size)
+    steps = min(args.steps, len(generator))
+    train_ds = train_ds.repeat()
+
+    results = {}
+    results["input only: ImageDataGenerator"] = iterate(generator, steps)
+    results["input only: tf.data (cold cache)"] = iterate(train_ds, steps)
+    # Run through the rest of the first epoch so the cache is complete
+    iterate(train_ds, len(generator))
+    results["input only: tf.data (warm cache)"] = iterate(train_ds, steps)
+
+    model = create_transfer_learning_model(len(class_names), args.weights)
+    # One short fit first so graph building isn't charged to either pipeline
+    model.fit(train_ds, steps_per_epoch=1, epochs=1, verbose=0)
+    results["end to end: ImageDataGenerator"] = fit_throughput(model, generator, steps, args.batch_size)
+    results["end to end: tf.data"] = fit_throughput(model, train_ds, steps, args.batch_size)
+
+    for name, images_per_sec in results.items():
+        print(f"{name:<36}{images_per_sec:>10.1f} img/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Single-image latency: model.predict vs the compiled predict_fn.
+
+Usage:
+    python benchmarks/bench_latency.py --model rice_disease_classifier_final.keras --runs 100
+"""
+import argparse
+import time
+
+import numpy as np
+
+from common import percentiles
+
+from tensorflow import keras
+
+from inference import build_predict_fn, build_serving_model, preprocess_image
+
+def time_calls(fn, batch, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(batch)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="rice_disease_classifier_final.keras")
+    parser.add_argument("--runs", type=int, default=100)
+    args = parser.parse_args()
+
+    model = keras.models.load_model(args.model)
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, (1080, 1440, 3), dtype=np.uint8)
+    batch = preprocess_image(image)
+    # model.predict takes the float input the model was trained on
+    float_batch = batch / 255.0
+
+    start = time.perf_counter()
+    predict_fn = build_predict_fn(build_serving_model(model))
+    build_ms = (time.perf_counter() - start) * 1000
+
+    # First call of each path, before any warm-up
+    first_predict = time_calls(lambda b: model.predict(b, verbose=0), float_batch, 1)[0]
+    first_fast = time_calls(predict_fn, batch, 1)[0]
+
+    results = {
+        "model.predict": time_calls(lambda b: model.predict(b, verbose=0), float_batch, args.runs),
+        "predict_fn": time_calls(predict_fn, batch, args.runs),
+    }
+
+    print(f"predict_fn build + warm-up: {build_ms:.1f} ms")
+    print(f"first call: model.predict {first_predict:.1f} ms, predict_fn {first_fast:.1f} ms")
+    print(f"{'path':<16}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, samples in results.items():
+        stats = percentiles(samples)
+        print(f"{name:<16}{stats['p50']:>10.2f}{stats['p95']:>10.2f}{stats['p99']:>10.2f}")
+
+    diff = np.abs(model.predict(float_batch, verbose=0) - predict_fn(batch)).max()
+    print(f"max abs probability difference: {diff:.2e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Near-duplicate detection: hit rate, false matches and lookup cost on a mixed corpus.
+
+The corpus has distinct leaf photos plus edited copies of some of them, as
+farmers send them: re-compressed (as by messaging apps), downscaled,
+slightly cropped, brightened, and screenshot-like PNGs. Each copy is
+matched against an index holding the originals and the other leaves.
+For every distance threshold it reports how many copies reuse a prediction
+and how many distinct leaves are wrongly matched. A copy that matches a
+different leaf counts as wrong, not as a hit. It also times hashing and
+index search at several index sizes. Without --dataset the leaves are
+synthetic: a rotated leaf blade with lesions on a soil background.
+
+Usage:
+    python benchmarks/bench_near_duplicates.py --dataset dataset/ --originals 300
+"""
+import argparse
+import io
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageEnhance, ImageFilter
+
+from common import percentiles
+
+from near_duplicates import NearDuplicateIndex, hamming, perceptual_hash
+from preprocessing import load_image
+
+EDITS = {
+    "jpeg q40": lambda image: encode(image, "JPEG", quality=40),
+    "jpeg q70 x2": lambda image: encode(load_image(encode(image, "JPEG", quality=70), None), "JPEG", quality=70),
+    "half size": lambda image: encode(image.resize((image.width // 2, image.height // 2), Image.LANCZOS), "JPEG",
+                                      quality=85),
+    "crop 3%": lambda image: encode(crop(image, 0.03), "JPEG", quality=85),
+    "crop 8%": lambda image: encode(crop(image, 0.08), "JPEG", quality=85),
+    "brighter": lambda image: encode(ImageEnhance.Brightness(image).enhance(1.25), "JPEG", quality=85),
+    "png": lambda image: encode(image, "PNG"),
+}
+
+def encode(image, fmt, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **options)
+    return buffer.getvalue()
+
+def crop(image, fraction):
+    """Trim fraction of each side's length off the top-left corner, as a slightly re-framed shot"""
+    return image.crop((int(image.width * fraction), int(image.height * fraction), image.width, image.height))
+
+def synthetic_leaf(rng, size=(1024, 768)):
+    """A leaf blade with lesions at a random angle and position on a noisy soil background"""
+    width, height = size
+    soil = rng.normal(0, 12, (height // 8, width // 8, 3)) + rng.uniform(60, 120, 3)
+    image = Image.fromarray(soil.clip(0, 255).astype(np.uint8)).resize(size, Image.BICUBIC)
+    leaf = Image.new("L", (width * 2, height // 3), 0)
+    draw = ImageDraw.Draw(leaf)
+    draw.ellipse((0, 0, leaf.width - 1, leaf.height - 1), fill=255)
+    blade = Image.new("RGB", leaf.size, tuple(int(c) for c in rng.uniform((40, 110, 20), (90, 180, 60))))
+    blade_draw = ImageDraw.Draw(blade)
+    blade_draw.line((0, leaf.height // 2, leaf.width, leaf.height // 2), fill=(150, 190, 90), width=6)
+    for _ in range(rng.integers(3, 25)):
+        x, y = rng.uniform(0.1, 0.9) * leaf.width, rng.uniform(0.2, 0.8) * leaf.height
+        rx, ry = rng.uniform(10, 60), rng.uniform(6, 25)
+        color = tuple(int(c) for c in rng.uniform((110, 60, 20), (170, 110, 60)))
+        blade_draw.ellipse((x - rx, y - ry, x + rx, y + ry), fill=color, outline=(70, 40, 20), width=3)
+    angle = rng.uniform(-60, 60)
+    blade, leaf = blade.rotate(angle, expand=True), leaf.rotate(angle, expand=True)
+    offset = (int(rng.uniform(-0.6, -0.2) * width), int(rng.uniform(-0.5, 0.3) * height))
+    image.paste(blade, offset, leaf.filter(ImageFilter.GaussianBlur(2)))
+    return image
+
+def load_corpus(args, rng):
+    if args.dataset:
+        from training_data import list_image_files
+        train_files, _, val_files, _, _ = list_image_files(args.dataset)
+        files = train_files + val_files
+        files = [files[i] for i in rng.permutation(len(files))[:args.originals]]
+        return [load_image(path, None) for path in files]
+    return [synthetic_leaf(rng) for _ in range(args.originals)]
+
+def time_search(sizes, runs, rng):
+    """Search latency (ms) of an index holding n random hashes"""
+    rows = []
+    for size in sizes:
+        index = NearDuplicateIndex(capacity=size, max_distance=6)
+        for value in rng.integers(0, 2**63, size, dtype=np.uint64):
+            index.add(int(value), None)
+        queries = [int(value) for value in rng.integers(0, 2**63, runs, dtype=np.uint64)]
+        samples = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query)
+            samples.append((time.perf_counter() - start) * 1000)
+        rows.append((size, percentiles(samples, (50, 99))))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dataset", help="use these photos as the distinct leaves instead of synthetic ones")
+    parser.add_argument("--originals", type=int, default=200, help="distinct leaves in the corpus")
+    parser.add_argument("--copied", type=float, default=0.5, help="share of the leaves that also get edited copies")
+    parser.add_argument("--distances", type=int, nargs="+", default=[0, 2, 4, 6, 8, 10, 12, 16])
+    parser.add_argument("--index-sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--runs", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    originals = load_corpus(args, rng)
+    # Leaves as the app sees them: decoded from a JPEG upload
+    uploads = [load_image(encode(image, "JPEG", quality=90)) for image in originals]
+    hash_ms = []
+    hashes = []
+    for image in uploads:
+        start = time.perf_counter()
+        hashes.append(perceptual_hash(image))
+        hash_ms.append((time.perf_counter() - start) * 1000)
+
+    copied = rng.permutation(len(originals))[:int(len(originals) * args.copied)]
+    copies = []
+    for i in copied:
+        for edit, apply in EDITS.items():
+            copies.append((i, edit, perceptual_hash(load_image(apply(originals[i])))))
+
+    # Distance of each copy to its own original and to the closest other leaf
+    hash_array = np.array(hashes, dtype=np.uint64)
+    own = np.array([hamming(image_hash, hashes[i]) for i, _, image_hash in copies])
+    others = []
+    for i, _, image_hash in copies:
+        distances = np.bitwise_count(hash_array ^ np.uint64(image_hash))
+        distances[i] = 64
+        others.append(distances.min())
+    others = np.array(others)
+    pairwise = np.bitwise_count(hash_array[:, None] ^ hash_array[None, :])
+    np.fill_diagonal(pairwise, 64)
+    nearest_other = pairwise.min(axis=1)
+
+    print(f"{len(originals)} leaves, {len(copies)} edited copies of {len(copied)} of them")
+    p = percentiles(hash_ms, (50, 99))
+    print(f"perceptual_hash on the decoded upload: p50 {p['p50']:.2f} ms, p99 {p['p99']:.2f} ms")
+    print(f"\n{'edit':<14}{'median dist':>12}{'max dist':>10}")
+    for edit in EDITS:
+        edit_own = [distance for (_, name, _), distance in zip(copies, own) if name == edit]
+        print(f"{edit:<14}{np.median(edit_own):>12.0f}{max(edit_own):>10}")
+    print(f"{'other leaf':<14}{np.median(pairwise[pairwise < 64]):>12.0f}{'min ' + str(nearest_other.min()):>10}")
+
+    print(f"\n{'distance':>8}{'copies reused':>15}{'wrong leaf':>12}{'leaves falsely matched':>24}")
+    for max_distance in args.distances:
+        correct = (own <= max_distance) & (own <= others)
+        wrong = (others <= max_distance) & (others < own)
+        print(f"{max_distance:>8}{correct.mean():>15.1%}{wrong.mean():>12.1%}{(nearest_other <= max_distance).mean():>24.1%}")
+
+    print(f"\n{'index size':>10}{'p50 ms':>9}{'p99 ms':>9}")
+    for size, p in time_search(args.index_sizes, args.runs, rng):
+        print(f"{size:>10}{p['p50']:>9.3f}{p['p99']:>9.3f}")
+
+if __name__ == "__main__":
+    main()
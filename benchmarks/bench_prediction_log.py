@@ -0,0 +1,187 @@
+"""Prediction log: request-path cost of log() and query speed of Parquet against a naive JSONL log.
+
+First it times log() calls while the writer thread runs: a steady stream,
+then a burst larger than the buffer, which shows how many records are
+dropped instead of queued. Then it writes the same synthetic log of --rows
+predictions over --days days twice: as date-partitioned Parquet files of
+--rows-per-file rows, as the writer produces them, and as one JSON object
+per line. It times three analytics queries on each:
+
+    trend:   predictions per day and class over the whole log
+    unsure:  Leaf Blast predictions under 60% confidence in the last 7 days
+    lookup:  every prediction of one image hash
+
+Usage:
+    python benchmarks/bench_prediction_log.py --rows 2000000
+"""
+import argparse
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from common import percentiles
+
+from prediction_log import PredictionLog, log_schema, open_log, write_partitioned
+
+CLASS_NAMES = ["Bacterial Blight", "Brown Spot", "Healthy Rice Leaf", "Leaf Blast", "Leaf Scald", "Leaf Smut",
+               "Sheath Blight"]
+
+def synthetic_table(rows, days, seed=0):
+    """Random log rows spread over the last days days"""
+    rng = np.random.default_rng(seed)
+    end = int(time.time() * 1000)
+    timestamps = np.sort(rng.integers(end - days * 86400 * 1000, end, rows))
+    probabilities = (rng.dirichlet(np.full(len(CLASS_NAMES), 0.3), rows) * 100).astype(np.float32)
+    predicted = probabilities.argmax(axis=1)
+    hashes = [f"{value:064x}" for value in rng.integers(0, 2**62, rows)]
+    offsets = np.arange(0, rows * len(CLASS_NAMES) + 1, len(CLASS_NAMES), dtype=np.int32)
+    table = pa.table({
+        "timestamp": pa.array(timestamps, pa.timestamp("ms", tz="UTC")),
+        "image_hash": pa.array(hashes, pa.string()),
+        "predicted_class": pa.array(np.array(CLASS_NAMES)[predicted], pa.string()),
+        "confidence": pa.array(probabilities.max(axis=1)),
+        "probabilities": pa.ListArray.from_arrays(offsets, probabilities.ravel()),
+        "model_version": pa.array(np.where(timestamps < end - days * 86400 * 500, "3f2a9c81d0e4", "8b1d07e2c4a9")),
+        "source": pa.array(rng.choice(["model", "cache", "duplicate"], rows, p=[0.7, 0.2, 0.1])),
+    }, schema=log_schema())
+    return table.replace_schema_metadata({"class_names": json.dumps(CLASS_NAMES)})
+
+def write_jsonl(path, table, chunk=100000):
+    with open(path, "w") as f:
+        for start in range(0, table.num_rows, chunk):
+            for row in table.slice(start, chunk).to_pylist():
+                row["timestamp"] = row["timestamp"].isoformat()
+                f.write(json.dumps(row) + "\n")
+
+def read_jsonl(path):
+    with open(path, "r") as f:
+        for line in f:
+            yield json.loads(line)
+
+def jsonl_queries(path, since, image_hash):
+    """The three queries the way a line-per-record log is usually read: one pass of json.loads each"""
+    def trend():
+        counts = {}
+        for row in read_jsonl(path):
+            key = (row["timestamp"][:10], row["predicted_class"])
+            counts[key] = counts.get(key, 0) + 1
+        return len(counts)
+
+    def unsure():
+        matches = [row["confidence"] for row in read_jsonl(path) if row["timestamp"][:10] >= since
+                   and row["predicted_class"] == "Leaf Blast" and row["confidence"] < 60]
+        return len(matches)
+
+    def lookup():
+        return len([row for row in read_jsonl(path) if row["image_hash"] == image_hash])
+
+    return {"trend": trend, "unsure": unsure, "lookup": lookup}
+
+def parquet_queries(directory, since, image_hash):
+    """The same queries on the partitioned dataset, reading only the columns and dates they need"""
+    def trend():
+        table = open_log(directory).to_table(columns=["date", "predicted_class"])
+        return table.group_by(["date", "predicted_class"]).aggregate([("predicted_class", "count")]).num_rows
+
+    def unsure():
+        where = ((ds.field("date") >= since) & (ds.field("predicted_class") == "Leaf Blast")
+                 & (ds.field("confidence") < 60))
+        return open_log(directory).to_table(columns=["confidence"], filter=where).num_rows
+
+    def lookup():
+        return open_log(directory).to_table(filter=ds.field("image_hash") == image_hash).num_rows
+
+    return {"trend": trend, "unsure": unsure, "lookup": lookup}
+
+def directory_mb(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path) / 2**20
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names) / 2**20
+
+def time_log_calls(directory, calls, burst, buffer):
+    """Latency of log() for a paced stream, then records dropped by a burst of burst calls"""
+    result = ("Leaf Blast", 91.2, [(name, 91.2 if name == "Leaf Blast" else 1.4666) for name in CLASS_NAMES])
+    prediction_log = PredictionLog(directory, max_buffered=buffer)
+    samples = []
+    for i in range(calls):
+        start = time.perf_counter()
+        prediction_log.log(f"{i:064x}", result, "3f2a9c81d0e4", CLASS_NAMES)
+        samples.append((time.perf_counter() - start) * 1e6)
+        if i % 100 == 0:
+            time.sleep(0.001)
+    dropped = prediction_log.dropped
+    for i in range(burst):
+        prediction_log.log(f"{i:064x}", result, "3f2a9c81d0e4", CLASS_NAMES)
+    burst_dropped = prediction_log.dropped - dropped
+    start = time.perf_counter()
+    prediction_log.close()
+    return samples, dropped, burst_dropped, time.perf_counter() - start, prediction_log.stats()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--rows-per-file", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--calls", type=int, default=20000, help="log() calls timed")
+    parser.add_argument("--buffer", type=int, default=10000, help="log buffer size for the log() test")
+    parser.add_argument("--dir", help="work directory (default: a temporary one, removed afterwards)")
+    args = parser.parse_args()
+
+    work = args.dir or tempfile.mkdtemp(prefix="rice_prediction_log_")
+    try:
+        samples, dropped, burst_dropped, close_s, stats = time_log_calls(
+            os.path.join(work, "calls"), args.calls, args.buffer * 3, args.buffer)
+        p = percentiles(samples, (50, 99, 99.9))
+        print(f"log(): p50 {p['p50']:.1f} us, p99 {p['p99']:.1f} us, p99.9 {p['p99.9']:.1f} us over {args.calls} calls "
+              f"({dropped} dropped)")
+        print(f"burst of {args.buffer * 3} calls into a {args.buffer}-record buffer: {burst_dropped} dropped; "
+              f"close() wrote the rest in {close_s * 1000:.0f} ms ({stats['written']} rows in {stats['files']} files)")
+
+        print(f"\nBuilding {args.rows} rows over {args.days} days...", flush=True)
+        table = synthetic_table(args.rows, args.days)
+        parquet_dir = os.path.join(work, "parquet")
+        start = time.perf_counter()
+        for i, offset in enumerate(range(0, table.num_rows, args.rows_per_file)):
+            write_partitioned(parquet_dir, table.slice(offset, args.rows_per_file), f"part-{i}")
+        parquet_write_s = time.perf_counter() - start
+        jsonl_path = os.path.join(work, "predictions.jsonl")
+        start = time.perf_counter()
+        write_jsonl(jsonl_path, table)
+        jsonl_write_s = time.perf_counter() - start
+        files = sum(len(names) for _, _, names in os.walk(parquet_dir))
+        print(f"{'format':<10}{'MB':>9}{'files':>7}{'write s':>9}")
+        print(f"{'parquet':<10}{directory_mb(parquet_dir):>9.1f}{files:>7}{parquet_write_s:>9.1f}")
+        print(f"{'jsonl':<10}{directory_mb(jsonl_path):>9.1f}{1:>7}{jsonl_write_s:>9.1f}")
+
+        since = (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=7)).strftime("%Y-%m-%d")
+        image_hash = table["image_hash"][table.num_rows // 2].as_py()
+        queries = {"parquet": parquet_queries(parquet_dir, since, image_hash),
+                   "jsonl": jsonl_queries(jsonl_path, since, image_hash)}
+        print(f"\n{'query':<8}{'parquet s':>11}{'jsonl s':>10}{'speed-up':>10}{'rows':>9}")
+        for name in ("trend", "unsure", "lookup"):
+            seconds, counts = {}, {}
+            for fmt in ("parquet", "jsonl"):
+                samples = []
+                for _ in range(args.runs if fmt == "parquet" else 1):
+                    start = time.perf_counter()
+                    counts[fmt] = queries[fmt][name]()
+                    samples.append(time.perf_counter() - start)
+                seconds[fmt] = min(samples)
+            if counts["parquet"] != counts["jsonl"]:
+                raise RuntimeError(f"{name}: parquet returned {counts['parquet']} rows, jsonl {counts['jsonl']}")
+            print(f"{name:<8}{seconds['parquet']:>11.3f}{seconds['jsonl']:>10.2f}"
+                  f"{seconds['jsonl'] / seconds['parquet']:>9.0f}x{counts['parquet']:>9}")
+    finally:
+        if not args.dir:
+            shutil.rmtree(work, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Quality gate: wrongly rejected leaves, caught unusable images, and the model compute it saves.
+
+Usable leaf photos are checked as uploaded. They are the --dataset images,
+or without it the real photos that ship with the repository: the dataset
+samples plotted in the notebook (three per class) and the leaf in
+images/predict.png. They are checked together with unusable variants of them: blurred,
+dark and overexposed. Non-leaf photos are checked too: sky, bare soil,
+a text document, a cluttered indoor scene, random pixel noise and flat
+colour. For each category it
+reports how many images the gate rejects and for which reason. On usable
+leaves every rejection is a false reject. It then times the gate against
+preprocessing plus a single-image MobileNetV2 forward pass and estimates
+the model time saved per upload when --unusable-share of uploads are
+unusable. Without --model an untrained
+MobileNetV2 of the app's shape stands in, which costs the same compute.
+Thresholds can be overridden to calibrate them on your own photos.
+
+Usage:
+    python benchmarks/bench_quality_gate.py --dataset dataset/ --model rice_disease_classifier_final.keras
+    python benchmarks/bench_quality_gate.py --dataset dataset/ --min-sharpness 0.4 --min-leaf-share 0.2
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import time
+from collections import Counter
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageEnhance, ImageFilter
+
+from common import REPO_ROOT, percentiles
+from bench_near_duplicates import encode
+
+from inference import MODEL_PATH, build_predict_fn, build_serving_model, preprocess_image
+from preprocessing import load_image
+from quality_gate import (MAX_BRIGHTNESS, MAX_SHARPNESS, MIN_BRIGHTNESS, MIN_LEAF_SHARE, MIN_SHARPNESS, QualityGate,
+                          measure)
+
+UNUSABLE_EDITS = {
+    # Clearly out of focus; a blur of 1/150 of the size only softens a photo and usually still passes
+    "blurred": lambda image: image.filter(ImageFilter.GaussianBlur(max(image.size) / 50)),
+    "dark": lambda image: ImageEnhance.Brightness(image).enhance(0.2),
+    "overexposed": lambda image: ImageEnhance.Brightness(image).enhance(3.0),
+}
+
+def non_leaf_photos(rng, count, size=(1024, 768)):
+    """Images a leaf classifier should never see: sky, bare soil, a document, an indoor scene, noise and flat colour"""
+    width, height = size
+    photos = {"sky": [], "soil": [], "document": [], "indoor": [], "noise": [], "flat": []}
+    for _ in range(count):
+        top, bottom = rng.uniform((60, 110, 190), (120, 170, 240)), rng.uniform((170, 200, 230), (230, 240, 255))
+        gradient = np.linspace(top, bottom, height)[:, None, :] + rng.normal(0, 3, (height, width, 3))
+        photos["sky"].append(Image.fromarray(gradient.clip(0, 255).astype(np.uint8)))
+        # Clods vary in brightness more than in colour
+        soil = (rng.normal(0, 25, (height // 4, width // 4, 1)) + rng.normal(0, 6, (height // 4, width // 4, 3))
+                + rng.uniform((80, 55, 35), (130, 95, 70)))
+        photos["soil"].append(Image.fromarray(soil.clip(0, 255).astype(np.uint8)).resize(size, Image.BILINEAR))
+        document = Image.new("RGB", size, tuple(int(c) for c in rng.uniform(225, 250, 3)))
+        draw = ImageDraw.Draw(document)
+        for y in range(60, height - 60, 28):
+            x = 60
+            while x < width - 120:
+                word = int(rng.integers(20, 90))
+                draw.rectangle((x, y, x + word, y + 12), fill=(40, 40, 40))
+                x += word + 12
+        photos["document"].append(document)
+        indoor = Image.new("RGB", size, tuple(int(c) for c in rng.uniform(120, 200, 3)))
+        draw = ImageDraw.Draw(indoor)
+        for _ in range(30):
+            x, y = rng.uniform(0, width), rng.uniform(0, height)
+            w, h = rng.uniform(40, 300, 2)
+            draw.rectangle((x, y, x + w, y + h), fill=tuple(int(c) for c in rng.uniform(0, 255, 3)))
+        photos["indoor"].append(indoor)
+        photos["noise"].append(Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8)))
+        photos["flat"].append(Image.new("RGB", size, tuple(int(c) for c in rng.uniform(0, 255, 3))))
+    return photos
+
+def _runs(mask, min_length):
+    """(start, end) of every run of True in a 1-D mask at least min_length long"""
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], mask.astype(int), [0]])))
+    return [(start, end) for start, end in zip(edges[::2], edges[1::2]) if end - start >= min_length]
+
+def sample_leaves():
+    """The dataset photos of the notebook's sample grid plus the leaf in images/predict.png"""
+    with open(os.path.join(REPO_ROOT, "rice_disease_model.ipynb"), "r") as f:
+        notebook = json.load(f)
+    # The first figure is the grid of sample images per class, on a white background
+    figure = next(output["data"]["image/png"] for cell in notebook["cells"] for output in cell.get("outputs", [])
+                  if "image/png" in output.get("data", {}))
+    grid = np.asarray(Image.open(io.BytesIO(base64.b64decode(figure))).convert("RGB"))
+    photo = np.abs(grid.astype(int) - 255).sum(axis=2) > 30
+    leaves = []
+    for top, bottom in _runs(photo.mean(axis=1) > 0.05, 60):
+        for left, right in _runs(photo[top:bottom].mean(axis=0) > 0.5, 60):
+            # One pixel in from the plot's edge
+            leaves.append(Image.fromarray(grid[top + 1:bottom - 1, left + 1:right - 1]))
+    screenshot = Image.open(os.path.join(REPO_ROOT, "images", "predict.png")).convert("RGB")
+    leaves.append(screenshot.crop((36, 91, 873, 600)))
+    return leaves
+
+def load_leaves(args, rng):
+    if args.dataset:
+        from training_data import list_image_files
+        train_files, _, val_files, _, _ = list_image_files(args.dataset)
+        files = train_files + val_files
+        return [load_image(files[i], None) for i in rng.permutation(len(files))[:args.leaves]]
+    return sample_leaves()[:args.leaves]
+
+def load_predict_fn(path):
+    from tensorflow import keras
+    if os.path.exists(path):
+        return build_predict_fn(build_serving_model(keras.models.load_model(path)))
+    print(f"{path} not found; timing an untrained MobileNetV2 of the same shape")
+    model = keras.Sequential([
+        keras.layers.Input((224, 224, 3)),
+        keras.applications.MobileNetV2(input_shape=(224, 224, 3), include_top=False, weights=None, pooling="avg"),
+        keras.layers.Dense(7, activation="softmax"),
+    ])
+    return build_predict_fn(build_serving_model(model))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dataset", help="usable leaf photos (default: the sample photos in the repository)")
+    parser.add_argument("--leaves", type=int, default=100, help="usable leaf photos to use")
+    parser.add_argument("--non-leaf", type=int, default=10, help="photos per non-leaf category")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--runs", type=int, default=30, help="single-image model runs to time")
+    parser.add_argument("--unusable-share", type=float, default=0.2,
+                        help="share of real uploads that are unusable, for the savings estimate")
+    parser.add_argument("--min-sharpness", type=float, default=MIN_SHARPNESS)
+    parser.add_argument("--max-sharpness", type=float, default=MAX_SHARPNESS)
+    parser.add_argument("--min-brightness", type=float, default=MIN_BRIGHTNESS)
+    parser.add_argument("--max-brightness", type=float, default=MAX_BRIGHTNESS)
+    parser.add_argument("--min-leaf-share", type=float, default=MIN_LEAF_SHARE)
+    args = parser.parse_args()
+
+    gate = QualityGate("reject", min_sharpness=args.min_sharpness, max_sharpness=args.max_sharpness,
+                       min_brightness=args.min_brightness, max_brightness=args.max_brightness,
+                       min_leaf_share=args.min_leaf_share)
+    rng = np.random.default_rng(0)
+    leaves = load_leaves(args, rng)
+    corpus = {"leaf": leaves}
+    corpus.update({name: [edit(image) for image in leaves] for name, edit in UNUSABLE_EDITS.items()})
+    corpus.update(non_leaf_photos(rng, args.non_leaf))
+
+    gate_ms, rejected, decoded = [], {}, []
+    print(f"{'category':<13}{'images':>7}{'rejected':>10}  reasons")
+    for category, images in corpus.items():
+        reasons = Counter()
+        count = 0
+        for image in images:
+            # As uploaded: a JPEG decoded by load_image
+            upload = load_image(encode(image.convert("RGB"), "JPEG", quality=90))
+            decoded.append(upload)
+            start = time.perf_counter()
+            failed = gate.reasons(measure(upload))
+            gate_ms.append((time.perf_counter() - start) * 1000)
+            count += bool(failed)
+            reasons.update(check for check, _ in failed)
+        rejected[category] = count
+        summary = ", ".join(f"{check} {n}" for check, n in reasons.most_common()) or "-"
+        label = "leaf (false)" if category == "leaf" else category
+        print(f"{label:<13}{len(images):>7}{count / len(images):>10.1%}  {summary}")
+
+    unusable = sum(len(images) for category, images in corpus.items() if category != "leaf")
+    caught = sum(count for category, count in rejected.items() if category != "leaf")
+    print(f"\nfalse rejects: {rejected['leaf']}/{len(leaves)} usable leaves ({rejected['leaf'] / len(leaves):.1%}); "
+          f"caught {caught}/{unusable} unusable images ({caught / unusable:.1%})")
+
+    predict_fn = load_predict_fn(args.model)
+    model_ms = []
+    for image in decoded[:args.runs]:
+        start = time.perf_counter()
+        predict_fn(preprocess_image(image))
+        model_ms.append((time.perf_counter() - start) * 1000)
+    gate_p, model_p = percentiles(gate_ms, (50, 99)), percentiles(model_ms, (50, 99))
+    print(f"\ngate:                     p50 {gate_p['p50']:.2f} ms, p99 {gate_p['p99']:.2f} ms per image")
+    print(f"preprocess + inference:   p50 {model_p['p50']:.1f} ms, p99 {model_p['p99']:.1f} ms per image")
+    catch_rate, false_rate = caught / unusable, rejected["leaf"] / len(leaves)
+    # Per upload: model time no longer spent on rejected images, minus the gate's own time on every image
+    saved = (args.unusable_share * catch_rate + (1 - args.unusable_share) * false_rate) * model_p["p50"]
+    print(f"with {args.unusable_share:.0%} unusable uploads the gate saves {saved - gate_p['p50']:.1f} ms of "
+          f"{model_p['p50']:.1f} ms per upload ({(saved - gate_p['p50']) / model_p['p50']:.1%}), "
+          f"and wrongly turns away {(1 - args.unusable_share) * false_rate:.1%} of uploads")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Page payload and render time: elements and bytes sent per rerun, and script time.
+
+Runs app.py under Streamlit's AppTest, as every rerun does: the page as a
+visitor sees it (main(), with no model in the working directory, so the
+upload section shows its error), and the results of one 7-class prediction
+(render_prediction). It counts the elements the script emits and the
+serialized size of their protos, which is what goes over the websocket on
+every rerun. Pass an older copy of the app to compare before and after:
+
+    git show HEAD~1:app.py > /tmp/app_before.py
+    python benchmarks/bench_render.py --apps /tmp/app_before.py app.py --runs 20
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from common import REPO_ROOT
+
+# Fail the model load straight away instead of polling a background loader
+os.environ["RICE_BACKGROUND_LOAD"] = "0"
+os.environ["RICE_MODEL_REGISTRY"] = os.path.join(tempfile.gettempdir(), "rice_no_registry")
+
+SCRIPT = """
+import importlib.util
+import sys
+import numpy as np
+import streamlit as st
+sys.path.insert(0, {repo_root!r})
+spec = importlib.util.spec_from_file_location("app_under_test", {path!r})
+app = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(app)
+if {scenario!r} == "page":
+    app.main()
+else:
+    predictions = [(name, p) for name, p in zip({class_names!r}, [81.3, 7.2, 4.1, 3.0, 2.2, 1.4, 0.8])]
+    with st.container():
+        app.render_prediction(np.full((224, 224, 3), 120, np.uint8), predictions[0][0], predictions[0][1], predictions)
+"""
+CLASS_NAMES = ["Brown Spot", "Leaf Blast", "Bacterial Blight", "Leaf Scald", "Sheath Blight", "Leaf Smut",
+               "Healthy Rice Leaf"]
+
+def walk(node):
+    yield node
+    for child in getattr(node, "children", {}).values():
+        yield from walk(child)
+
+def payload(root):
+    """(elements, serialized bytes) of everything under root"""
+    protos = [node.proto for node in walk(root) if getattr(node, "proto", None) is not None]
+    return len(protos), sum(proto.ByteSize() for proto in protos)
+
+def measure(path, scenario, runs):
+    from streamlit.testing.v1 import AppTest
+    script = SCRIPT.format(repo_root=REPO_ROOT, path=path, scenario=scenario, class_names=CLASS_NAMES)
+    at = AppTest.from_string(script, default_timeout=120)
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"{path} ({scenario}): {at.exception[0].message}")
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        at.run()
+        samples.append((time.perf_counter() - start) * 1000)
+    # For the prediction scenario only the results container counts, not the page CSS
+    root = at.main.children[len(at.main.children) - 1] if scenario == "prediction" else at._tree
+    elements, size = payload(root)
+    return elements, size, samples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--apps", nargs="+", default=[os.path.join(REPO_ROOT, "app.py")])
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    # Run from an empty directory so no model or registry is picked up
+    apps = [os.path.abspath(path) for path in args.apps]
+    os.chdir(tempfile.mkdtemp(prefix="rice_render_"))
+    print(f"{'app':<28}{'scenario':<12}{'elements':>9}{'KB':>9}{'p50 ms':>9}{'mean ms':>9}")
+    for path in apps:
+        for scenario in ("page", "prediction"):
+            elements, size, samples = measure(path, scenario, args.runs)
+            print(f"{os.path.basename(path):<28}{scenario:<12}{elements:>9}{size / 1024:>9.1f}"
+                  f"{np.median(samples):>9.1f}{np.mean(samples):>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Epoch time and disk footprint of the pre-decoded shards versus the raw image folder.
+
+Converts the dataset (incrementally, so a second run measures the no-op
+update), then times full passes over the training split (with augmentation)
+and the validation split for: ImageDataGenerator as in the notebook, the
+tf.data pipeline decoding JPEGs every epoch, and memory-mapped shards.
+
+Usage:
+    python benchmarks/bench_shards.py --dataset dataset/ --shards shards/ --epochs 2
+"""
+import argparse
+import os
+import time
+
+from common import REPO_ROOT  # noqa: F401  (puts the repo root on sys.path)
+
+from bench_input_pipeline import notebook_generator
+from shard_dataset import convert, make_shard_datasets
+from training_data import IMAGE_EXTENSIONS, make_datasets
+
+def folder_bytes(path, extensions=None):
+    total = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            if extensions is None or name.lower().endswith(extensions):
+                total += os.path.getsize(os.path.join(root, name))
+    return total
+
+def epoch_seconds(make_batches, epochs, steps=None):
+    """Mean wall time of a full pass, after one warm-up pass that is not counted"""
+    times = []
+    for epoch in range(epochs + 1):
+        start = time.perf_counter()
+        for step, _ in enumerate(make_batches()):
+            if steps is not None and step + 1 >= steps:
+                break
+        if epoch:
+            times.append(time.perf_counter() - start)
+    return sum(times) / len(times)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dataset", default="dataset/")
+    parser.add_argument("--shards", default="shards/")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--epochs", type=int, default=2, help="timed passes per pipeline")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    result = convert(args.dataset, args.shards)
+    print(f"Conversion: {result['encoded']} encoded, {result['unchanged']} unchanged "
+          f"in {time.perf_counter() - start:.1f}s")
+    raw_mb = folder_bytes(args.dataset, IMAGE_EXTENSIONS) / 2**20
+    shard_mb = folder_bytes(args.shards) / 2**20
+    print(f"Disk: raw folder {raw_mb:.1f} MB, shards {shard_mb:.1f} MB ({shard_mb / raw_mb:.2f}x)")
+
+    generator = notebook_generator(args.dataset, args.batch_size)
+    raw_train, raw_val, _ = make_datasets(args.dataset, batch_size=args.batch_size, cache=None)
+    shard_train, shard_val, _ = make_shard_datasets(args.shards, batch_size=args.batch_size)
+
+    rows = [
+        ("train: ImageDataGenerator", epoch_seconds(lambda: generator, args.epochs, len(generator))),
+        ("train: tf.data, decoding", epoch_seconds(lambda: raw_train, args.epochs)),
+        ("train: shards", epoch_seconds(lambda: shard_train, args.epochs)),
+        ("validation: tf.data, decoding", epoch_seconds(lambda: raw_val, args.epochs)),
+        ("validation: shards", epoch_seconds(lambda: shard_val, args.epochs)),
+    ]
+    for name, seconds in rows:
+        print(f"{name:<32}{seconds:>8.2f} s/epoch")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Similar-cases index: insert cost, memory, search latency and int8 recall.
+
+Uses random embeddings of the classifier head's width, so it runs without a
+model; search cost depends only on the number and size of the vectors.
+
+Usage:
+    python benchmarks/bench_similar.py --references 10000 50000 --queries 200
+"""
+import argparse
+import time
+
+import numpy as np
+
+from common import percentiles
+
+from similar_cases import EmbeddingIndex
+
+def build(embeddings, quantize, chunk=100):
+    index = EmbeddingIndex(embeddings.shape[1], quantize)
+    start = time.perf_counter()
+    for i in range(0, len(embeddings), chunk):
+        index.add(embeddings[i:i + chunk], ["label"] * len(embeddings[i:i + chunk]),
+                  [f"ref{j}" for j in range(i, i + len(embeddings[i:i + chunk]))])
+    return index, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--references", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    # ReLU activations are non-negative, like the Dense(128) embeddings
+    for n in args.references:
+        embeddings = np.maximum(rng.normal(size=(n, args.dim)), 0).astype(np.float32)
+        queries = embeddings[rng.integers(0, n, args.queries)] + rng.normal(scale=0.3, size=(args.queries, args.dim))
+        results = {}
+        for quantize in (False, True):
+            index, insert_s = build(embeddings, quantize)
+            samples, hits = [], []
+            for query in queries:
+                start = time.perf_counter()
+                hits.append([path for _, path, _ in index.search(query, args.k)])
+                samples.append((time.perf_counter() - start) * 1000)
+            results[quantize] = hits
+            p = percentiles(samples)
+            name = "int8" if quantize else "float32"
+            print(f"{n:>7} refs {name:<8} {index.nbytes / 2**20:>7.2f} MB  insert {insert_s * 1e6 / n:>6.1f} us/ref  "
+                  f"search p50 {p['p50']:.2f} ms  p99 {p['p99']:.2f} ms")
+        recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(results[False], results[True])])
+        print(f"{n:>7} refs int8 recall@{args.k} vs float32: {recall:.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Cold-start benchmark: import time, time to first render and time to first prediction.
+
+Every measurement runs in a fresh Python process, repeated --runs times,
+and the median is reported:
+
+- import: the modules app.py imports at startup, compared with the eager
+  tensorflow/keras/cv2/requests imports the page used to need
+- first render: one run of app.py under Streamlit's AppTest, i.e. the time
+  until the static page is sent, with the model loading in the background
+- first prediction: imports, model load and one prediction on a synthetic image
+
+Run it from the directory holding the model and class_names.json:
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from common import REPO_ROOT
+
+APP_IMPORTS = ("import streamlit, cascade, field_analysis, inference, metrics, model_loader, model_registry, "
+               "near_duplicates, page_html, prediction_cache, prediction_log, quality_gate, preprocessing, "
+               "similar_cases, tta, video_analysis, worker_pool")
+EAGER_IMPORTS = "import streamlit, tensorflow, cv2, requests; from tensorflow import keras"
+
+FIRST_RENDER = f"""
+import time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({os.path.join(REPO_ROOT, 'app.py')!r}, default_timeout=600)
+at.run()
+print(time.perf_counter() - start)
+"""
+
+FIRST_PREDICTION = """
+import time
+start = time.perf_counter()
+import json
+import numpy as np
+from inference import BACKEND, load_backend, predict_disease
+with open('class_names.json') as f:
+    class_names = json.load(f)
+_, predict_fn = load_backend(BACKEND)
+loaded = time.perf_counter()
+predict_disease(predict_fn, np.zeros((480, 640, 3), np.uint8), class_names)
+done = time.perf_counter()
+print(json.dumps({"load": loaded - start, "first_prediction": done - start}))
+"""
+
+def run_python(code):
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""),
+               TF_CPP_MIN_LOG_LEVEL="3")
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True, env=env)
+    return output.stdout.strip().splitlines()[-1] if output.stdout.strip() else ""
+
+def timed_import(statement):
+    return float(run_python(f"import time; s = time.perf_counter(); {statement}; print(time.perf_counter() - s)"))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    samples = {"import_app": [], "import_eager": [], "first_render": [], "model_load": [], "first_prediction": []}
+    for _ in range(args.runs):
+        samples["import_app"].append(timed_import(APP_IMPORTS))
+        samples["import_eager"].append(timed_import(EAGER_IMPORTS))
+        samples["first_render"].append(float(run_python(FIRST_RENDER)))
+        prediction = json.loads(run_python(FIRST_PREDICTION))
+        samples["model_load"].append(prediction["load"])
+        samples["first_prediction"].append(prediction["first_prediction"])
+
+    results = {name: float(np.median(values)) for name, values in samples.items()}
+    labels = {
+        "import_app": "import (app modules, lazy TF)",
+        "import_eager": "import (eager TF/keras/cv2/requests)",
+        "first_render": "time to first render",
+        "model_load": "imports + model load",
+        "first_prediction": "time to first prediction",
+    }
+    for name, seconds in results.items():
+        print(f"{labels[name]:<40}{seconds:>8.2f} s")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
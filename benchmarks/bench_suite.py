@@ -0,0 +1,250 @@
+"""Reproducible benchmark of the decode -> preprocess -> inference path, saved as JSON.
+
+Drives load_image, preprocess_image, the backend predict_fn and
+predict_disease with synthetic leaf-coloured photos at several resolutions
+and formats. Each backend and thread count runs in a fresh process, so
+thread pools and peak RSS are measured independently. Every stage reports
+p50/p95/p99 latency, throughput and peak RSS, and inference runs at several
+batch sizes. Without the trained model files a small stand-in MobileNetV2 of
+the same input and output shape is built (and exported to float16 TFLite),
+so the suite runs offline on any CPU-only Linux box. Stand-in numbers are
+only comparable with other stand-in runs.
+
+Usage:
+    python benchmarks/bench_suite.py --output bench_results.json
+    python benchmarks/bench_suite.py --output new.json --baseline bench_results.json --tolerance 0.15
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from common import current_rss_mb, peak_rss_mb, percentiles, reset_peak_rss, run_isolated
+
+from inference import BACKEND, MODEL_PATH, TFLITE_PATHS, backend_model_path, model_version
+
+RESOLUTIONS = ["640x480", "1920x1080", "4032x3024"]
+FORMATS = ["jpeg", "png", "webp"]
+BATCH_SIZES = [1, 8, 32]
+BACKENDS = ["keras"] + sorted(TFLITE_PATHS)
+# Fields that identify a row when comparing against a baseline
+ROW_KEY = ("backend", "threads", "stage", "image", "batch_size")
+
+def synthetic_image(width, height, fmt):
+    """Encode a smooth, leaf-coloured synthetic photo"""
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    image = np.empty((height, width, 3), np.uint8)
+    image[..., 0] = (60 + 40 * np.sin(x / 97.0)).astype(np.uint8)
+    image[..., 1] = (140 + 60 * np.cos(y / 131.0)).astype(np.uint8)
+    image[..., 2] = (50 + 30 * np.sin((x + y) / 53.0)).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format=fmt.upper(), **({"quality": 90} if fmt != "png" else {}))
+    return buffer.getvalue()
+
+def build_stand_in(directory, num_classes):
+    """Save an untrained MobileNetV2 (alpha 0.35) classifier and its float16 TFLite export; returns their paths"""
+    from tensorflow import keras
+    from tensorflow.keras import layers
+    from tensorflow.keras.applications import MobileNetV2
+    from export_tflite import convert_float16
+    keras.utils.set_random_seed(0)
+    model = keras.Sequential([
+        layers.Input((224, 224, 3)),
+        MobileNetV2(input_shape=(224, 224, 3), alpha=0.35, include_top=False, weights=None, pooling="avg"),
+        layers.Dense(num_classes, activation="softmax"),
+    ])
+    paths = {"keras": os.path.join(directory, os.path.basename(MODEL_PATH)),
+             "tflite_float16": os.path.join(directory, os.path.basename(TFLITE_PATHS["tflite_float16"]))}
+    model.save(paths["keras"])
+    # The converter prints every captured variable of the exported graph
+    with contextlib.redirect_stdout(io.StringIO()):
+        tflite_model = convert_float16(model)
+    with open(paths["tflite_float16"], "wb") as f:
+        f.write(tflite_model)
+    return paths
+
+def stage_row(stage, samples_ms, items_per_call, peak_mb, rss_before_mb, **fields):
+    seconds = sum(samples_ms) / 1000
+    return {
+        **fields,
+        "stage": stage,
+        "runs": len(samples_ms),
+        "mean_ms": float(np.mean(samples_ms)),
+        **{f"{name}_ms": value for name, value in percentiles(samples_ms, (50, 95, 99)).items()},
+        "throughput": len(samples_ms) * items_per_call / seconds if seconds else 0.0,
+        "peak_rss_mb": peak_mb,
+        "peak_rss_delta_mb": peak_mb - rss_before_mb,
+    }
+
+def timed(fn, runs):
+    """Latencies (ms) of runs calls after one warm-up call, and the peak RSS while they ran"""
+    fn()
+    reset_peak_rss()
+    before = current_rss_mb()
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples, peak_rss_mb(), before
+
+def run_config(backend, model_path, threads, images, batch_sizes, class_names, runs):
+    """Benchmark every stage for one backend and thread count; runs in its own process"""
+    os.environ["RICE_TFLITE_THREADS"] = str(threads)
+    if backend == "keras":
+        from worker_pool import configure_threads
+        configure_threads(threads, 1)
+    from inference import load_backend, predict_disease, preprocess_image
+    from preprocessing import load_image
+
+    start = time.perf_counter()
+    _, predict_fn = load_backend(backend, model_path)
+    load_s = time.perf_counter() - start
+    rows = [{"backend": backend, "threads": threads, "stage": "load", "image": None, "batch_size": None,
+             "load_s": load_s, "rss_mb": current_rss_mb()}]
+    common = {"backend": backend, "threads": threads}
+    for name, data in images.items():
+        image = load_image(data)
+        for stage, fn in (
+            ("decode", lambda: load_image(data)),
+            ("preprocess", lambda: preprocess_image(image)),
+            ("predict_disease", lambda: predict_disease(predict_fn, load_image(data), class_names)),
+        ):
+            samples, peak_mb, before = timed(fn, runs)
+            rows.append(stage_row(stage, samples, 1, peak_mb, before, image=name, batch_size=1, **common))
+
+    rng = np.random.default_rng(0)
+    for batch_size in batch_sizes:
+        batch = rng.integers(0, 256, (batch_size, 224, 224, 3), dtype=np.uint8)
+        samples, peak_mb, before = timed(lambda: predict_fn(batch), runs)
+        rows.append(stage_row("inference", samples, batch_size, peak_mb, before, image=None, batch_size=batch_size,
+                              **common))
+    return rows
+
+def compare(rows, baseline_rows, tolerance):
+    """Print p50 changes against a baseline run; returns the rows that got slower than tolerance allows"""
+    baseline = {tuple(row[k] for k in ROW_KEY): row for row in baseline_rows if "p50_ms" in row}
+    regressions = []
+    print(f"\n{'backend':<16}{'thr':>4} {'stage':<16}{'image':<16}{'batch':>6}{'base p50':>10}{'p50':>10}{'change':>9}")
+    for row in rows:
+        old = baseline.get(tuple(row[k] for k in ROW_KEY))
+        if old is None or "p50_ms" not in row:
+            continue
+        change = row["p50_ms"] / old["p50_ms"] - 1 if old["p50_ms"] else 0.0
+        flag = "  <-- slower" if change > tolerance else ""
+        if flag:
+            regressions.append(row)
+        print(f"{row['backend']:<16}{row['threads']:>4} {row['stage']:<16}{str(row['image'] or '-'):<16}"
+              f"{row['batch_size']:>6}{old['p50_ms']:>10.2f}{row['p50_ms']:>10.2f}{change:>+9.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    parser.add_argument("--resolutions", nargs="+", default=RESOLUTIONS, help="WIDTHxHEIGHT")
+    parser.add_argument("--formats", nargs="+", default=FORMATS, choices=FORMATS)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=BATCH_SIZES)
+    parser.add_argument("--threads", type=int, nargs="+", help="thread counts (default: 1 and all cores)")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--stand-in", action="store_true", help="use the stand-in model even if the trained one exists")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="earlier --output file to compare p50 latencies with")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="p50 slow-down that counts as a regression")
+    args = parser.parse_args()
+
+    class_names = None
+    if os.path.exists("class_names.json"):
+        with open("class_names.json", "r") as f:
+            class_names = json.load(f)
+    class_names = class_names or [f"class_{i}" for i in range(7)]
+    threads = args.threads or sorted({1, len(os.sched_getaffinity(0))})
+
+    stand_in = args.stand_in or not os.path.exists(MODEL_PATH)
+    stand_in_dir = tempfile.mkdtemp(prefix="rice_stand_in_") if stand_in else None
+    try:
+        if stand_in:
+            print(f"Using a stand-in model in {stand_in_dir}")
+            model_paths = build_stand_in(stand_in_dir, len(class_names))
+        else:
+            model_paths = {backend: backend_model_path(backend) for backend in BACKENDS}
+        model_versions = {backend: model_version(path) for backend, path in model_paths.items() if os.path.exists(path)}
+
+        images = {}
+        for resolution in args.resolutions:
+            width, height = (int(side) for side in resolution.split("x"))
+            for fmt in args.formats:
+                images[f"{resolution}.{fmt}"] = synthetic_image(width, height, fmt)
+
+        rows = []
+        for backend in args.backends:
+            model_path = model_paths.get(backend)
+            if model_path is None or not os.path.exists(model_path):
+                print(f"skipping {backend}: no model file")
+                continue
+            for count in threads:
+                print(f"{backend}, {count} thread(s)...", flush=True)
+                rows.extend(run_isolated(run_config, backend, model_path, count, images, args.batch_sizes,
+                                         class_names, args.runs))
+    finally:
+        if stand_in_dir is not None:
+            shutil.rmtree(stand_in_dir, ignore_errors=True)
+
+    import tensorflow as tf
+    report = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "host": platform.node(),
+            "platform": platform.platform(),
+            "cpus": len(os.sched_getaffinity(0)),
+            "python": sys.version.split()[0],
+            "tensorflow": tf.__version__,
+            "numpy": np.__version__,
+            "default_backend": BACKEND,
+            "stand_in_model": stand_in,
+            "model_versions": model_versions,
+            "runs": args.runs,
+            "image_bytes": {name: len(data) for name, data in images.items()},
+        },
+        "results": rows,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'backend':<16}{'thr':>4} {'stage':<16}{'image':<16}{'batch':>6}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'p99 ms':>9}{'per s':>9}{'peak MB':>9}")
+    for row in rows:
+        if row["stage"] == "load":
+            print(f"{row['backend']:<16}{row['threads']:>4} {'load':<16}{'-':<16}{'-':>6}"
+                  f"{row['load_s'] * 1000:>9.0f}{'':>27}{row['rss_mb']:>9.0f}")
+            continue
+        print(f"{row['backend']:<16}{row['threads']:>4} {row['stage']:<16}{str(row['image'] or '-'):<16}"
+              f"{row['batch_size']:>6}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}"
+              f"{row['throughput']:>9.1f}{row['peak_rss_mb']:>9.0f}")
+    end_to_end = [row for row in rows if row["stage"] == "predict_disease"]
+    if end_to_end:
+        slowest = max(end_to_end, key=lambda row: row["p95_ms"])
+        print(f"\nSlowest predict_disease p95: {slowest['p95_ms']:.0f} ms ({slowest['backend']}, {slowest['threads']} "
+              f"thread(s), {slowest['image']}); the page advertises <2s")
+    print(f"Saved {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("stand_in_model") != stand_in:
+            print("Warning: comparing a stand-in model run with a trained model run")
+        regressions = compare(rows, baseline["results"], args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) more than {args.tolerance:.0%} slower than the baseline")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
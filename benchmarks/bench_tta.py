@@ -0,0 +1,77 @@
+"""Test-time augmentation: latency per extra view and effect on unsure predictions.
+
+Times single-image prediction (as for one upload on the page) with 1 to 8
+views: building the views and the one forward pass over them. Then it
+reports the cost of each extra view over the plain prediction. With
+--dataset it also compares accuracy with and without TTA on the validation
+images whose plain confidence falls below --below.
+
+Usage:
+    python benchmarks/bench_tta.py --model rice_disease_classifier_final.keras --dataset dataset/
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from common import percentiles
+
+from inference import MODEL_PATH, build_predict_fn, build_serving_model, preprocess_images
+from preprocessing import load_image
+from training_data import list_image_files
+from tta import VIEWS, augmented_views, refine
+
+def time_views(predict_fn, image, num_views, runs):
+    samples, gather = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        views = augmented_views(image, num_views)[0]
+        gathered = time.perf_counter()
+        predict_fn(views).mean(axis=0)
+        samples.append((time.perf_counter() - start) * 1000)
+        gather.append((gathered - start) * 1000)
+    return samples, gather
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--dataset", help="measure accuracy on the unsure validation images of this dataset")
+    parser.add_argument("--class-names", default="class_names.json")
+    parser.add_argument("--below", type=float, default=60, help="confidence (%%) under which an image counts as unsure")
+    parser.add_argument("--views", type=int, default=len(VIEWS))
+    args = parser.parse_args()
+
+    from tensorflow import keras
+    predict_fn = build_predict_fn(build_serving_model(keras.models.load_model(args.model)))
+    image = np.random.default_rng(0).integers(0, 256, (1, 224, 224, 3), dtype=np.uint8)
+    time_views(predict_fn, image, len(VIEWS), 5)
+
+    print(f"{'views':>5}{'mean ms':>10}{'p50 ms':>9}{'p95 ms':>9}{'gather ms':>11}{'ms/extra view':>15}")
+    base = None
+    for num_views in range(1, len(VIEWS) + 1):
+        samples, gather = time_views(predict_fn, image, num_views, args.runs)
+        p = percentiles(samples)
+        base = p["p50"] if base is None else base
+        per_view = f"{(p['p50'] - base) / (num_views - 1):.2f}" if num_views > 1 else "-"
+        print(f"{num_views:>5}{np.mean(samples):>10.2f}{p['p50']:>9.2f}{p['p95']:>9.2f}{np.mean(gather):>11.3f}{per_view:>15}")
+
+    if args.dataset:
+        with open(args.class_names, 'r') as f:
+            class_names = json.load(f)
+        _, _, val_files, val_labels, _ = list_image_files(args.dataset, class_names)
+        batch = preprocess_images([load_image(path) for path in val_files])
+        labels = np.array(val_labels)
+        plain = predict_fn(batch)
+        unsure = plain.max(axis=1) * 100 < args.below
+        refined = refine(predict_fn, batch, plain, [(args.below, args.views)])
+        print(f"\n{int(unsure.sum())}/{len(batch)} validation images below {args.below:g}% confidence")
+        if unsure.any():
+            print(f"accuracy on them: plain {np.mean(plain[unsure].argmax(axis=1) == labels[unsure]):.1%}, "
+                  f"TTA with {args.views} views {np.mean(refined[unsure].argmax(axis=1) == labels[unsure]):.1%}")
+        print(f"overall accuracy: plain {np.mean(plain.argmax(axis=1) == labels):.1%}, "
+              f"TTA {np.mean(refined.argmax(axis=1) == labels):.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Video ingestion throughput and peak memory on a long synthetic clip.
+
+Writes a walk-through-like clip (camera panning over a field, with
+stretches where it stands still), then analyses it at several sample rates
+with and without near-duplicate skipping. Each case runs in a fresh
+process; peak memory is measured after the model has loaded, so it shows
+what the streaming itself costs.
+
+Usage:
+    python benchmarks/bench_video.py --minutes 5 --sample-fps 1 2 5
+"""
+import argparse
+import json
+import os
+import tempfile
+
+from common import current_rss_mb, peak_rss_mb, reset_peak_rss, run_isolated
+
+import cv2
+import numpy as np
+
+def write_clip(path, minutes, fps=30, size=(1280, 720)):
+    """Pan across a wide synthetic field for 20s, then hold still for 10s, repeatedly"""
+    width, height = size
+    rng = np.random.default_rng(0)
+    field = cv2.resize(rng.integers(0, 255, (height // 8, width // 4, 3), dtype=np.uint8), (width * 2, height))
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    x = 0
+    for i in range(int(minutes * 60 * fps)):
+        if (i // fps) % 30 < 20:
+            x = (x + 3) % width
+        writer.write(np.ascontiguousarray(field[:, x:x + width]))
+    writer.release()
+
+def measure(path, backend, sample_fps, diff_threshold):
+    from inference import load_backend
+    from video_analysis import analyze_video
+    with open("class_names.json", "r") as f:
+        class_names = json.load(f)
+    _, predict_fn = load_backend(backend)
+    reset_peak_rss()
+    before = current_rss_mb()
+    _, stats = analyze_video(predict_fn, path, class_names, sample_fps, diff_threshold)
+    stats["peak_added_mb"] = peak_rss_mb() - before
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=float, default=5)
+    parser.add_argument("--sample-fps", type=float, nargs="+", default=[1, 2, 5])
+    parser.add_argument("--diff-threshold", type=float, default=3)
+    parser.add_argument("--backend", default="keras")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "clip.mp4")
+        write_clip(path, args.minutes)
+        print(f"{args.minutes:g} min clip, {os.path.getsize(path) / 2**20:.0f} MB")
+        for sample_fps in args.sample_fps:
+            for threshold in (0, args.diff_threshold):
+                stats = run_isolated(measure, path, args.backend, sample_fps, threshold)
+                label = f"{sample_fps:g} fps, {'skip duplicates' if threshold else 'every sample'}"
+                print(f"{label:<28} {stats['analysed']:>5} analysed / {stats['sampled']:>5} sampled  "
+                      f"{stats['throughput_fps']:>6.0f} frames/s end to end  {stats['realtime_factor']:>5.1f}x realtime  "
+                      f"peak +{stats['peak_added_mb']:.0f} MB")
+
+if __name__ == "__main__":
+    main()
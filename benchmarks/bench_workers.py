@@ -0,0 +1,81 @@
+"""Throughput of the multi-process worker pool vs a single in-process model.
+
+The baseline is today's setup: one model with TensorFlow's default thread
+pools, called concurrently from many threads (one per Streamlit session).
+The pool runs with 1, 2, 4, ... workers up to the number of available cores.
+
+Usage:
+    python benchmarks/bench_workers.py --clients 32 --duration 10
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from common import percentiles
+
+from inference import BACKEND, load_backend
+from worker_pool import WorkerPool
+
+def drive(predict_fn, images, clients, duration):
+    latencies = []
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(offset):
+        i = offset
+        while time.monotonic() < stop_at:
+            start = time.perf_counter()
+            predict_fn(images[i % len(images)][None])
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+            i += 1
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(latencies) / (time.perf_counter() - start), percentiles(latencies, (50, 95))
+
+def worker_counts(cores):
+    counts, n = [], 1
+    while n < cores:
+        counts.append(n)
+        n *= 2
+    return counts + [cores]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", default=BACKEND)
+    parser.add_argument("--clients", type=int, default=32, help="concurrent callers")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=None)
+    args = parser.parse_args()
+
+    with open('class_names.json', 'r') as f:
+        num_classes = len(json.load(f))
+    images = np.random.default_rng(0).integers(0, 256, (64, 224, 224, 3), dtype=np.uint8)
+    cores = len(os.sched_getaffinity(0))
+
+    print(f"{'setup':<22}{'img/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    _, predict_fn = load_backend(args.backend)
+    throughput, stats = drive(predict_fn, images, args.clients, args.duration)
+    print(f"{'single model':<22}{throughput:>10.1f}{stats['p50']:>10.1f}{stats['p95']:>10.1f}")
+    del predict_fn
+
+    for workers in args.workers or worker_counts(cores):
+        pool = WorkerPool(workers, num_classes, args.backend)
+        try:
+            throughput, stats = drive(pool.predict, images, args.clients, args.duration)
+        finally:
+            pool.stop()
+        label = f"{pool.num_workers} workers x {cores // pool.num_workers} cores"
+        print(f"{label:<22}{throughput:>10.1f}{stats['p50']:>10.1f}{stats['p95']:>10.1f}")
+
+if __name__ == "__main__":
+    main()
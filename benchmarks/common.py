@@ -0,0 +1,56 @@
+"""Helpers shared by the benchmark scripts."""
+import multiprocessing
+import os
+import sys
+from queue import Empty
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+def percentiles(samples_ms, points=(50, 95, 99)):
+    return {f"p{p}": float(np.percentile(samples_ms, p)) for p in points}
+
+def _proc_status_mb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def reset_peak_rss():
+    # Linux only: writing 5 to clear_refs resets the VmHWM high-water mark
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+
+def peak_rss_mb():
+    return _proc_status_mb("VmHWM")
+
+def current_rss_mb():
+    return _proc_status_mb("VmRSS")
+
+def _call(fn, args, queue):
+    queue.put(fn(*args))
+
+def run_isolated(fn, *args):
+    """Run fn(*args) in a fresh spawned process and return its result.
+
+    Used so memory measurements of one case aren't skewed by another. fn must
+    be importable at module level.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_call, args=(fn, args, queue))
+    process.start()
+    while True:
+        try:
+            result = queue.get(timeout=1)
+            break
+        except Empty:
+            # A child that crashed (killed for memory, a segfault in a native library) never puts a result
+            if not process.is_alive() and queue.empty():
+                raise RuntimeError(f"{fn.__name__} exited with status {process.exitcode} before returning a result")
+    process.join()
+    return result
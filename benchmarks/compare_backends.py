@@ -0,0 +1,93 @@
+"""Accuracy parity, latency and memory of the Keras and TFLite backends.
+
+Every backend runs in its own process on the same uint8 images. Top-1
+agreement and probability drift are reported against the Keras model.
+
+Usage:
+    python export_tflite.py --dataset dataset/
+    python benchmarks/compare_backends.py --dataset dataset/ --images 500
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from common import current_rss_mb, peak_rss_mb, percentiles, run_isolated
+
+from inference import backend_model_path, load_backend, run_batches
+
+BACKENDS = ["keras", "tflite_float16", "tflite_int8"]
+
+def load_images(dataset_path, count, seed=0):
+    """Validation images resized to 224x224 uint8, or random images without a dataset"""
+    if dataset_path is None:
+        rng = np.random.default_rng(seed)
+        return rng.integers(0, 256, (count, 224, 224, 3), dtype=np.uint8)
+    from tensorflow.keras.preprocessing.image import ImageDataGenerator
+    generator = ImageDataGenerator(validation_split=0.2).flow_from_directory(
+        dataset_path,
+        target_size=(224, 224),
+        batch_size=count,
+        class_mode=None,
+        subset='validation',
+        shuffle=True,
+        seed=seed
+    )
+    return next(generator).astype(np.uint8)
+
+def run_backend(backend, images, latency_runs):
+    baseline_mb = current_rss_mb()
+    start = time.perf_counter()
+    _, predict_fn = load_backend(backend)
+    load_s = time.perf_counter() - start
+    loaded_mb = current_rss_mb()
+
+    probabilities = run_batches(predict_fn, images)
+    samples = []
+    for i in range(latency_runs):
+        image = images[i % len(images)][None]
+        start = time.perf_counter()
+        predict_fn(image)
+        samples.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "probabilities": probabilities,
+        "load_s": load_s,
+        "model_mb": os.path.getsize(backend_model_path(backend)) / 2**20,
+        "rss_load_mb": loaded_mb - baseline_mb,
+        "peak_rss_mb": peak_rss_mb(),
+        **percentiles(samples, (50, 95)),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dataset", default=None, help="dataset/<class>/ directory; random images when omitted")
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--latency-runs", type=int, default=100)
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    args = parser.parse_args()
+
+    images = load_images(args.dataset, args.images)
+    results = {}
+    for backend in args.backends:
+        if not os.path.exists(backend_model_path(backend)):
+            print(f"skipping {backend}: {backend_model_path(backend)} not found")
+            continue
+        results[backend] = run_isolated(run_backend, backend, images, args.latency_runs)
+
+    reference = results.get("keras")
+    print(f"{'backend':<16}{'size MB':>9}{'load s':>8}{'RSS MB':>8}{'peak MB':>9}{'p50 ms':>8}{'p95 ms':>8}"
+          f"{'top-1 agree':>13}{'max drift':>11}{'mean drift':>12}")
+    for backend, result in results.items():
+        agreement = max_drift = mean_drift = float("nan")
+        if reference is not None:
+            drift = np.abs(result["probabilities"] - reference["probabilities"])
+            agreement = (result["probabilities"].argmax(1) == reference["probabilities"].argmax(1)).mean()
+            max_drift, mean_drift = drift.max(), drift.mean()
+        print(f"{backend:<16}{result['model_mb']:>9.1f}{result['load_s']:>8.2f}{result['rss_load_mb']:>8.0f}"
+              f"{result['peak_rss_mb']:>9.0f}{result['p50']:>8.2f}{result['p95']:>8.2f}"
+              f"{agreement:>13.2%}{max_drift:>11.4f}{mean_drift:>12.5f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Load generator for serve.py: throughput and tail latency at several concurrency levels.
+
+Each client thread posts JPEG leaf images back to back for --duration
+seconds. Start the service first:
+
+    python serve.py --quiet &
+    python benchmarks/loadgen.py --url http://localhost:8000/predict --concurrency 1 4 16 64
+"""
+import argparse
+import io
+import threading
+import time
+import urllib.request
+
+import numpy as np
+from PIL import Image
+
+from common import percentiles
+
+def sample_images(count=16, size=(1024, 768), seed=0):
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        buffer = io.BytesIO()
+        Image.fromarray(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)).save(buffer, format="JPEG")
+        images.append(buffer.getvalue())
+    return images
+
+def run_level(url, images, concurrency, duration):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(offset):
+        i = offset
+        while time.monotonic() < stop_at:
+            request = urllib.request.Request(url, data=images[i % len(images)],
+                                             headers={"Content-Type": "image/jpeg"})
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=60) as response:
+                    response.read()
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    latencies.append(elapsed)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+            i += 1
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    return len(latencies) / wall, latencies, errors[0]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000/predict")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per concurrency level")
+    args = parser.parse_args()
+
+    images = sample_images()
+    print(f"{'clients':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for concurrency in args.concurrency:
+        throughput, latencies, errors = run_level(args.url, images, concurrency, args.duration)
+        stats = percentiles(latencies) if latencies else {"p50": 0, "p95": 0, "p99": 0}
+        print(f"{concurrency:>8}{throughput:>10.1f}{stats['p50']:>10.1f}{stats['p95']:>10.1f}"
+              f"{stats['p99']:>10.1f}{errors:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import os
+import threading
+
+import numpy as np
+
+from inference import build_predict_fn, build_serving_model, model_version
+from metrics import CASCADE_ROUTES, stage_timer
+
+# Small distilled model that answers first (see distill_student.py)
+STUDENT_PATH = "rice_disease_student.keras"
+# Cascade mode: the student answers when it is confident enough, the full model otherwise
+CASCADE = os.environ.get("RICE_CASCADE") == "1"
+# Student confidence (%) needed to skip the full model; 80 matches the page's "high confidence" band
+CASCADE_THRESHOLD = float(os.environ.get("RICE_CASCADE_THRESHOLD", "80"))
+
+class Cascade:
+    """Two-stage predictor: the student scores every image, the full model re-scores the unsure ones.
+
+    predict() has the same contract as a predict_fn. Images whose top student
+    probability is below threshold (a percentage) are sent to teacher_fn in
+    one batch and take its probabilities instead.
+    """
+
+    def __init__(self, student_fn, teacher_fn, threshold=CASCADE_THRESHOLD):
+        self.student_fn = student_fn
+        self.teacher_fn = teacher_fn
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.student_answers = 0
+        self.teacher_answers = 0
+
+    def predict(self, batch):
+        with stage_timer("student"):
+            probabilities = np.array(self.student_fn(batch), copy=True)
+        unsure = np.flatnonzero(probabilities.max(axis=1) * 100 < self.threshold)
+        if len(unsure):
+            with stage_timer("teacher"):
+                probabilities[unsure] = self.teacher_fn(batch[unsure])
+        answered_by_student = len(batch) - len(unsure)
+        CASCADE_ROUTES.labels("student").inc(answered_by_student)
+        CASCADE_ROUTES.labels("teacher").inc(len(unsure))
+        with self._lock:
+            self.student_answers += answered_by_student
+            self.teacher_answers += len(unsure)
+        return probabilities
+
+    def stats(self):
+        with self._lock:
+            total = self.student_answers + self.teacher_answers
+            return {
+                "student": self.student_answers,
+                "teacher": self.teacher_answers,
+                "student_share": self.student_answers / total if total else 0.0,
+            }
+
+def load_student(path=STUDENT_PATH):
+    """Compiled uint8 predict_fn for the student model"""
+    from tensorflow import keras
+    return build_predict_fn(build_serving_model(keras.models.load_model(path)))
+
+def cascade_version(version, student_path=STUDENT_PATH):
+    """Version of the cascade, so cached predictions of the full model alone aren't reused"""
+    return f"{version}+{model_version(student_path)}"
@@ -0,0 +1,144 @@
+"""Distil the trained classifier into a small student model for the cascade.
+
+The student is MobileNetV2 at width 0.35 running on 128x128 inputs (it
+resizes the usual 224x224 input itself). That is about a tenth of the full
+model's compute. It learns from the full model's softened probabilities
+(knowledge distillation with temperature T) plus a small weight on the true
+labels. The epoch that agrees best with the full model on the first half
+of every class's validation images is kept, because the cascade only needs
+the student to reproduce the full model's answer on the images where it is
+confident. The other half is held out for bench_cascade.py, so the
+agreement it reports isn't the one the checkpoint was picked on.
+
+Usage:
+    python distill_student.py --dataset dataset/ --epochs 15 --output rice_disease_student.keras
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from cascade import STUDENT_PATH
+from inference import MODEL_PATH
+from training_data import BATCH_SIZE, IMG_HEIGHT, IMG_WIDTH, files_dataset, list_image_files
+
+STUDENT_SIZE = 128
+STUDENT_ALPHA = 0.35
+EPOCHS = 15
+TEMPERATURE = 4.0
+# Weight of the hard-label loss; the rest is the distillation loss
+HARD_LABEL_WEIGHT = 0.1
+LEARNING_RATE = 0.001
+# Share of every class's validation images kept out of checkpoint selection
+HOLDOUT_SHARE = 0.5
+
+def split_holdout(files, labels, share=HOLDOUT_SHARE):
+    """(selection_files, selection_labels, holdout_files, holdout_labels), holding out the last share of each class"""
+    selection_files, selection_labels, holdout_files, holdout_labels = [], [], [], []
+    for label in sorted(set(labels)):
+        members = [path for path, member_label in zip(files, labels) if member_label == label]
+        split = len(members) - int(share * len(members))
+        selection_files += members[:split]
+        selection_labels += [label] * split
+        holdout_files += members[split:]
+        holdout_labels += [label] * (len(members) - split)
+    return selection_files, selection_labels, holdout_files, holdout_labels
+
+def build_student(num_classes, weights="imagenet"):
+    """Return (probability model, logit model) sharing the same layers"""
+    from tensorflow import keras
+    from tensorflow.keras import layers
+    from tensorflow.keras.applications import MobileNetV2
+    inputs = keras.Input((IMG_HEIGHT, IMG_WIDTH, 3))
+    x = layers.Resizing(STUDENT_SIZE, STUDENT_SIZE)(inputs)
+    base = MobileNetV2(input_shape=(STUDENT_SIZE, STUDENT_SIZE, 3), alpha=STUDENT_ALPHA,
+                       include_top=False, weights=weights, pooling="avg")
+    x = base(x)
+    x = layers.Dropout(0.2)(x)
+    logits = layers.Dense(num_classes, name="logits")(x)
+    probabilities = layers.Softmax()(logits)
+    return (keras.Model(inputs, probabilities, name="rice_disease_student"),
+            keras.Model(inputs, logits, name="rice_disease_student_logits"))
+
+def distill(teacher, student, student_logits, train_ds, val_ds, epochs=EPOCHS, temperature=TEMPERATURE,
+            hard_label_weight=HARD_LABEL_WEIGHT, learning_rate=LEARNING_RATE):
+    """Train the student on the teacher's softened outputs; keeps the weights of the best validation agreement"""
+    import tensorflow as tf
+    from tensorflow import keras
+    optimizer = keras.optimizers.Adam(learning_rate=learning_rate)
+    kl = keras.losses.KLDivergence()
+    cross_entropy = keras.losses.CategoricalCrossentropy(from_logits=True)
+
+    @tf.function
+    def train_step(images, labels):
+        teacher_probabilities = teacher(images, training=False)
+        # Soften the teacher through its log-probabilities, which equal its logits up to a constant
+        soft_targets = tf.nn.softmax(tf.math.log(teacher_probabilities + 1e-8) / temperature)
+        with tf.GradientTape() as tape:
+            logits = student_logits(images, training=True)
+            soft_loss = kl(soft_targets, tf.nn.softmax(logits / temperature)) * temperature ** 2
+            hard_loss = cross_entropy(labels, logits)
+            loss = (1 - hard_label_weight) * soft_loss + hard_label_weight * hard_loss
+        gradients = tape.gradient(loss, student_logits.trainable_variables)
+        optimizer.apply_gradients(zip(gradients, student_logits.trainable_variables))
+        return loss
+
+    @tf.function
+    def val_step(images):
+        return teacher(images, training=False), student(images, training=False)
+
+    best_agreement, best_weights = -1.0, None
+    for epoch in range(epochs):
+        start = time.perf_counter()
+        losses = [float(train_step(images, labels)) for images, labels in train_ds]
+        agree = correct = total = 0
+        for images, labels in val_ds:
+            teacher_probabilities, student_probabilities = val_step(images)
+            student_top = np.argmax(student_probabilities, axis=1)
+            agree += int(np.sum(student_top == np.argmax(teacher_probabilities, axis=1)))
+            correct += int(np.sum(student_top == np.argmax(labels, axis=1)))
+            total += len(student_top)
+        agreement = agree / total if total else 0.0
+        print(f"Epoch {epoch + 1}/{epochs}: loss {np.mean(losses):.4f}, agreement with teacher {agreement:.1%}, "
+              f"accuracy {correct / total if total else 0.0:.1%} ({time.perf_counter() - start:.0f}s)")
+        if agreement > best_agreement:
+            best_agreement, best_weights = agreement, student.get_weights()
+    student.set_weights(best_weights)
+    return best_agreement
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--teacher", default=MODEL_PATH)
+    parser.add_argument("--dataset", default="dataset/")
+    parser.add_argument("--class-names", default="class_names.json",
+                        help="JSON list giving the output class order; must match the teacher")
+    parser.add_argument("--weights", default="imagenet", help="starting MobileNetV2 weights, or none for random ones")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--temperature", type=float, default=TEMPERATURE)
+    parser.add_argument("--hard-label-weight", type=float, default=HARD_LABEL_WEIGHT)
+    parser.add_argument("--learning-rate", type=float, default=LEARNING_RATE)
+    parser.add_argument("--output", default=STUDENT_PATH)
+    args = parser.parse_args()
+
+    from tensorflow import keras
+    with open(args.class_names, 'r') as f:
+        class_names = json.load(f)
+    train_files, train_labels, val_files, val_labels, class_names = list_image_files(args.dataset, class_names)
+    selection_files, selection_labels, _, _ = split_holdout(val_files, val_labels)
+    train_ds = files_dataset(train_files, train_labels, len(class_names), args.batch_size, training=True)
+    val_ds = files_dataset(selection_files, selection_labels, len(class_names), args.batch_size)
+    teacher = keras.models.load_model(args.teacher)
+    weights = None if args.weights.lower() == "none" else args.weights
+    student, student_logits = build_student(len(class_names), weights)
+    print(f"Student: {student.count_params():,} parameters; teacher: {teacher.count_params():,}")
+
+    agreement = distill(teacher, student, student_logits, train_ds, val_ds, args.epochs, args.temperature,
+                        args.hard_label_weight, args.learning_rate)
+    student.save(args.output)
+    print(f"Saved {args.output} (agreement with teacher on the selection split {agreement:.1%}; "
+          f"bench_cascade.py reports it on the held-out one)")
+
+if __name__ == "__main__":
+    main()
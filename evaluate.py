@@ -0,0 +1,272 @@
+"""Streaming, resumable evaluation of the classifier on a labeled image set.
+
+Reads dataset/<class>/ folders (or a shard directory from shard_dataset.py),
+decodes images on a thread pool the same way the app does, runs them
+through the inference backend in batches and accumulates a confusion
+matrix as it goes, so memory stays flat however many images there are.
+Progress is checkpointed; re-running the same command after an
+interruption continues where it stopped, as long as the model and the
+image list are unchanged. The result is a JSON report:
+
+    {"model_version": "3f2a9c81d0e4", "images": 1500, "accuracy": 0.93,
+     "per_class": {"Brown Spot": {"precision": 0.95, "recall": 0.91, "f1": 0.93, "support": 214}, ...},
+     "confusion_matrix": [[...], ...], ...}
+
+Usage:
+    python evaluate.py --data dataset/ --report eval_report.json
+    python evaluate.py --data shards/ --subset validation --backend tflite_int8
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import UnidentifiedImageError
+
+from inference import BACKEND, backend_model_path, load_backend, model_version, preprocess_image
+from preprocessing import load_image
+from worker_pool import WORKERS, WorkerPool
+
+BATCH_SIZE = 64
+DECODE_WORKERS = min(8, os.cpu_count() or 1)
+# Batches decoded ahead of the one being scored
+PREFETCH_BATCHES = 2
+CHECKPOINT_EVERY = 50
+# Failed files listed in the report; the rest are only counted
+MAX_FAILED_PATHS = 100
+
+def list_labeled_images(data_path, subset="all"):
+    """Return (source, items, labels, label_names) for a dataset folder or shard directory.
+
+    items are file paths, or image indices for shards. subset="validation"
+    keeps only the 20% per class the notebook holds out.
+    """
+    if os.path.exists(os.path.join(data_path, "index.json")):
+        from shard_dataset import ShardedDataset
+        shards = ShardedDataset(data_path)
+        indices = np.arange(len(shards)) if subset == "all" else shards.split()[1]
+        return shards, list(indices), list(shards.labels[indices]), shards.class_names
+    from training_data import list_image_files
+    if subset == "all":
+        files, labels, _, _, label_names = list_image_files(data_path, validation_split=0)
+    else:
+        _, _, files, labels, label_names = list_image_files(data_path)
+    return None, files, labels, label_names
+
+def _decode(path):
+    try:
+        return preprocess_image(load_image(path))[0]
+    except (UnidentifiedImageError, OSError, ValueError):
+        return None
+
+def decoded_batches(source, items, batch_size=BATCH_SIZE, decode_workers=DECODE_WORKERS):
+    """Yield (positions, uint8 batch, failed positions) per batch of items, decoding ahead on a thread pool"""
+    batches = (range(start, min(start + batch_size, len(items))) for start in range(0, len(items), batch_size))
+    if source is not None:
+        for positions in batches:
+            yield list(positions), source.images([items[i] for i in positions]), []
+        return
+
+    with ThreadPoolExecutor(decode_workers, thread_name_prefix="eval-decode") as pool:
+        pending = deque()
+
+        def collect(positions, futures):
+            images = [future.result() for future in futures]
+            ok = [i for i, image in zip(positions, images) if image is not None]
+            failed = [i for i, image in zip(positions, images) if image is None]
+            batch = np.stack([image for image in images if image is not None]) if ok else None
+            return ok, batch, failed
+
+        for positions in batches:
+            pending.append((positions, [pool.submit(_decode, items[i]) for i in positions]))
+            if len(pending) > PREFETCH_BATCHES:
+                yield collect(*pending.popleft())
+        while pending:
+            yield collect(*pending.popleft())
+
+def classification_metrics(confusion, class_names):
+    """Accuracy and per-class precision/recall/F1 from a confusion matrix (rows = true labels)"""
+    confusion = np.asarray(confusion, dtype=np.int64)
+    true_positives = np.diag(confusion).astype(np.float64)
+    support = confusion.sum(axis=1)
+    predicted = confusion.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.nan_to_num(true_positives / predicted)
+        recall = np.nan_to_num(true_positives / support)
+        f1 = np.nan_to_num(2 * precision * recall / (precision + recall))
+    total = int(support.sum())
+    per_class = {
+        name: {"precision": float(precision[i]), "recall": float(recall[i]), "f1": float(f1[i]),
+               "support": int(support[i])}
+        for i, name in enumerate(class_names)
+    }
+    weights = support / total if total else np.zeros(len(class_names))
+    return {
+        "accuracy": float(true_positives.sum() / total) if total else 0.0,
+        "macro_avg": {"precision": float(precision.mean()), "recall": float(recall.mean()), "f1": float(f1.mean())},
+        "weighted_avg": {"precision": float(precision @ weights), "recall": float(recall @ weights),
+                         "f1": float(f1 @ weights)},
+        "per_class": per_class,
+    }
+
+def _items_digest(items):
+    digest = hashlib.sha256()
+    for item in items:
+        digest.update(f"{item}\n".encode())
+    return digest.hexdigest()[:16]
+
+def _save_json(path, payload):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+
+class EvaluationState:
+    """Everything needed to resume a run: position, confusion matrix and running totals"""
+
+    def __init__(self, num_classes, version, items_digest):
+        self.version = version
+        self.items_digest = items_digest
+        self.cursor = 0
+        self.confusion = np.zeros((num_classes, num_classes), dtype=np.int64)
+        self.log_loss_sum = 0.0
+        self.failed = 0
+        self.failed_paths = []
+        self.elapsed = 0.0
+
+    @classmethod
+    def load(cls, path, num_classes, version, items_digest):
+        """Resume from path if it belongs to the same model and image list, else start fresh"""
+        state = cls(num_classes, version, items_digest)
+        if not path or not os.path.exists(path):
+            return state
+        with open(path, "r") as f:
+            saved = json.load(f)
+        if saved["model_version"] != version or saved["items_digest"] != items_digest:
+            print(f"Ignoring checkpoint {path}: it is for another model or image list")
+            return state
+        state.cursor = saved["cursor"]
+        state.confusion = np.array(saved["confusion_matrix"], dtype=np.int64)
+        state.log_loss_sum = saved["log_loss_sum"]
+        state.failed = saved["failed"]
+        state.failed_paths = saved["failed_paths"]
+        state.elapsed = saved["elapsed_seconds"]
+        return state
+
+    def save(self, path):
+        _save_json(path, {
+            "model_version": self.version,
+            "items_digest": self.items_digest,
+            "cursor": self.cursor,
+            "confusion_matrix": self.confusion.tolist(),
+            "log_loss_sum": self.log_loss_sum,
+            "failed": self.failed,
+            "failed_paths": self.failed_paths,
+            "elapsed_seconds": self.elapsed,
+        })
+
+def evaluate(predict_fn, source, items, labels, state, batch_size=BATCH_SIZE, decode_workers=DECODE_WORKERS,
+             checkpoint_path=None, checkpoint_every=CHECKPOINT_EVERY):
+    """Score items[state.cursor:] into state, checkpointing every checkpoint_every batches"""
+    labels = np.asarray(labels, dtype=np.int64)
+    start = state.cursor
+    remaining = items[start:]
+    started = time.perf_counter() - state.elapsed
+    for batch_number, (positions, batch, failed) in enumerate(decoded_batches(source, remaining, batch_size, decode_workers), 1):
+        if positions:
+            probabilities = predict_fn(batch)
+            true = labels[start + np.asarray(positions)]
+            np.add.at(state.confusion, (true, probabilities.argmax(axis=1)), 1)
+            state.log_loss_sum += float(-np.log(np.clip(probabilities[np.arange(len(true)), true], 1e-7, 1.0)).sum())
+        state.failed += len(failed)
+        state.failed_paths += [str(remaining[i]) for i in failed][:MAX_FAILED_PATHS - len(state.failed_paths)]
+        state.cursor = start + max(positions + failed) + 1
+        state.elapsed = time.perf_counter() - started
+        if checkpoint_path and batch_number % checkpoint_every == 0:
+            state.save(checkpoint_path)
+            print(f"{state.cursor}/{len(items)} images, {state.cursor / state.elapsed:.1f} img/s")
+    if checkpoint_path:
+        state.save(checkpoint_path)
+    return state
+
+def build_report(state, class_names, backend, data_path, subset):
+    scored = int(state.confusion.sum())
+    report = {
+        "model_version": state.version,
+        "backend": backend,
+        "data": data_path,
+        "subset": subset,
+        "images": scored,
+        "failed": state.failed,
+        "failed_paths": state.failed_paths,
+        "log_loss": state.log_loss_sum / scored if scored else None,
+        "elapsed_seconds": round(state.elapsed, 3),
+        "images_per_second": round((scored + state.failed) / state.elapsed, 1) if state.elapsed else None,
+    }
+    report.update(classification_metrics(state.confusion, class_names))
+    report["class_names"] = class_names
+    report["confusion_matrix"] = state.confusion.tolist()
+    return report
+
+def print_report(report):
+    print(f"\n{'':<20}{'precision':>10}{'recall':>10}{'f1':>10}{'support':>10}")
+    for name, scores in report["per_class"].items():
+        print(f"{name:<20}{scores['precision']:>10.4f}{scores['recall']:>10.4f}{scores['f1']:>10.4f}{scores['support']:>10}")
+    print(f"\nAccuracy: {report['accuracy']:.4f} on {report['images']} images "
+          f"({report['failed']} unreadable), {report['images_per_second']} img/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="dataset/", help="dataset folder or shard directory")
+    parser.add_argument("--subset", choices=("all", "validation"), default="all")
+    parser.add_argument("--backend", default=BACKEND)
+    parser.add_argument("--class-names", default="class_names.json", help="JSON list of the model's output classes")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--decode-workers", type=int, default=DECODE_WORKERS)
+    parser.add_argument("--workers", type=int, default=WORKERS, help="run inference in this many core-pinned processes")
+    parser.add_argument("--checkpoint", default="eval_checkpoint.json")
+    parser.add_argument("--checkpoint-every", type=int, default=CHECKPOINT_EVERY, help="batches between checkpoints")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    parser.add_argument("--report", default="eval_report.json")
+    args = parser.parse_args()
+
+    with open(args.class_names, 'r') as f:
+        class_names = json.load(f)
+    source, items, labels, label_names = list_labeled_images(args.data, args.subset)
+    unknown = sorted(set(label_names) - set(class_names))
+    if unknown:
+        raise SystemExit(f"Folders {unknown} are not classes of the model ({args.class_names})")
+    # Folder labels are alphabetical; the model's outputs follow class_names
+    labels = [class_names.index(label_names[label]) for label in labels]
+
+    version = model_version(backend_model_path(args.backend))
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    state = EvaluationState.load(args.checkpoint, len(class_names), version, _items_digest(items))
+    if state.cursor:
+        print(f"Resuming at image {state.cursor} of {len(items)}")
+
+    if args.workers:
+        predictor = WorkerPool(args.workers, len(class_names), args.backend, max_batch_size=args.batch_size)
+        predict_fn = predictor.predict
+    else:
+        predictor = None
+        _, predict_fn = load_backend(args.backend)
+    try:
+        evaluate(predict_fn, source, items, labels, state, args.batch_size, args.decode_workers,
+                 args.checkpoint, args.checkpoint_every)
+    finally:
+        if predictor is not None:
+            predictor.stop()
+
+    report = build_report(state, class_names, args.backend, args.data, args.subset)
+    _save_json(args.report, report)
+    print_report(report)
+    print(f"Report written to {args.report}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Export the trained Keras classifier to float16 and int8 TFLite models.
+
+The int8 model is calibrated on a representative dataset drawn the same way
+as the notebook's training data: ImageDataGenerator(rescale=1./255,
+validation_split=0.2).flow_from_directory over dataset/<class>/.
+
+Usage:
+    python export_tflite.py --model rice_disease_classifier_final.keras --dataset dataset/
+"""
+import argparse
+
+import tensorflow as tf
+from tensorflow import keras
+from tensorflow.keras.preprocessing.image import ImageDataGenerator
+
+from inference import IMG_SIZE, MODEL_PATH, TFLITE_PATHS
+
+def representative_dataset(dataset_path, num_samples=200, seed=42):
+    """Yield single rescaled training images for int8 calibration"""
+    datagen = ImageDataGenerator(rescale=1./255, validation_split=0.2)
+    generator = datagen.flow_from_directory(
+        dataset_path,
+        target_size=IMG_SIZE,
+        batch_size=1,
+        class_mode=None,
+        subset='training',
+        shuffle=True,
+        seed=seed
+    )
+
+    def gen():
+        for _ in range(min(num_samples, generator.samples)):
+            yield [next(generator).astype('float32')]
+
+    return gen
+
+def convert_float16(model):
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.target_spec.supported_types = [tf.float16]
+    return converter.convert()
+
+def convert_int8(model, dataset_path, num_samples):
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset(dataset_path, num_samples)
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.uint8
+    converter.inference_output_type = tf.uint8
+    return converter.convert()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--dataset", default="dataset/")
+    parser.add_argument("--samples", type=int, default=200, help="representative images used for int8 calibration")
+    parser.add_argument("--float16-out", default=TFLITE_PATHS["tflite_float16"])
+    parser.add_argument("--int8-out", default=TFLITE_PATHS["tflite_int8"])
+    args = parser.parse_args()
+
+    model = keras.models.load_model(args.model)
+
+    with open(args.float16_out, "wb") as f:
+        f.write(convert_float16(model))
+    print(f"Saved {args.float16_out}")
+
+    with open(args.int8_out, "wb") as f:
+        f.write(convert_int8(model, args.dataset, args.samples))
+    print(f"Saved {args.int8_out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""Cached frozen-backbone features for fast training of the classifier head.
+
+The notebook freezes the MobileNetV2 base, so its pooled output for an image
+never changes between epochs. This computes it once per image (and,
+optionally, for a fixed number of augmented views), stores it in a
+memory-mapped float32 array on disk keyed by file path and content hash,
+and trains the Dense(256)/Dense(128)/softmax head on the cached features.
+Running it again after adding photos only sends the new or changed files
+through the backbone.
+
+Usage:
+    python feature_store.py --dataset dataset/ --store features/ --augmented-views 2
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+from training_data import BATCH_SIZE, IMG_HEIGHT, IMG_WIDTH, augment_batch, list_image_files, load_image
+
+# Width of MobileNetV2's GlobalAveragePooling2D output
+FEATURE_DIM = 1280
+EPOCHS = 50
+LEARNING_RATE = 0.001
+
+def file_digest(path):
+    """Content hash of an image file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class FeatureStore:
+    """Append-only float32 feature rows in a raw file, memory-mapped for reading.
+
+    index.json maps each file path to its content hash and the rows of its
+    views (view 0 is the unaugmented image). A file whose hash changed is
+    recomputed; a renamed file with the same content reuses its rows. Rows of
+    changed files stay in features.f32 until the store directory is deleted.
+    backbone names the weights the features came from (see backbone_fingerprint).
+    """
+
+    def __init__(self, directory, backbone, feature_dim=FEATURE_DIM):
+        self.directory = directory
+        self.feature_dim = feature_dim
+        self.backbone = backbone
+        self._features_path = os.path.join(directory, "features.f32")
+        self._index_path = os.path.join(directory, "index.json")
+        self._memmap = None
+        os.makedirs(directory, exist_ok=True)
+        self.entries = {}
+        if os.path.exists(self._index_path):
+            with open(self._index_path, "r") as f:
+                index = json.load(f)
+            if index["backbone"] != backbone or index["feature_dim"] != feature_dim:
+                raise ValueError(f"{directory} holds {index['backbone']} features, not {backbone}; use another store")
+            self.entries = index["entries"]
+        self._by_hash = {entry["hash"]: entry["rows"] for entry in self.entries.values()}
+        # Rows past the last saved index are leftovers of an interrupted run and get overwritten
+        self.num_rows = max((row for entry in self.entries.values() for row in entry["rows"]), default=-1) + 1
+
+    def rows(self, path, digest):
+        """Rows already computed for this content, or an empty list"""
+        entry = self.entries.get(path)
+        if entry is not None and entry["hash"] == digest:
+            return entry["rows"]
+        return list(self._by_hash.get(digest, []))
+
+    def append(self, paths, digests, features):
+        """Store one new view of each file; features is (len(paths), feature_dim)"""
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        with open(self._features_path, "r+b" if os.path.exists(self._features_path) else "wb") as f:
+            f.seek(self.num_rows * self.feature_dim * 4)
+            f.write(features.tobytes())
+            f.truncate()
+        for row, (path, digest) in enumerate(zip(paths, digests), start=self.num_rows):
+            rows = self.rows(path, digest) + [row]
+            self.entries[path] = {"hash": digest, "rows": rows}
+            self._by_hash[digest] = rows
+        self.num_rows += len(paths)
+        self._memmap = None
+
+    def features(self, rows):
+        """Gather feature rows from the memory-mapped array"""
+        if self._memmap is None:
+            self._memmap = np.memmap(self._features_path, dtype=np.float32, mode="r",
+                                     shape=(self.num_rows, self.feature_dim))
+        return self._memmap[np.asarray(rows, dtype=np.int64)]
+
+    def save(self):
+        index = {"backbone": self.backbone, "feature_dim": self.feature_dim, "entries": self.entries}
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self._index_path)
+
+def backbone_fingerprint(backbone):
+    """Hash of the backbone's weights, so features from different weights never mix"""
+    digest = hashlib.sha256()
+    for weight in backbone.get_weights():
+        digest.update(np.ascontiguousarray(weight).tobytes())
+    return f"{backbone.name}-{digest.hexdigest()[:12]}"
+
+def build_backbone(weights="imagenet"):
+    """The notebook's frozen MobileNetV2 base followed by global average pooling"""
+    from tensorflow.keras.applications import MobileNetV2
+    backbone = MobileNetV2(input_shape=(IMG_HEIGHT, IMG_WIDTH, 3), include_top=False, weights=weights, pooling="avg")
+    backbone.trainable = False
+    return backbone
+
+def build_head(num_classes, feature_dim=FEATURE_DIM):
+    """The notebook's classifier head, taking pooled backbone features as input"""
+    from tensorflow.keras import layers, models
+    return models.Sequential([
+        layers.Input((feature_dim,)),
+        layers.Dense(256, activation='relu'),
+        layers.Dropout(0.5),
+        layers.Dense(128, activation='relu'),
+        layers.Dropout(0.3),
+        layers.Dense(num_classes, activation='softmax')
+    ])
+
+def build_full_model(backbone, head):
+    """Backbone plus trained head as one image model, loadable by the app.
+
+    The head's layers are laid out flat after the backbone, as in the
+    notebook's model, so the penultimate layer is still the 128-d feature
+    layer similar_cases.py embeds with.
+    """
+    from tensorflow.keras import layers, models
+    return models.Sequential([layers.Input((IMG_HEIGHT, IMG_WIDTH, 3)), backbone, *head.layers])
+
+def compute_features(backbone, paths, augmented=False, batch_size=BATCH_SIZE):
+    """Run images through the backbone, rescaled by 1/255 as in the notebook"""
+    import tensorflow as tf
+    ds = tf.data.Dataset.from_tensor_slices(paths)
+    ds = ds.map(load_image, num_parallel_calls=tf.data.AUTOTUNE)
+    ds = ds.batch(batch_size).map(lambda images: tf.cast(images, tf.float32) * (1.0 / 255))
+    if augmented:
+        ds = ds.map(augment_batch, num_parallel_calls=tf.data.AUTOTUNE)
+    ds = ds.prefetch(tf.data.AUTOTUNE)
+    return np.concatenate([backbone(images, training=False).numpy() for images in ds])
+
+def update_store(store, backbone, paths, num_views=1, batch_size=BATCH_SIZE):
+    """Make sure every file has num_views cached views; returns (rows per file, images computed)"""
+    paths = [os.path.normpath(path) for path in paths]
+    digests = [file_digest(path) for path in paths]
+    computed = 0
+    for view in range(num_views):
+        missing = [i for i, (path, digest) in enumerate(zip(paths, digests)) if len(store.rows(path, digest)) <= view]
+        for start in range(0, len(missing), 1024):
+            chunk = missing[start:start + 1024]
+            chunk_paths = [paths[i] for i in chunk]
+            features = compute_features(backbone, chunk_paths, augmented=view > 0, batch_size=batch_size)
+            store.append(chunk_paths, [digests[i] for i in chunk], features)
+            # Save after every chunk so an interrupted run keeps what it computed
+            store.save()
+            computed += len(chunk)
+    return [store.rows(path, digest)[:num_views] for path, digest in zip(paths, digests)], computed
+
+def train_head(store, train_rows, train_labels, val_rows, val_labels, num_classes, epochs=EPOCHS,
+               learning_rate=LEARNING_RATE, batch_size=BATCH_SIZE):
+    """Fit the head on cached features: every view of the training files, view 0 of the validation files"""
+    from tensorflow import keras
+    from tensorflow.keras.callbacks import EarlyStopping
+    x_train = store.features([row for rows in train_rows for row in rows])
+    y_train = keras.utils.to_categorical([label for rows, label in zip(train_rows, train_labels) for _ in rows], num_classes)
+    validation_data = None
+    if val_rows:
+        x_val = store.features([rows[0] for rows in val_rows])
+        validation_data = (x_val, keras.utils.to_categorical(val_labels, num_classes))
+
+    head = build_head(num_classes, store.feature_dim)
+    head.compile(
+        optimizer=keras.optimizers.Adam(learning_rate=learning_rate),
+        loss='categorical_crossentropy',
+        metrics=['accuracy']
+    )
+    callbacks = []
+    if validation_data is not None:
+        callbacks.append(EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True, verbose=1))
+    history = head.fit(x_train, y_train, validation_data=validation_data, epochs=epochs, batch_size=batch_size,
+                       shuffle=True, callbacks=callbacks, verbose=2)
+    return head, history
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dataset", default="dataset/")
+    parser.add_argument("--store", default="features/", help="directory of the feature store")
+    parser.add_argument("--augmented-views", type=int, default=0,
+                        help="augmented views cached per training image, on top of the plain one")
+    parser.add_argument("--class-names", help="JSON list giving the output class order (default: alphabetical)")
+    parser.add_argument("--weights", default="imagenet", help="MobileNetV2 weights, or none for random ones")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--learning-rate", type=float, default=LEARNING_RATE)
+    parser.add_argument("--output", default="rice_disease_classifier_retrained.keras",
+                        help="where to save the model; publish it with model_registry.py to serve it")
+    args = parser.parse_args()
+
+    class_names = None
+    if args.class_names:
+        with open(args.class_names, 'r') as f:
+            class_names = json.load(f)
+    train_files, train_labels, val_files, val_labels, class_names = list_image_files(args.dataset, class_names)
+    print(f"Class order: {class_names}")
+
+    weights = None if args.weights.lower() == "none" else args.weights
+    backbone = build_backbone(weights)
+    store = FeatureStore(args.store, backbone_fingerprint(backbone))
+    start = time.perf_counter()
+    train_rows, train_computed = update_store(store, backbone, train_files, 1 + args.augmented_views, args.batch_size)
+    val_rows, val_computed = update_store(store, backbone, val_files, 1, args.batch_size)
+    print(f"Features: {train_computed + val_computed} views computed, "
+          f"{len(train_files) + len(val_files)} files in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    head, _ = train_head(store, train_rows, train_labels, val_rows, val_labels, len(class_names),
+                         args.epochs, args.learning_rate, args.batch_size)
+    print(f"Head trained in {time.perf_counter() - start:.1f}s")
+
+    build_full_model(backbone, head).save(args.output)
+    print(f"Saved {args.output}; serve it with: python model_registry.py publish {args.output}")
+
+if __name__ == "__main__":
+    main()
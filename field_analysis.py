@@ -0,0 +1,137 @@
+"""Tiled analysis of high-resolution field photos.
+
+preprocess_image squashes the whole frame to 224x224, so on a drone or
+wide-angle shot a lesion a few dozen pixels across disappears. Here the
+full-resolution image is cut into overlapping tiles, which are strided views
+into the decoded image rather than copies. The tiles are classified in
+fixed-size batches through the same predict_fn as uploads. The result is a
+per-class probability heatmap over the field and a summary of how much of
+it each class covers.
+"""
+import os
+
+import numpy as np
+
+from inference import IMG_SIZE
+from metrics import stage_timer
+from preprocessing import to_rgb_array
+
+# Tile edge in image pixels (resized to the model input if different) and the step between tiles
+TILE_SIZE = int(os.environ.get("RICE_TILE_SIZE", "224"))
+TILE_STRIDE = int(os.environ.get("RICE_TILE_STRIDE", "168"))
+# Tiles per forward pass; only this many tiles are ever copied out of the image at once. The model's
+# activations for the batch dominate memory (roughly 15 MB per tile), so this stays small.
+TILE_BATCH_SIZE = int(os.environ.get("RICE_TILE_BATCH_SIZE", "16"))
+# A tile counts towards a class's share of the field when its top class is at least this confident
+TILE_CONFIDENCE = 0.5
+HEALTHY_CLASS = "Healthy Rice Leaf"
+# Longest side of the preview the heatmap is drawn on
+PREVIEW_SIZE = 1024
+
+def tile_starts(length, tile=TILE_SIZE, stride=TILE_STRIDE):
+    """Tile offsets along one axis, with the last tile flush with the far edge"""
+    if length <= tile:
+        return [0]
+    starts = list(range(0, length - tile + 1, stride))
+    if starts[-1] != length - tile:
+        starts.append(length - tile)
+    return starts
+
+def tile_views(array, tile=TILE_SIZE):
+    """Every tile x tile window of an HxWx3 array; windows[y, x] is a view, nothing is copied"""
+    windows = np.lib.stride_tricks.sliding_window_view(array, (tile, tile), axis=(0, 1))
+    return windows.transpose(0, 1, 3, 4, 2)
+
+def analyze_field(predict_fn, image, class_names, tile=TILE_SIZE, stride=TILE_STRIDE, batch_size=TILE_BATCH_SIZE):
+    """Classify overlapping tiles of a large image.
+
+    Returns a dict with the (rows, cols, num_classes) tile probabilities, the
+    tile offsets, the analysed image size and the field summary.
+    """
+    import cv2
+    array = to_rgb_array(image)
+    height, width = array.shape[:2]
+    if min(height, width) < tile:
+        scale = tile / min(height, width)
+        array = cv2.resize(array, (max(tile, round(width * scale)), max(tile, round(height * scale))))
+        height, width = array.shape[:2]
+
+    rows, cols = tile_starts(height, tile, stride), tile_starts(width, tile, stride)
+    windows = tile_views(array, tile)
+    positions = [(y, x) for y in rows for x in cols]
+    probabilities = np.empty((len(positions), len(class_names)), dtype=np.float32)
+    batch = np.empty((min(batch_size, len(positions)), IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.uint8)
+    for start in range(0, len(positions), batch_size):
+        chunk = positions[start:start + batch_size]
+        with stage_timer("preprocess"):
+            for i, (y, x) in enumerate(chunk):
+                if tile == IMG_SIZE[0] == IMG_SIZE[1]:
+                    batch[i] = windows[y, x]
+                else:
+                    cv2.resize(windows[y, x], IMG_SIZE, dst=batch[i])
+        with stage_timer("inference"):
+            probabilities[start:start + len(chunk)] = predict_fn(batch[:len(chunk)])
+
+    probabilities = probabilities.reshape(len(rows), len(cols), len(class_names))
+    return {
+        "probabilities": probabilities,
+        "row_starts": rows,
+        "col_starts": cols,
+        "tile_size": tile,
+        "image_size": (width, height),
+        "summary": field_summary(probabilities, class_names),
+    }
+
+def field_summary(probabilities, class_names, confidence=TILE_CONFIDENCE):
+    """Share of confident tiles per class, mean and peak probability, and the affected share of the field"""
+    flat = probabilities.reshape(-1, len(class_names))
+    top = flat.argmax(axis=1)
+    confident = flat.max(axis=1) >= confidence
+    classes = []
+    for i, name in enumerate(class_names):
+        classes.append({
+            "class": name,
+            "tile_share": float(np.mean(confident & (top == i)) * 100),
+            "mean_probability": float(flat[:, i].mean() * 100),
+            "max_probability": float(flat[:, i].max() * 100),
+        })
+    classes.sort(key=lambda c: (c["tile_share"], c["mean_probability"]), reverse=True)
+    healthy = class_names.index(HEALTHY_CLASS) if HEALTHY_CLASS in class_names else -1
+    return {
+        "tiles": len(flat),
+        "affected_share": float(np.mean(confident & (top != healthy)) * 100),
+        "classes": classes,
+    }
+
+def field_preview(image, max_side=PREVIEW_SIZE):
+    """Downscaled copy of the image to draw heatmaps on"""
+    import cv2
+    array = to_rgb_array(image)
+    scale = min(1.0, max_side / max(array.shape[:2]))
+    if scale == 1.0:
+        return array
+    return cv2.resize(array, (round(array.shape[1] * scale), round(array.shape[0] * scale)), interpolation=cv2.INTER_AREA)
+
+def heatmap(analysis, class_index, size):
+    """Per-pixel probability of one class at size (width, height), averaging overlapping tiles"""
+    width, height = size
+    scale_x = width / analysis["image_size"][0]
+    scale_y = height / analysis["image_size"][1]
+    total = np.zeros((height, width), dtype=np.float32)
+    count = np.zeros((height, width), dtype=np.float32)
+    tile = analysis["tile_size"]
+    for r, y in enumerate(analysis["row_starts"]):
+        y0, y1 = int(y * scale_y), max(int((y + tile) * scale_y), int(y * scale_y) + 1)
+        for c, x in enumerate(analysis["col_starts"]):
+            x0, x1 = int(x * scale_x), max(int((x + tile) * scale_x), int(x * scale_x) + 1)
+            total[y0:y1, x0:x1] += analysis["probabilities"][r, c, class_index]
+            count[y0:y1, x0:x1] += 1
+    return total / np.maximum(count, 1)
+
+def heatmap_overlay(preview, analysis, class_index, alpha=0.45):
+    """Blend a colour-mapped class heatmap over the preview image"""
+    import cv2
+    heat = heatmap(analysis, class_index, (preview.shape[1], preview.shape[0]))
+    colors = cv2.applyColorMap((heat * 255).astype(np.uint8), cv2.COLORMAP_JET)
+    colors = cv2.cvtColor(colors, cv2.COLOR_BGR2RGB)
+    return cv2.addWeighted(preview, 1 - alpha, colors, alpha, 0)
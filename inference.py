@@ -0,0 +1,147 @@
+import hashlib
+import os
+
+import numpy as np
+
+from metrics import IMAGES_PREDICTED, PREDICTIONS, stage_timer
+from preprocessing import to_rgb_array
+
+# Input size the classifier was trained on
+IMG_SIZE = (224, 224)
+
+# Trained model and its TFLite exports (see export_tflite.py)
+MODEL_PATH = "rice_disease_classifier_final.keras"
+TFLITE_PATHS = {
+    "tflite_float16": "rice_disease_classifier_float16.tflite",
+    "tflite_int8": "rice_disease_classifier_int8.tflite",
+}
+
+# Inference backend: "keras", "tflite_float16" or "tflite_int8"
+BACKEND = os.environ.get("RICE_BACKEND", "keras")
+
+# Number of images sent through the model in one forward pass in batch mode
+BATCH_SIZE = int(os.environ.get("RICE_BATCH_SIZE", "32"))
+
+# TensorFlow and OpenCV are imported inside the functions that need them, so
+# importing this module (e.g. for the page to start rendering) stays cheap.
+
+def model_version(model_path):
+    """Short content hash of a model file, used to tell model builds apart"""
+    digest = hashlib.sha256()
+    with open(model_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+def preprocess_image(image, target_size=IMG_SIZE):
+    """Preprocess uploaded image for prediction.
+
+    Returns a (1, height, width, 3) uint8 batch; rescaling to [0, 1] happens
+    inside the serving model (see build_serving_model).
+    """
+    import cv2
+    img_array = to_rgb_array(image)
+    img_resized = cv2.resize(img_array, target_size)
+    img_batch = np.expand_dims(img_resized, axis=0)
+    return img_batch
+
+def preprocess_images(images, target_size=IMG_SIZE):
+    """Preprocess several images straight into one preallocated uint8 batch"""
+    import cv2
+    batch = np.empty((len(images), target_size[1], target_size[0], 3), dtype=np.uint8)
+    for i, image in enumerate(images):
+        cv2.resize(to_rgb_array(image), target_size, dst=batch[i])
+    return batch
+
+def build_serving_model(model, target_size=IMG_SIZE):
+    """Wrap the trained model so it takes uint8 pixels and rescales them in-graph.
+
+    The notebook trains on images rescaled by 1/255, so this is the same
+    computation as feeding img / 255.0, without a float copy on the host.
+    """
+    from tensorflow import keras
+    inputs = keras.Input(shape=(target_size[1], target_size[0], 3), dtype="uint8", name="image")
+    x = keras.layers.Rescaling(1.0 / 255, dtype="float32")(keras.ops.cast(inputs, "float32"))
+    outputs = model(x, training=False)
+    return keras.Model(inputs, outputs, name=f"{model.name}_uint8")
+
+def build_predict_fn(model, target_size=IMG_SIZE, warm_up=True):
+    """Compile a fixed-signature inference function for a uint8 serving model.
+
+    model.predict builds a new data adapter and step function on every call,
+    which costs more than the forward pass itself for one image on CPU. The
+    tf.function here is traced once for any batch size and then reused.
+    """
+    import tensorflow as tf
+    input_shape = (None, target_size[1], target_size[0], 3)
+
+    @tf.function(input_signature=[tf.TensorSpec(input_shape, tf.uint8)])
+    def infer(images):
+        return model(images, training=False)
+
+    if warm_up:
+        # Trace the graph now so the first user doesn't pay for it
+        infer(tf.zeros((1,) + input_shape[1:], tf.uint8))
+
+    def predict_fn(batch):
+        return infer(tf.convert_to_tensor(batch, tf.uint8)).numpy()
+
+    return predict_fn
+
+def backend_model_path(backend=BACKEND):
+    """Model file used by an inference backend"""
+    if backend == "keras":
+        return MODEL_PATH
+    if backend not in TFLITE_PATHS:
+        raise ValueError(f"Unknown backend {backend!r}, expected 'keras' or one of {sorted(TFLITE_PATHS)}")
+    return TFLITE_PATHS[backend]
+
+def load_backend(backend=BACKEND, model_path=None):
+    """Load the model for a backend and return (keras_model, predict_fn).
+
+    keras_model is None for TFLite backends. model_path overrides the
+    backend's default model file.
+    """
+    model_path = model_path or backend_model_path(backend)
+    if backend == "keras":
+        from tensorflow import keras
+        model = keras.models.load_model(model_path)
+        return model, build_predict_fn(build_serving_model(model))
+    from tflite_backend import build_tflite_predict_fn
+    return None, build_tflite_predict_fn(model_path)
+
+def format_prediction(probabilities, class_names):
+    """Turn one row of class probabilities into (class, confidence, sorted predictions)"""
+    predicted_class_idx = np.argmax(probabilities)
+    confidence = probabilities[predicted_class_idx] * 100
+
+    # Get all predictions sorted
+    all_predictions = [(class_names[i], probabilities[i] * 100) for i in range(len(class_names))]
+    all_predictions.sort(key=lambda x: x[1], reverse=True)
+
+    return class_names[predicted_class_idx], confidence, all_predictions
+
+def run_batches(predict_fn, batch, batch_size=BATCH_SIZE):
+    """Run a preprocessed batch through predict_fn in chunks of batch_size"""
+    if len(batch) <= batch_size:
+        return predict_fn(batch)
+    return np.concatenate([predict_fn(batch[i:i + batch_size]) for i in range(0, len(batch), batch_size)], axis=0)
+
+def predict_diseases(predict_fn, images, class_names, batch_size=BATCH_SIZE):
+    """Make predictions on several uploaded images with one batched forward pass"""
+    if not images:
+        return []
+    with stage_timer("preprocess"):
+        processed_images = preprocess_images(images)
+    with stage_timer("inference"):
+        predictions = run_batches(predict_fn, processed_images, batch_size)
+    with stage_timer("postprocess"):
+        results = [format_prediction(row, class_names) for row in predictions]
+    IMAGES_PREDICTED.inc(len(results))
+    for predicted_class, _, _ in results:
+        PREDICTIONS.labels(predicted_class).inc()
+    return results
+
+def predict_disease(predict_fn, image, class_names):
+    """Make prediction on uploaded image"""
+    return predict_diseases(predict_fn, [image], class_names)[0]
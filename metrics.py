@@ -0,0 +1,60 @@
+import contextlib
+import contextvars
+import os
+import time
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+# Port for the Prometheus /metrics endpoint of the Streamlit app (unset = don't serve)
+METRICS_PORT = int(os.environ["RICE_METRICS_PORT"]) if os.environ.get("RICE_METRICS_PORT") else None
+
+STAGES = ("decode", "gate", "dedupe", "preprocess", "inference", "student", "teacher", "tta", "postprocess", "render")
+
+STAGE_SECONDS = Histogram(
+    "rice_stage_seconds",
+    "Time spent in each stage of the prediction path",
+    ["stage"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+IMAGES_PREDICTED = Counter("rice_images_predicted_total", "Images run through the model")
+PREDICTIONS = Counter("rice_predictions_total", "Predictions returned, by predicted class", ["predicted_class"])
+CACHE_LOOKUPS = Counter("rice_cache_lookups_total", "Prediction cache lookups, by result", ["result"])
+CASCADE_ROUTES = Counter("rice_cascade_routes_total", "Images answered by each cascade stage", ["stage"])
+PREDICTION_LOG_RECORDS = Counter("rice_prediction_log_records_total", "Prediction log records, by outcome", ["outcome"])
+QUALITY_CHECKS = Counter("rice_quality_checks_total", "Quality gate results: ok, or the check an image failed", ["check"])
+WORKER_RESTARTS = Counter("rice_worker_restarts_total", "Inference worker processes restarted after dying")
+TTA_VIEWS = Counter("rice_tta_views_total", "Extra test-time augmentation views run through the model")
+MODEL_LOAD_SECONDS = Gauge("rice_model_load_seconds", "Time taken to load the model and build its predict function", ["backend"])
+
+# Per-run timings for the debug panel; None outside record_stages()
+_current_timings = contextvars.ContextVar("rice_stage_timings", default=None)
+
+@contextlib.contextmanager
+def stage_timer(stage):
+    """Time a block, observe it in the stage histogram and the current record_stages() dict"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        timings = _current_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+@contextlib.contextmanager
+def record_stages():
+    """Collect the stage timings of one page run or request into a dict of seconds"""
+    timings = {}
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+def start_metrics_server(port=METRICS_PORT):
+    """Serve /metrics on its own port; returns False when no port is configured"""
+    if port is None:
+        return False
+    start_http_server(port)
+    return True
@@ -0,0 +1,94 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+# Micro-batching limits for the HTTP service
+MAX_BATCH_SIZE = int(os.environ.get("RICE_MAX_BATCH_SIZE", "32"))
+MAX_WAIT_MS = float(os.environ.get("RICE_MAX_WAIT_MS", "5"))
+
+class MicroBatcher:
+    """Gather concurrent single-image requests into one forward pass.
+
+    submit() queues a preprocessed (1, H, W, 3) batch and returns a Future for
+    its probability row. A background thread takes the first waiting request,
+    then keeps collecting until it has max_batch_size images or max_wait_ms
+    has passed since that first request, and runs predict_fn once on the
+    stacked batch.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        self.batches = 0
+        self.images = 0
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, batch):
+        if self._stopped.is_set():
+            raise RuntimeError("MicroBatcher is stopped")
+        future = Future()
+        self._queue.put((batch, future))
+        return future
+
+    def predict(self, batch, timeout=None):
+        return self.submit(batch).result(timeout)
+
+    def stop(self):
+        self._stopped.set()
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return []
+        pending = [first]
+        size = len(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    def _run(self):
+        while not self._stopped.is_set():
+            pending = self._collect()
+            if not pending:
+                continue
+            try:
+                batch = np.concatenate([item[0] for item in pending], axis=0)
+                predictions = self.predict_fn(batch)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.images += len(batch)
+            offset = 0
+            for item, future in pending:
+                future.set_result(predictions[offset:offset + len(item)])
+                offset += len(item)
+        # Fail whatever is still queued after stop()
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].set_exception(RuntimeError("MicroBatcher is stopped"))
@@ -0,0 +1,109 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Load the model in a background thread so the page renders right away
+BACKGROUND_LOAD = os.environ.get("RICE_BACKGROUND_LOAD", "1") != "0"
+# Port for the /healthz and /readyz probes of the Streamlit app (unset = don't serve)
+HEALTH_PORT = int(os.environ["RICE_HEALTH_PORT"]) if os.environ.get("RICE_HEALTH_PORT") else None
+
+class BackgroundLoader:
+    """Run a slow load function once, in a background thread, and report its state.
+
+    state is "loading", "ready" or "failed"; result() blocks until the load
+    finishes and returns its value, or raises the error it failed with.
+    """
+
+    def __init__(self, load_fn, name="model-loader"):
+        self._load_fn = load_fn
+        self._done = threading.Event()
+        self._value = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self.started_at = time.time()
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self._value = self._load_fn()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished_at = time.time()
+            self._done.set()
+
+    @property
+    def state(self):
+        if not self._done.is_set():
+            return "loading"
+        return "failed" if self.error is not None else "ready"
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def result(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise TimeoutError("Model is still loading")
+        if self.error is not None:
+            raise self.error
+        return self._value
+
+    def status(self):
+        finished = self.finished_at or time.time()
+        return {
+            "state": self.state,
+            "load_seconds": round(finished - self.started_at, 3) if self.started_at else None,
+            "error": str(self.error) if self.error is not None else None,
+        }
+
+def _health_handler(loader, health_fn):
+    class HealthHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/healthz":
+                self._send(200, {"status": "ok"})
+            elif self.path == "/readyz":
+                status = loader.status()
+                ready = status["state"] == "ready"
+                if ready and health_fn is not None:
+                    status.update(health_fn())
+                    ready = status["healthy"]
+                self._send(200 if ready else 503, status)
+            else:
+                self._send(404, {"error": "not found"})
+
+        def _send(self, code, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return HealthHandler
+
+def start_health_server(loader, port=HEALTH_PORT, health_fn=None):
+    """Serve /healthz (liveness) and /readyz (200 once the model is loaded, 503 before).
+
+    health_fn, if given, returns a dict with a "healthy" flag that /readyz
+    also requires once the model is loaded, e.g. the state of worker pools.
+    """
+    if port is None:
+        return None
+    server = ThreadingHTTPServer(("0.0.0.0", port), _health_handler(loader, health_fn))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="health-server", daemon=True).start()
+    return server
@@ -0,0 +1,307 @@
+"""Versioned model registry with hot swapping for the running app.
+
+Each version is a directory under the registry holding the model file
+(under the same name as in the repository root, e.g.
+rice_disease_classifier_final.keras, plus any TFLite exports) and its
+class_names.json. active.json names the version being served and the
+versions before it. The app watches that file. When it changes, the new
+version is loaded and smoke-tested in a background thread while the old
+one keeps serving, then swapped in with a single reference assignment.
+Each page run takes the current model once, so a run in flight finishes on
+the model it started with. The previous version stays loaded, so a
+rollback swaps back at once without reloading. An older version is closed
+once the last run using it has finished.
+
+Usage:
+    python model_registry.py publish retrained.keras --class-names class_names.json
+    python model_registry.py list
+    python model_registry.py rollback
+    python model_registry.py activate 3f2a9c81d0e4
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from inference import BACKEND, IMG_SIZE, MODEL_PATH, backend_model_path, model_version
+
+# Registry directory; the app only uses it once it has an active.json
+REGISTRY_DIR = os.environ.get("RICE_MODEL_REGISTRY", "models")
+# How often the app checks active.json for a new version
+POLL_SECONDS = float(os.environ.get("RICE_REGISTRY_POLL_SECONDS", "2"))
+ACTIVE_FILE = "active.json"
+CLASS_NAMES_FILE = "class_names.json"
+
+logger = logging.getLogger(__name__)
+
+class ModelRegistry:
+    """Version directories plus an active.json pointer, updated atomically"""
+
+    def __init__(self, directory=REGISTRY_DIR):
+        self.directory = directory
+
+    def exists(self):
+        return os.path.exists(os.path.join(self.directory, ACTIVE_FILE))
+
+    def version_dir(self, version):
+        return os.path.join(self.directory, version)
+
+    def model_path(self, version, backend=BACKEND):
+        return os.path.join(self.version_dir(version), os.path.basename(backend_model_path(backend)))
+
+    def class_names_path(self, version):
+        return os.path.join(self.version_dir(version), CLASS_NAMES_FILE)
+
+    def versions(self):
+        """Published versions, oldest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        versions = [name for name in os.listdir(self.directory) if os.path.exists(self.class_names_path(name))]
+        return sorted(versions, key=lambda name: os.path.getmtime(self.version_dir(name)))
+
+    def active(self):
+        """{"version": ..., "history": [older versions, most recent last]}, or None before the first activation"""
+        try:
+            with open(os.path.join(self.directory, ACTIVE_FILE), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_active(self, state):
+        path = os.path.join(self.directory, ACTIVE_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def activate(self, version):
+        """Serve version from now on, remembering the current one for rollback"""
+        if not os.path.exists(self.class_names_path(version)):
+            raise ValueError(f"Unknown model version {version!r}; published: {', '.join(self.versions()) or 'none'}")
+        state = self.active() or {"version": None, "history": []}
+        if state["version"] == version:
+            return
+        if state["version"] is not None:
+            state["history"].append(state["version"])
+        self._write_active({"version": version, "history": state["history"], "activated_at": time.time()})
+
+    def rollback(self):
+        """Go back to the version served before the current one; returns it"""
+        state = self.active()
+        if not state or not state["history"]:
+            raise ValueError("No earlier version to roll back to")
+        version = state["history"].pop()
+        self._write_active({"version": version, "history": state["history"], "activated_at": time.time()})
+        return version
+
+    def publish(self, model_path, class_names_path, version=None, extra_files=()):
+        """Copy a model and its class names into a new version directory; returns the version.
+
+        The model is stored under the name the keras backend expects, and
+        extra files (e.g. TFLite exports) under their own names. The version
+        defaults to the model's content hash, as shown by the app.
+        """
+        version = version or model_version(model_path)
+        target = self.version_dir(version)
+        if os.path.exists(target):
+            raise ValueError(f"Version {version!r} is already published")
+        os.makedirs(self.directory, exist_ok=True)
+        # Copy into a temporary directory and rename it, so a watcher never sees half a version
+        tmp_dir = os.path.join(self.directory, f".{version}.tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        shutil.copy2(model_path, os.path.join(tmp_dir, os.path.basename(MODEL_PATH)))
+        shutil.copy2(class_names_path, os.path.join(tmp_dir, CLASS_NAMES_FILE))
+        for path in extra_files:
+            shutil.copy2(path, os.path.join(tmp_dir, os.path.basename(path)))
+        os.replace(tmp_dir, target)
+        return version
+
+def smoke_test(predict_fn, num_classes, batch_size=4):
+    """Run a fixed batch through a freshly loaded model and check its outputs look like probabilities"""
+    rng = np.random.default_rng(0)
+    batch = rng.integers(0, 256, (batch_size, IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.uint8)
+    batch[0] = 128
+    probabilities = np.asarray(predict_fn(batch))
+    if probabilities.shape != (batch_size, num_classes):
+        raise ValueError(f"Smoke test: expected output shape {(batch_size, num_classes)}, got {probabilities.shape}")
+    if not np.all(np.isfinite(probabilities)):
+        raise ValueError("Smoke test: model returned non-finite probabilities")
+    if not np.allclose(probabilities.sum(axis=1), 1.0, atol=1e-3):
+        raise ValueError("Smoke test: output rows don't sum to 1")
+
+class ModelWatcher:
+    """Holds the model being served and swaps in registry versions as they are activated.
+
+    load_fn(model_path, class_names_path, version) returns the loaded model
+    (any object) and should raise if it fails validation. current is
+    replaced in one assignment, so readers see either the old or the new
+    model, never a mix. Without a registry the default model files are
+    loaded once and never swapped. close_fn, if given, releases a model
+    that is neither current nor previous any more, as soon as no caller
+    of serving() is still using it.
+    """
+
+    def __init__(self, load_fn, registry=None, interval=POLL_SECONDS, close_fn=None, backend=BACKEND):
+        self.load_fn = load_fn
+        self.registry = registry
+        self.interval = interval
+        self.close_fn = close_fn
+        self.backend = backend
+        self.current = None
+        self.version = None
+        self.previous = None
+        self.previous_version = None
+        self.error = None
+        self.swapped_at = None
+        self._failed_version = None
+        self._stop = threading.Event()
+        self._thread = None
+        # Callers inside serving() per model (by id), and retired models waiting for theirs to finish
+        self._lock = threading.Lock()
+        self._users = {}
+        self._retired = {}
+
+    def load_initial(self):
+        if self.registry is None:
+            model_path = backend_model_path(self.backend)
+            self.version = model_version(model_path)
+            self.current = self.load_fn(model_path, CLASS_NAMES_FILE, self.version)
+        else:
+            version = self.registry.active()["version"]
+            self.current = self._load(version)
+            self.version = version
+        self.swapped_at = time.time()
+        return self
+
+    def _load(self, version):
+        return self.load_fn(self.registry.model_path(version, self.backend),
+                            self.registry.class_names_path(version), version)
+
+    def poll(self):
+        """Swap to the registry's active version if it changed; returns True on a swap"""
+        state = self.registry.active()
+        version = state["version"] if state else None
+        if version is None or version == self.version or version == self._failed_version:
+            return False
+        if version == self.previous_version:
+            # Rollback (or roll forward) to the model still in memory
+            loaded = self.previous
+        else:
+            try:
+                loaded = self._load(version)
+            except Exception as e:
+                self.error = f"{version}: {e}"
+                self._failed_version = version
+                logger.error("Not swapping to model %s: %s", version, e)
+                return False
+        retired = self.previous if self.previous_version != version else None
+        with self._lock:
+            self.previous, self.previous_version = self.current, self.version
+            self.current, self.version = loaded, version
+            if retired is not None:
+                self._retired[id(retired)] = retired
+        self.error = None
+        self._failed_version = None
+        self.swapped_at = time.time()
+        logger.info("Now serving model %s (previous: %s)", version, self.previous_version)
+        if retired is not None:
+            self._close_if_unused(retired)
+        return True
+
+    @contextlib.contextmanager
+    def serving(self):
+        """The current model, kept open until the block exits even if it is swapped out meanwhile"""
+        with self._lock:
+            model = self.current
+            self._users[id(model)] = self._users.get(id(model), 0) + 1
+        try:
+            yield model
+        finally:
+            with self._lock:
+                self._users[id(model)] -= 1
+                if not self._users[id(model)]:
+                    del self._users[id(model)]
+            self._close_if_unused(model)
+
+    def _close_if_unused(self, model):
+        with self._lock:
+            if id(model) not in self._retired or id(model) in self._users:
+                return
+            del self._retired[id(model)]
+        if self.close_fn is not None:
+            # Stopping worker processes can take a while; the last user shouldn't wait for it
+            threading.Thread(target=self.close_fn, args=(model,), name="model-close", daemon=True).start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                self.error = str(e)
+                logger.exception("Checking the model registry failed")
+
+    def start(self):
+        """Load the active version, then keep watching the registry in a background thread"""
+        self.load_initial()
+        if self.registry is not None:
+            self._thread = threading.Thread(target=self._run, name="model-registry-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def status(self):
+        return {
+            "version": self.version,
+            "previous_version": self.previous_version,
+            "swapped_at": self.swapped_at,
+            "error": self.error,
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--registry", default=REGISTRY_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    publish = commands.add_parser("publish", help="add a model version and (by default) serve it")
+    publish.add_argument("model")
+    publish.add_argument("--class-names", default=CLASS_NAMES_FILE)
+    publish.add_argument("--version", help="version name (default: the model's content hash)")
+    publish.add_argument("--extra", nargs="*", default=[], help="other files of this version, e.g. TFLite exports")
+    publish.add_argument("--no-activate", action="store_true")
+    activate = commands.add_parser("activate", help="serve a published version")
+    activate.add_argument("version")
+    commands.add_parser("rollback", help="serve the version before the current one again")
+    commands.add_parser("list", help="show published versions")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    registry = ModelRegistry(args.registry)
+    if args.command == "publish":
+        version = registry.publish(args.model, args.class_names, args.version, args.extra)
+        logger.info("Published %s", version)
+        if not args.no_activate:
+            registry.activate(version)
+            logger.info("Activated %s", version)
+    elif args.command == "activate":
+        registry.activate(args.version)
+        logger.info("Activated %s", args.version)
+    elif args.command == "rollback":
+        logger.info("Rolled back to %s", registry.rollback())
+    else:
+        state = registry.active() or {"version": None, "history": []}
+        for version in registry.versions():
+            marker = "*" if version == state["version"] else " "
+            print(f"{marker} {version}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Perceptual-hash lookup of near-duplicate uploads, so a re-shot or re-sent leaf reuses its prediction.
+
+The hash is a 64-bit DCT hash (pHash) of a 32x32 grayscale thumbnail: one
+bit per low-frequency coefficient, set when it is above the median. JPEG
+re-compression, resizing and brightness changes flip only a few bits,
+while different leaves differ in about half of them. Crops shift every
+coefficient, so only crops of a few percent stay within reach. The hash
+is taken from the image load_image has already decoded, so a duplicate
+costs no extra decode and skips preprocessing and the model.
+
+The index keeps the last RICE_DUPLICATE_INDEX_SIZE hashes of one model
+version in a ring buffer of uint64 values, and searches all of them at
+once with XOR and a vectorized popcount.
+"""
+import os
+import threading
+
+import numpy as np
+from PIL import Image
+
+# Largest Hamming distance (of 64 bits) at which an image counts as a near-duplicate; negative turns reuse off
+MAX_DISTANCE = int(os.environ.get("RICE_DUPLICATE_DISTANCE", "4"))
+# Hashes remembered per model version; the oldest are overwritten first
+INDEX_SIZE = int(os.environ.get("RICE_DUPLICATE_INDEX_SIZE", "10000"))
+HASH_SIZE = 8
+THUMBNAIL_SIZE = 32
+
+def _dct_matrix(n):
+    """Orthonormal DCT-II matrix, so the 2-D DCT of x is D @ x @ D.T"""
+    k = np.arange(n)[:, None]
+    matrix = np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix.astype(np.float32)
+
+_DCT = _dct_matrix(THUMBNAIL_SIZE)[:HASH_SIZE]
+_BIT_WEIGHTS = np.uint64(1) << np.arange(HASH_SIZE * HASH_SIZE, dtype=np.uint64)
+
+def perceptual_hash(image):
+    """64-bit pHash of a PIL image as a Python int"""
+    thumbnail = image.convert("L").resize((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.BOX)
+    low = _DCT @ np.asarray(thumbnail, dtype=np.float32) @ _DCT.T
+    # The DC term only tracks overall brightness, so it is left out of the median
+    bits = (low > np.median(low.ravel()[1:])).ravel()
+    return int(np.bitwise_or.reduce(_BIT_WEIGHTS[bits]))
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+class NearDuplicateIndex:
+    """Ring buffer of recent hashes and their predictions, searched by Hamming distance"""
+
+    def __init__(self, capacity=INDEX_SIZE, max_distance=MAX_DISTANCE):
+        self.capacity = capacity
+        self.max_distance = max_distance
+        self._hashes = np.zeros(capacity, dtype=np.uint64)
+        self._results = [None] * capacity
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, image_hash, result):
+        with self._lock:
+            self._hashes[self._next] = image_hash
+            self._results[self._next] = result
+            self._next = (self._next + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def search(self, image_hash):
+        """(result, distance) of the closest stored hash within max_distance, or None"""
+        if self.max_distance < 0:
+            return None
+        with self._lock:
+            if self._size == 0:
+                self.misses += 1
+                return None
+            distances = np.bitwise_count(self._hashes[:self._size] ^ np.uint64(image_hash))
+            best = int(distances.argmin())
+            distance = int(distances[best])
+            if distance > self.max_distance:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._results[best], distance
+
+    def match_batch(self, hashes):
+        """Where each image of a batch can take its prediction from.
+
+        Returns one entry per hash: None when the image has to go through
+        the model, (result, distance) for a match in the index, or
+        (position, distance) when it is a near-duplicate of an earlier
+        image of the same batch that does go through the model.
+        """
+        matches = []
+        unique = []
+        for image_hash in hashes:
+            match = self.search(image_hash)
+            if match is None and self.max_distance >= 0:
+                for position in unique:
+                    distance = hamming(image_hash, hashes[position])
+                    if distance <= self.max_distance:
+                        match = (position, distance)
+                        break
+            if match is None:
+                unique.append(len(matches))
+            matches.append(match)
+        return matches
+
+    def stats(self):
+        return {"entries": self._size, "hits": self.hits, "misses": self.misses, "max_distance": self.max_distance}
@@ -0,0 +1,544 @@
+"""Static HTML and CSS of the page, rendered once per process.
+
+Streamlit re-executes app.py on every rerun and sends every element again,
+so the page's fixed parts are built here, where module caching makes them
+one-time work. The CSS is minified and each static section is a single
+string, so it is one element over the websocket instead of several. The
+per-prediction cards are likewise joined into one element.
+"""
+import re
+
+CSS = """
+    <style>
+    /* Import Google Fonts */
+    @import url('https://fonts.googleapis.com/css2?family=Playfair+Display:wght@700;900&family=Inter:wght@300;400;500;600;700&display=swap');
+    
+    /* Global Styles */
+    .stApp {
+        background: #0B1D26;
+    }
+    
+    /* Hide Streamlit branding */
+    #MainMenu {visibility: hidden;}
+    footer {visibility: hidden;}
+    header {visibility: hidden;}
+    
+    /* Hero Section */
+    .hero-section {
+        position: relative;
+        width: 115%;
+        height: 100vh;
+        min-height: 800px;
+        overflow: hidden;
+        background: linear-gradient(330.24deg, rgba(11, 29, 38, 0.4) 31.06%, #0B1D26 108.93%),
+                    url('https://images.unsplash.com/photo-1574943320219-553eb213f72d?w=1920&h=1200&fit=crop') center/cover;
+        display: flex;
+        align-items: center;
+        justify-content: center;
+        margin: -6rem -5rem 2rem -5rem;
+        padding: 0;
+    }
+    
+    .hero-overlay {
+        position: absolute;
+        top: 0;
+        left: 0;
+        width: 100%;
+        height: 100%;
+        background: linear-gradient(180deg, rgba(11, 29, 38, 0.3) 0%, rgba(11, 29, 38, 0.8) 100%);
+        z-index: 1;
+    }
+    
+    .hero-content {
+        position: relative;
+        z-index: 2;
+        max-width: 950px;
+        padding: 0 2rem;
+        animation: fadeInUp 1s ease-out;
+    }
+    
+    @keyframes fadeInUp {
+        from {
+            opacity: 0;
+            transform: translateY(30px);
+        }
+        to {
+            opacity: 1;
+            transform: translateY(0);
+        }
+    }
+    
+    .hero-badge {
+        display: inline-block;
+        padding: 8px 20px;
+        background: rgba(255, 255, 255, 0.1);
+        backdrop-filter: blur(10px);
+        border-radius: 50px;
+        color: #FBD784;
+        font-size: 0.9rem;
+        font-weight: 600;
+        letter-spacing: 3px;
+        text-transform: uppercase;
+        margin-bottom: 2rem;
+        border: 1px solid rgba(251, 215, 132, 0.3);
+    }
+    
+    .hero-title {
+        font-family: 'Playfair Display', serif;
+        font-size: 5rem;
+        font-weight: 900;
+        color: #FFFFFF;
+        line-height: 1.1;
+        margin: 0 0 1.5rem 0;
+        text-shadow: 2px 4px 20px rgba(0, 0, 0, 0.5);
+    }
+    
+    .hero-subtitle {
+        font-family: 'Inter', sans-serif;
+        font-size: 1.3rem;
+        font-weight: 300;
+        color: rgba(255, 255, 255, 0.8);
+        line-height: 1.6;
+        margin-bottom: 2.5rem;
+        max-width: 700px;
+    }
+    
+    .hero-button {
+        display: inline-block;
+        padding: 16px 40px;
+        background: linear-gradient(135deg, #FBD784 0%, #F4A261 100%);
+        color: #0B1D26;
+        font-family: 'Inter', sans-serif;
+        font-size: 1.1rem;
+        font-weight: 700;
+        text-decoration: none;
+        border-radius: 8px;
+        transition: all 0.3s ease;
+        box-shadow: 0 10px 30px rgba(251, 215, 132, 0.3);
+        cursor: pointer;
+        border: none;
+    }
+    
+    .hero-button:hover {
+        transform: translateY(-2px);
+        box-shadow: 0 15px 40px rgba(251, 215, 132, 0.5);
+    }
+    
+    /* Scroll Indicator */
+    .scroll-indicator {
+        position: absolute;
+        bottom: 40px;
+        left: 50%;
+        transform: translateX(-50%);
+        z-index: 3;
+        animation: bounce 2s infinite;
+    }
+    
+    @keyframes bounce {
+        0%, 20%, 50%, 80%, 100% {
+            transform: translateX(-50%) translateY(0);
+        }
+        40% {
+            transform: translateX(-50%) translateY(-10px);
+        }
+        60% {
+            transform: translateX(-50%) translateY(-5px);
+        }
+    }
+    
+    .scroll-text {
+        color: rgba(255, 255, 255, 0.6);
+        font-size: 0.8rem;
+        letter-spacing: 2px;
+        text-transform: uppercase;
+        margin-bottom: 10px;
+    }
+    
+    /* Main Content Section */
+    .main-content {
+        max-width: 1400px;
+        margin: 0 auto;
+        padding: 4rem 2rem;
+    }
+    
+    .section-title {
+        font-family: 'Playfair Display', serif;
+        font-size: 3.5rem;
+        font-weight: 700;
+        color: #FFFFFF;
+        text-align: center;
+        margin-bottom: 1rem;
+    }
+    
+    .section-subtitle {
+        font-family: 'Inter', sans-serif;
+        font-size: 1.2rem;
+        color: rgba(255, 255, 255, 0.6);
+        text-align: center;
+        margin-bottom: 4rem;
+    }
+    
+    /* Upload Section */
+    .upload-container {
+        background: rgba(255, 255, 255, 0.05);
+        backdrop-filter: blur(20px);
+        border-radius: 20px;
+        padding: 3rem;
+        border: 1px solid rgba(255, 255, 255, 0.1);
+        box-shadow: 0 20px 60px rgba(0, 0, 0, 0.3);
+        margin-bottom: 3rem;
+    }
+    
+    /* Prediction Card */
+    .prediction-card {
+        background: linear-gradient(135deg, rgba(251, 215, 132, 0.1) 0%, rgba(244, 162, 97, 0.1) 100%);
+        backdrop-filter: blur(20px);
+        border-radius: 20px;
+        padding: 2.5rem;
+        border: 1px solid rgba(251, 215, 132, 0.2);
+        box-shadow: 0 20px 60px rgba(0, 0, 0, 0.3);
+        margin: 2rem 0;
+    }
+    
+    .prediction-label {
+        font-family: 'Inter', sans-serif;
+        font-size: 0.9rem;
+        font-weight: 600;
+        color: #FBD784;
+        letter-spacing: 2px;
+        text-transform: uppercase;
+        margin-bottom: 1rem;
+    }
+    
+    .prediction-disease {
+        font-family: 'Playfair Display', serif;
+        font-size: 2.5rem;
+        font-weight: 700;
+        color: #FFFFFF;
+        margin-bottom: 1rem;
+    }
+    
+    .confidence-badge {
+        display: inline-block;
+        padding: 8px 20px;
+        background: rgba(251, 215, 132, 0.2);
+        border-radius: 50px;
+        color: #FBD784;
+        font-size: 1.1rem;
+        font-weight: 600;
+    }
+    
+    
+    /* Stats Grid */
+.stats-grid {
+    display: grid;
+    grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
+    gap: 1.5rem; 
+    margin: 1.5rem 0; 
+}
+
+.stat-card {
+    background: rgba(255, 255, 255, 0.05);
+    backdrop-filter: blur(20px);
+    border-radius: 15px;
+    padding: 2rem;
+    border: 1px solid rgba(255, 255, 255, 0.1);
+    text-align: center;
+    transition: all 0.3s ease;
+}
+
+.stat-card:hover {
+    transform: translateY(-5px);
+    border-color: rgba(251, 215, 132, 0.5);
+}
+
+.stat-number {
+    font-family: 'Playfair Display', serif;
+    font-size: 3rem;
+    font-weight: 700;
+    color: #FBD784;
+    margin-bottom: 0.5rem;
+}
+
+.stat-label {
+    font-family: 'Inter', sans-serif;
+    font-size: 1rem;
+    color: rgba(255, 255, 255, 0.7);
+}
+
+    /* Disease Cards */
+    .disease-grid {
+    display: grid;
+    grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
+    row-gap: 1.5rem; 
+    column-gap: 1.5rem; 
+    margin: 4rem 0 1.5rem 0; 
+}
+
+    
+    .disease-card {
+        background: rgba(255, 255, 255, 0.05);
+        backdrop-filter: blur(20px);
+        border-radius: 12px;
+        padding: 1.5rem;
+        border: 1px solid rgba(255, 255, 255, 0.1);
+        transition: all 0.3s ease;
+        cursor: pointer;
+    }
+    
+    .disease-card:hover {
+        border-color: #FBD784;
+        transform: scale(1.05);
+    }
+    
+    .disease-name {
+        font-family: 'Inter', sans-serif;
+        font-size: 1rem;
+        font-weight: 600;
+        color: #FFFFFF;
+        margin-bottom: 0.5rem;
+    }
+    
+    .disease-prob {
+        font-size: 0.9rem;
+        color: #FBD784;
+        font-weight: 600;
+    }
+    
+    /* Progress Bar */
+    .custom-progress {
+        width: 100%;
+        height: 8px;
+        background: rgba(255, 255, 255, 0.1);
+        border-radius: 10px;
+        overflow: hidden;
+        margin-top: 0.5rem;
+    }
+    
+    .progress-fill {
+        height: 100%;
+        background: linear-gradient(90deg, #FBD784 0%, #F4A261 100%);
+        border-radius: 10px;
+        transition: width 1s ease;
+    }
+    
+    /* Streamlit Override */
+    .stButton button {
+        background: linear-gradient(135deg, #FBD784 0%, #F4A261 100%);
+        color: #0B1D26;
+        font-family: 'Inter', sans-serif;
+        font-size: 1.1rem;
+        font-weight: 700;
+        border: none;
+        border-radius: 8px;
+        padding: 16px 40px;
+        width: 100%;
+        transition: all 0.3s ease;
+        box-shadow: 0 10px 30px rgba(251, 215, 132, 0.3);
+    }
+    
+    .stButton button:hover {
+        transform: translateY(-2px);
+        box-shadow: 0 15px 40px rgba(251, 215, 132, 0.5);
+    }
+    
+    /* File Uploader */
+    [data-testid="stFileUploader"] {
+        background: rgba(255, 255, 255, 0.05);
+        border: 2px dashed rgba(251, 215, 132, 0.3);
+        border-radius: 15px;
+        padding: 2rem;
+    }
+    
+    [data-testid="stFileUploader"]:hover {
+        border-color: #FBD784;
+    }
+    
+    /* Alert Boxes */
+    .stAlert {
+        background: rgba(251, 215, 132, 0.1);
+        border: 1px solid rgba(251, 215, 132, 0.3);
+        border-radius: 12px;
+        color: #FFFFFF;
+    }
+    
+    /* Responsive */
+    @media (max-width: 768px) {
+        .hero-title {
+            font-size: 3rem;
+        }
+        .hero-subtitle {
+            font-size: 1.1rem;
+        }
+        .section-title {
+            font-size: 2.5rem;
+        }
+    }
+    /* Disease information cards, two per row */
+    .info-grid {
+        display: grid;
+        grid-template-columns: repeat(2, 1fr);
+        gap: 1.5rem 3rem;
+    }
+    
+    @media (max-width: 768px) {
+        .info-grid {
+            grid-template-columns: 1fr;
+        }
+    }
+    
+    /* Disease link hover */
+    .disease-link:hover h5 {
+        text-decoration: underline;
+        color: #F4A261;
+    }
+    </style>
+"""
+
+def minify_css(css):
+    """Drop comments and the whitespace around CSS punctuation"""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    return css.replace(";}", "}").strip()
+
+def compact_html(html):
+    """Join indented HTML onto one line, so markdown never reads it as a code block"""
+    return " ".join(line.strip() for line in html.splitlines() if line.strip())
+
+PAGE_CSS = minify_css(CSS)
+
+HERO_HTML = compact_html("""
+    <div class="hero-section">
+        <div class="hero-overlay"></div>
+        <div class="hero-content">
+            <div class="hero-badge">🌾 AI-Powered Agriculture</div>
+            <h1 class="hero-title">Rice Leaf Disease<br/>Classifier</h1>
+            <h5><p class="hero-subtitle">
+                Advanced deep learning technology to identify rice plant diseases instantly. 
+                Upload a leaf image and get accurate diagnosis in seconds, helping farmers 
+                protect their crops and increase yield.
+            </p></h5>
+            <a href="#upload-section" class="hero-button">Start Diagnosis →</a>
+        </div>
+        <div class="scroll-indicator">
+            <div class="scroll-text">Scroll Down</div>
+            <div style="text-align: center; font-size: 1.5rem; color: rgba(255,255,255,0.6);">↓</div>
+        </div>
+    </div>
+""")
+
+# Stats grid and the heading of the upload section, which always follow the hero
+STATS_HTML = compact_html("""
+    <div class="main-content"></div>
+    <div class="stats-grid">
+        <div class="stat-card">
+            <div class="stat-number">7</div>
+            <div class="stat-label">Disease Types Detected</div>
+        </div>
+        <div class="stat-card">
+            <div class="stat-number">95%+</div>
+            <div class="stat-label">Accuracy Rate</div>
+        </div>
+        <div class="stat-card">
+            <div class="stat-number">&lt;2s</div>
+            <div class="stat-label">Analysis Time</div>
+        </div>
+        <div class="stat-card">
+            <div class="stat-number">24/7</div>
+            <div class="stat-label">Available</div>
+        </div>
+    </div>
+    <div id="upload-section"></div>
+    <h2 class="section-title">Upload & Analyze</h2>
+    <p class="section-subtitle">Upload a clear image of a rice leaf to get instant disease detection</p>
+""")
+
+HEADER_HTML = HERO_HTML + STATS_HTML
+
+DISEASES_INFO = {
+    "Bacterial Blight": {
+        "description": "Caused by Xanthomonas oryzae. Symptoms include water-soaked lesions on leaves.",
+        "url": "https://en.wikipedia.org/wiki/Xanthomonas_oryzae_pv._oryzae"
+    },
+    "Brown Spot": {
+        "description": "Fungal disease causing brown spots with gray centers on leaves and grains.",
+        "url": "https://en.wikipedia.org/wiki/Cochliobolus_miyabeanus"
+    },
+    "Leaf Smut": {
+        "description": "Fungal infection producing black powdery spores on leaves.",
+        "url": "https://en.wikipedia.org/wiki/Eballistra_oryzae"
+    },
+    "Leaf Blast": {
+        "description": "Most destructive rice disease, causing diamond-shaped lesions.",
+        "url": "https://en.wikipedia.org/wiki/Magnaporthe_oryzae"
+    },
+    "Leaf Scald": {
+        "description": "Bacterial disease causing scalded appearance on leaf tips.",
+        "url": "https://en.wikipedia.org/wiki/Monographella_albescens"
+    },
+    "Sheath Blight": {
+        "description": "Fungal disease affecting leaf sheaths near water line.",
+        "url": "https://en.wikipedia.org/wiki/Sheath_blight"
+    }
+}
+
+def _disease_info_card(name, data):
+    icon = "✅" if name == "Healthy Rice Leaf" else "⚠️"
+    url_attr = f'href="{data["url"]}" target="_blank" rel="noopener noreferrer"' if data.get("url") else ""
+    return compact_html(f"""
+        <div class="stat-card" style="text-align: left;">
+            <div style="font-size: 1.5rem; margin-bottom: 0.5rem;">{icon}</div>
+            <a {url_attr} class="disease-link" style="text-decoration:none;">
+                <h5 style="margin:0; color:#FBD784;">{name}</h5>
+            </a>
+            <p style="color: rgba(255,255,255,0.6); font-size: 0.9rem; margin-top:0.5rem;">{data['description']}</p>
+        </div>
+    """)
+
+DISEASE_INFO_HTML = (
+    '<h2 class="section-title">Disease Information</h2>'
+    '<p class="section-subtitle">Learn about the diseases we can detect</p>'
+    '<div class="info-grid">'
+    + "".join(_disease_info_card(name, data) for name, data in DISEASES_INFO.items())
+    + '</div>'
+)
+
+WEATHER_WIDGET_HTML = """
+<div id="weatherapi-weather-widget-2"></div>
+<script type="text/javascript"
+    src="https://www.weatherapi.com/weather/widget.ashx?loc=2850955&wid=2&tu=2&div=weatherapi-weather-widget-2"></script>
+<noscript>
+    <a href="https://www.weatherapi.com/weather/q/polonnaruwa-2850955"
+    alt="Hour by hour Polonnaruwa weather">
+    10 day hour by hour Polonnaruwa weather
+    </a>
+</noscript>
+"""
+
+FOOTER_HTML = compact_html("""
+    <div style="text-align: center; padding: 2rem; color: rgba(255,255,255,0.5);">
+        <p style="font-size: 0.9rem;">🌾 Rice Leaf Disease Classifier | Powered by Deep Learning & TensorFlow</p>
+        <p style="font-size: 0.8rem; margin-top: 0.5rem;">© 2024 All Rights Reserved</p>
+    </div>
+""")
+
+def prediction_card_html(predicted_class, confidence):
+    return compact_html(f"""
+        <div class="prediction-card">
+            <div class="prediction-label">Detected Disease</div>
+            <div class="prediction-disease">{predicted_class}</div>
+            <span class="confidence-badge">{confidence:.1f}% Confidence</span>
+        </div>
+    """)
+
+def probability_cards_html(all_predictions):
+    """Every class's probability card inside one grid, to send as a single element"""
+    cards = "".join(
+        f'<div class="disease-card"><div class="disease-name">{disease}</div>'
+        f'<div class="disease-prob">{prob:.1f}%</div>'
+        f'<div class="custom-progress"><div class="progress-fill" style="width: {prob}%"></div></div></div>'
+        for disease, prob in all_predictions
+    )
+    return f'<div class="disease-grid">{cards}</div>'
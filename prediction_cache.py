@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+# Entries kept in memory, and on disk when RICE_CACHE_DIR is set
+CACHE_SIZE = int(os.environ.get("RICE_CACHE_SIZE", "256"))
+CACHE_DIR = os.environ.get("RICE_CACHE_DIR") or None
+CACHE_DISK_SIZE = int(os.environ.get("RICE_CACHE_DISK_SIZE", "10000"))
+
+def image_digest(image_bytes):
+    """SHA-256 of the uploaded bytes, as used in cache keys and the prediction log"""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+def cache_key(image_bytes, model_version, digest=None):
+    """Content address for an uploaded image under a given model version"""
+    return f"{model_version}-{digest or image_digest(image_bytes)}"
+
+def _to_plain(result):
+    predicted_class, confidence, all_predictions = result
+    return [predicted_class, float(confidence), [[name, float(prob)] for name, prob in all_predictions]]
+
+def _from_plain(data):
+    predicted_class, confidence, all_predictions = data
+    return predicted_class, confidence, [(name, prob) for name, prob in all_predictions]
+
+class PredictionCache:
+    """Two-level prediction cache: a bounded in-memory LRU and an optional directory on disk.
+
+    Values are the (predicted_class, confidence, all_predictions) tuples returned
+    by predict_disease. The disk layer stores one small JSON file per key and
+    touches it on every disk hit; it counts the files in memory and, once it
+    holds more than max_disk_entries, drops the least recently used ones down
+    to 90% of the limit, so the directory is only listed once per batch of
+    evictions rather than on every put.
+    """
+
+    def __init__(self, max_entries=CACHE_SIZE, cache_dir=CACHE_DIR, max_disk_entries=CACHE_DISK_SIZE):
+        self.max_entries = max_entries
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_disk_entries = max_disk_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._disk_entries = 0
+        self._evicting = False
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._disk_entries = sum(1 for _ in self.cache_dir.glob("*.json"))
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        result = self._read_disk(key)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, result)
+        return result
+
+    def put(self, key, result):
+        result = _from_plain(_to_plain(result))
+        with self._lock:
+            self._remember(key, result)
+        self._write_disk(key, result)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key, result):
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _path(self, key):
+        return self.cache_dir / f"{key}.json"
+
+    def _read_disk(self, key):
+        if self.cache_dir is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                result = _from_plain(json.load(f))
+            # The mtime is the last use, which eviction orders by
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return result
+
+    def _write_disk(self, key, result):
+        if self.cache_dir is None:
+            return
+        path = self._path(key)
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        try:
+            existed = path.exists()
+            with open(tmp_path, "w") as f:
+                json.dump(_to_plain(result), f)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        with self._lock:
+            if not existed:
+                self._disk_entries += 1
+            evict = self._disk_entries > self.max_disk_entries and not self._evicting
+            self._evicting = self._evicting or evict
+        if evict:
+            try:
+                self._evict_disk()
+            finally:
+                with self._lock:
+                    self._evicting = False
+
+    def _evict_disk(self):
+        """Drop the least recently used files down to 90% of max_disk_entries, without holding the lock"""
+        files = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                files.append((path.stat().st_mtime_ns, path))
+            except OSError:
+                pass
+        files.sort()
+        keep = int(self.max_disk_entries * 0.9)
+        removed = 0
+        for _, path in files[:max(0, len(files) - keep)]:
+            try:
+                path.unlink()
+                removed += 1
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_entries -= removed
@@ -0,0 +1,210 @@
+"""Append-only log of every prediction, written to partitioned Parquet files.
+
+Each record holds the time, the SHA-256 of the image, the predicted class,
+its confidence, the full probability vector, the model version and where
+the prediction came from: the model, the prediction cache or a
+near-duplicate's prediction. log()
+only puts the record on a bounded queue, so the request path never waits
+on disk. When the queue is full the record is dropped and counted. A
+background thread builds the rows and writes one Parquet file per batch
+under date=YYYY-MM-DD/ (Hive partitioning), so a query for a few days
+only opens those days. The batch is written when it reaches a row count
+or an age limit, and once more on close() or interpreter exit. Records
+still in memory are lost if the process is killed.
+
+Usage:
+    RICE_PREDICTION_LOG=prediction_log streamlit run app.py
+    python prediction_log.py summary --since 2026-10-01
+"""
+import argparse
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+
+from metrics import PREDICTION_LOG_RECORDS
+
+# Log directory; unset turns the log off
+LOG_DIR = os.environ.get("RICE_PREDICTION_LOG") or None
+# Records waiting for the writer at most; more are dropped instead of growing memory
+LOG_BUFFER = int(os.environ.get("RICE_PREDICTION_LOG_BUFFER", "10000"))
+# A batch is written once it has this many rows or its oldest row is this old
+FLUSH_ROWS = int(os.environ.get("RICE_PREDICTION_LOG_FLUSH_ROWS", "5000"))
+FLUSH_SECONDS = float(os.environ.get("RICE_PREDICTION_LOG_FLUSH_SECONDS", "60"))
+
+_STOP = object()
+
+# pyarrow is imported where it is used: pyarrow.dataset alone pulls in pandas, too slow for app startup
+def log_schema():
+    """Arrow schema of the log; probabilities are in the order of the class names in each file's metadata"""
+    import pyarrow as pa
+    return pa.schema([
+        ("timestamp", pa.timestamp("ms", tz="UTC")),
+        ("image_hash", pa.string()),
+        ("predicted_class", pa.string()),
+        ("confidence", pa.float32()),
+        ("probabilities", pa.list_(pa.float32())),
+        ("model_version", pa.string()),
+        ("source", pa.string()),
+    ])
+
+def records_table(timestamps, image_hashes, results, versions, class_names, sources=None):
+    """Arrow table of log rows; confidence and probabilities are percentages, as in the results"""
+    import pyarrow as pa
+    probabilities = []
+    for _, _, all_predictions in results:
+        by_class = dict(all_predictions)
+        probabilities.append([float(by_class[name]) for name in class_names])
+    table = pa.table({
+        "timestamp": pa.array([int(t * 1000) for t in timestamps], pa.timestamp("ms", tz="UTC")),
+        "image_hash": pa.array(image_hashes, pa.string()),
+        "predicted_class": pa.array([result[0] for result in results], pa.string()),
+        "confidence": pa.array([float(result[1]) for result in results], pa.float32()),
+        "probabilities": pa.array(probabilities, pa.list_(pa.float32())),
+        "model_version": pa.array(versions, pa.string()),
+        "source": pa.array(sources or ["model"] * len(results), pa.string()),
+    }, schema=log_schema())
+    return table.replace_schema_metadata({"class_names": json.dumps(list(class_names))})
+
+def write_partitioned(directory, table, name):
+    """Write table as one file per UTC date under directory/date=YYYY-MM-DD/; returns the paths"""
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    dates = pc.strftime(table["timestamp"], format="%Y-%m-%d")
+    paths = []
+    for date in pc.unique(dates).to_pylist():
+        part = table.filter(pc.equal(dates, date))
+        partition = os.path.join(directory, f"date={date}")
+        os.makedirs(partition, exist_ok=True)
+        path = os.path.join(partition, f"{name}.parquet")
+        # Readers skip dot files, so they never see a half-written file
+        tmp_path = os.path.join(partition, f".{name}.parquet.tmp")
+        pq.write_table(part, tmp_path, compression="zstd")
+        os.replace(tmp_path, path)
+        paths.append(path)
+    return paths
+
+class PredictionLog:
+    """Buffers prediction records and writes them to Parquet from a background thread"""
+
+    def __init__(self, directory=LOG_DIR, max_buffered=LOG_BUFFER, flush_rows=FLUSH_ROWS, flush_seconds=FLUSH_SECONDS):
+        self.directory = directory
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.files = 0
+        self._queue = queue.Queue(max_buffered)
+        self._sequence = 0
+        self._closed = False
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="prediction-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def log(self, image_hash, result, version, class_names, source="model"):
+        """Queue one served prediction without blocking; returns False if it was dropped.
+
+        source is "model", "cache" or "duplicate".
+        """
+        try:
+            self._queue.put_nowait((time.time(), image_hash, result, version, class_names, source))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            PREDICTION_LOG_RECORDS.labels("dropped").inc()
+            return False
+
+    def _run(self):
+        pending = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                record = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                record = None
+            if record is _STOP:
+                self._flush(pending)
+                return
+            if record is not None:
+                pending.append(record)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_seconds
+            if pending and (len(pending) >= self.flush_rows or time.monotonic() >= deadline):
+                self._flush(pending)
+                pending, deadline = [], None
+
+    def _flush(self, records):
+        import pyarrow as pa
+        # Normally one group; a model swap to different classes starts another
+        groups = {}
+        for record in records:
+            groups.setdefault(tuple(record[4]), []).append(record)
+        for class_names, group in groups.items():
+            self._sequence += 1
+            name = f"part-{int(time.time() * 1000)}-{os.getpid()}-{self._sequence}"
+            try:
+                timestamps, image_hashes, results, versions, _, sources = zip(*group)
+                table = records_table(timestamps, image_hashes, results, versions, class_names, list(sources))
+                self.files += len(write_partitioned(self.directory, table, name))
+            except (OSError, KeyError, pa.ArrowException) as e:
+                self.failed += len(group)
+                PREDICTION_LOG_RECORDS.labels("failed").inc(len(group))
+                print(f"Prediction log: could not write {len(group)} records: {e}")
+                continue
+            self.written += len(group)
+            PREDICTION_LOG_RECORDS.labels("written").inc(len(group))
+
+    def close(self, timeout=30):
+        """Write what is buffered and stop the writer; safe to call more than once"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "files": self.files,
+        }
+
+def open_log(directory=LOG_DIR):
+    """The log as a pyarrow dataset, with the date partition as a column.
+
+    The schema is given rather than inferred from one file, so files written
+    before a column was added read it as null.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    schema = log_schema().append(pa.field("date", pa.string()))
+    return ds.dataset(directory, schema=schema, format="parquet", partitioning="hive", exclude_invalid_files=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dir", default=LOG_DIR or "prediction_log")
+    commands = parser.add_subparsers(dest="command", required=True)
+    summary = commands.add_parser("summary", help="predictions per day and class")
+    summary.add_argument("--since", help="first date, YYYY-MM-DD")
+    args = parser.parse_args()
+
+    import pyarrow.dataset as ds
+    dataset = open_log(args.dir)
+    where = ds.field("date") >= args.since if args.since else None
+    table = dataset.to_table(columns=["date", "predicted_class", "confidence"], filter=where)
+    counts = table.group_by(["date", "predicted_class"]).aggregate([("confidence", "count"), ("confidence", "mean")])
+    counts = counts.sort_by([("date", "ascending"), ("confidence_count", "descending")])
+    print(f"{'date':<12}{'class':<24}{'count':>8}{'mean conf %':>13}")
+    for row in counts.to_pylist():
+        print(f"{str(row['date']):<12}{row['predicted_class']:<24}{row['confidence_count']:>8}"
+              f"{row['confidence_mean']:>13.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import io
+
+import numpy as np
+from PIL import Image, ImageOps
+
+# Background used when flattening transparent PNGs
+BACKGROUND_COLOR = (255, 255, 255)
+
+def load_image(source, target_size=(224, 224)):
+    """Open an uploaded image, decoding only as many pixels as the model needs.
+
+    For JPEGs, Image.draft makes libjpeg scale the image by 1/2, 1/4 or 1/8 in
+    the DCT domain, picking the smallest scale that still covers target_size,
+    so a 48 MP phone photo never gets decoded at full resolution. The EXIF
+    orientation is applied and the result is always 3-channel RGB.
+    target_size=None decodes at full resolution.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    image = Image.open(source)
+    if image.format == "JPEG" and target_size is not None:
+        image.draft("RGB", _draft_size(target_size, _exif_orientation(image)))
+    image = ImageOps.exif_transpose(image)
+    return to_rgb(image)
+
+def _exif_orientation(image):
+    try:
+        return image.getexif().get(0x0112, 1)
+    except Exception:
+        return 1
+
+def _draft_size(target_size, orientation):
+    # Orientations 5-8 swap width and height once the image is transposed
+    if orientation in (5, 6, 7, 8):
+        return target_size[1], target_size[0]
+    return target_size
+
+def to_rgb(image):
+    """Convert a PIL image of any mode (RGBA, palette, grayscale, CMYK...) to RGB"""
+    if image.mode == "RGB":
+        return image
+    if image.mode == "P" and "transparency" in image.info:
+        image = image.convert("RGBA")
+    if image.mode in ("RGBA", "LA", "PA"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, BACKGROUND_COLOR)
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    if image.mode.startswith("I;16") or image.mode in ("I", "F"):
+        # 16-bit and float grayscale: scale down to 8 bits before converting
+        array = np.asarray(image, dtype=np.float32)
+        peak = array.max() or 1.0
+        image = Image.fromarray((array * (255.0 / peak)).clip(0, 255).astype(np.uint8))
+    return image.convert("RGB")
+
+def to_rgb_array(image):
+    """Return image as an HxWx3 uint8 array, accepting PIL images or arrays"""
+    if isinstance(image, Image.Image):
+        return np.asarray(to_rgb(image))
+    array = np.asarray(image)
+    if array.ndim == 2:
+        return np.repeat(array[:, :, None], 3, axis=2)
+    if array.shape[2] == 1:
+        return np.repeat(array, 3, axis=2)
+    if array.shape[2] == 4:
+        return array[:, :, :3]
+    return array
@@ -0,0 +1,184 @@
+"""Cheap check that an upload is a usable rice leaf photo before it reaches the model.
+
+Three measurements on a small grayscale/HSV thumbnail of the decoded image,
+each a few vectorized OpenCV calls:
+
+    sharpness:   share of the edge contrast that blurring the image further
+                 would remove (the Crete-Roffet "blur effect", 0-1); low means
+                 blurred or out of focus, near 0.9 means pixel noise
+    brightness:  mean luminance (0-255); too low is too dark, too high is washed out
+    leaf share:  share of a coarser thumbnail's pixels with a saturated yellow-to-green hue
+
+Sharpness compares the image with itself, so a smooth leaf close-up with
+few edges still counts as sharp as long as those edges are crisp. The
+thumbnail is the model's input size, so an image counts as blurry when it
+is blurry as the model sees it. Leaf colour is read after averaging
+blocks of pixels, so random colour noise averages out to grey.
+
+The default thresholds come from the dataset's sample photos in the
+notebook (three per class) plus the leaf in images/predict.png. They
+pass all 22 as they are, with margin on every check. They reject all of
+them when dark or blurred by 1/50 of the image size, and most of them when
+overexposed. They also reject noise, flat colour, sky, soil and documents.
+bench_quality_gate.py re-checks them on your own photos.
+
+The gate is off unless RICE_QUALITY_GATE (or serve.py --quality-gate)
+turns it on. In "reject" mode an image that fails a check skips
+preprocessing and the model; in "flag" mode it is still classified and
+its result carries the reasons.
+
+Usage:
+    python quality_gate.py photo1.jpg photo2.jpg
+"""
+import argparse
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from metrics import QUALITY_CHECKS, stage_timer
+from prediction_cache import CACHE_SIZE
+
+# "reject" skips the model for unusable images, "flag" only warns, "off" turns the checks off. Off by default:
+# the thresholds come from 22 photos, so calibrate them on your own before opting in.
+GATE_MODE = os.environ.get("RICE_QUALITY_GATE", "off")
+MIN_SHARPNESS = float(os.environ.get("RICE_GATE_MIN_SHARPNESS", "0.45"))
+MAX_SHARPNESS = float(os.environ.get("RICE_GATE_MAX_SHARPNESS", "0.85"))
+MIN_BRIGHTNESS = float(os.environ.get("RICE_GATE_MIN_BRIGHTNESS", "50"))
+MAX_BRIGHTNESS = float(os.environ.get("RICE_GATE_MAX_BRIGHTNESS", "200"))
+MIN_LEAF_SHARE = float(os.environ.get("RICE_GATE_MIN_LEAF_SHARE", "0.3"))
+# Longest side of the thumbnail the checks run on: the model's input size
+THUMBNAIL_SIDE = 224
+# Longest side of the coarser thumbnail leaf colour is read from
+COLOR_SIDE = 56
+# Length of the box blur the sharpness measure compares the image with
+BLUR_LENGTH = 9
+# OpenCV hue (0-179) range counted as leaf: yellow (straw-coloured, scalded) through green
+LEAF_HUE = (22, 95)
+LEAF_MIN_SATURATION = 40
+LEAF_MIN_VALUE = 40
+
+def _shrink(array, side):
+    import cv2
+    scale = side / max(array.shape[:2])
+    if scale >= 1:
+        return array
+    return cv2.resize(array, (max(1, round(array.shape[1] * scale)), max(1, round(array.shape[0] * scale))),
+                      interpolation=cv2.INTER_AREA)
+
+def sharpness(gray):
+    """1 minus the blur effect of a grayscale float32 array; 0 for an image without any edges"""
+    import cv2
+    blur = 0.0
+    # Once per direction: neighbour differences a further box blur would remove, as a share of all of them
+    for axis, kernel in ((0, (1, BLUR_LENGTH)), (1, (BLUR_LENGTH, 1))):
+        differences = np.abs(np.diff(gray, axis=axis))
+        blurred = np.abs(np.diff(cv2.blur(gray, kernel), axis=axis))
+        total = differences.sum()
+        blur = max(blur, 1.0 if total == 0 else float(np.minimum(differences, blurred).sum() / total))
+    return 1.0 - blur
+
+def measure(image):
+    """Sharpness, brightness and leaf share of a PIL image or RGB array"""
+    import cv2
+    array = _shrink(np.asarray(image), THUMBNAIL_SIDE)
+    gray = cv2.cvtColor(array, cv2.COLOR_RGB2GRAY).astype(np.float32)
+    hue, saturation, value = cv2.split(cv2.cvtColor(_shrink(array, COLOR_SIDE), cv2.COLOR_RGB2HSV))
+    leaf = ((hue >= LEAF_HUE[0]) & (hue <= LEAF_HUE[1])
+            & (saturation >= LEAF_MIN_SATURATION) & (value >= LEAF_MIN_VALUE))
+    return {
+        "sharpness": sharpness(gray),
+        "brightness": float(gray.mean()),
+        "leaf_share": float(leaf.mean()),
+    }
+
+class QualityGate:
+    """Thresholds for the checks, and the reasons an image fails them.
+
+    check() remembers the reasons of the last max_entries images by key
+    (the upload's digest), so a cached prediction can still be flagged
+    without decoding the image again.
+    """
+
+    def __init__(self, mode=GATE_MODE, min_sharpness=MIN_SHARPNESS, max_sharpness=MAX_SHARPNESS,
+                 min_brightness=MIN_BRIGHTNESS, max_brightness=MAX_BRIGHTNESS, min_leaf_share=MIN_LEAF_SHARE,
+                 max_entries=CACHE_SIZE):
+        if mode not in ("off", "flag", "reject"):
+            raise ValueError(f"Unknown quality gate mode {mode!r}; use off, flag or reject")
+        self.mode = mode
+        self.min_sharpness = min_sharpness
+        self.max_sharpness = max_sharpness
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.min_leaf_share = min_leaf_share
+        self.max_entries = max_entries
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.mode != "off"
+
+    @property
+    def rejects(self):
+        return self.mode == "reject"
+
+    def reasons(self, measures):
+        """[(check, message)] for every check the measurements fail, empty when the image is usable"""
+        reasons = []
+        # Exposure first: a dark image also looks blurry and colourless
+        if measures["brightness"] < self.min_brightness:
+            reasons.append(("dark", f"too dark (brightness {measures['brightness']:.0f}, "
+                                    f"needs at least {self.min_brightness:.0f})"))
+        elif measures["brightness"] > self.max_brightness:
+            reasons.append(("overexposed", f"overexposed (brightness {measures['brightness']:.0f}, "
+                                           f"needs at most {self.max_brightness:.0f})"))
+        if measures["sharpness"] < self.min_sharpness:
+            reasons.append(("blurry", f"too blurry (sharpness {measures['sharpness']:.2f}, "
+                                      f"needs at least {self.min_sharpness:.2f})"))
+        elif measures["sharpness"] > self.max_sharpness:
+            reasons.append(("noisy", f"looks like noise rather than a photo (sharpness {measures['sharpness']:.2f}, "
+                                     f"needs at most {self.max_sharpness:.2f})"))
+        if measures["leaf_share"] < self.min_leaf_share:
+            reasons.append(("not_leaf", f"doesn't look like a rice leaf ({measures['leaf_share']:.0%} "
+                                        f"leaf-coloured, needs at least {self.min_leaf_share:.0%})"))
+        return reasons
+
+    def check(self, image, key=None):
+        """Reasons the image fails the gate; always empty when the gate is off"""
+        if not self.enabled:
+            return []
+        with stage_timer("gate"):
+            reasons = self.reasons(measure(image))
+        for check, _ in reasons or [("ok", None)]:
+            QUALITY_CHECKS.labels(check).inc()
+        if key is not None:
+            with self._lock:
+                self._seen[key] = reasons
+                self._seen.move_to_end(key)
+                while len(self._seen) > self.max_entries:
+                    self._seen.popitem(last=False)
+        return reasons
+
+    def recall(self, key):
+        """Reasons check() returned for key, or None if it hasn't seen it"""
+        with self._lock:
+            return self._seen.get(key)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("images", nargs="+")
+    args = parser.parse_args()
+
+    from preprocessing import load_image
+    gate = QualityGate("flag")
+    for path in args.images:
+        measures = measure(load_image(path))
+        reasons = gate.reasons(measures)
+        verdict = "; ".join(message for _, message in reasons) or "ok"
+        print(f"{path}: sharpness {measures['sharpness']:.2f}, brightness {measures['brightness']:.0f}, "
+              f"leaf share {measures['leaf_share']:.0%} -> {verdict}")
+
+if __name__ == "__main__":
+    main()
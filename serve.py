@@ -0,0 +1,221 @@
+"""Headless HTTP prediction service with dynamic micro-batching.
+
+POST the raw bytes of a jpg/png image to /predict and get back the same
+result the Streamlit page shows:
+
+    curl --data-binary @leaf.jpg http://localhost:8000/predict
+
+    {"predicted_class": "Brown Spot", "confidence": 93.1,
+     "all_predictions": [{"class": "Brown Spot", "probability": 93.1}, ...],
+     "model_version": "3f2a9c81d0e4", "quality_issues": []}
+
+Confidence and probabilities are percentages. quality_issues lists the
+quality gate checks the photo failed; with --quality-gate reject such a
+photo gets a 422 with the reasons instead of a prediction. A model that
+times out or has no live worker left answers 503. GET /health
+reports whether the model is loaded and GET /metrics serves Prometheus
+metrics.
+
+Usage:
+    python serve.py --port 8000 --max-batch-size 32 --max-wait-ms 5
+    python serve.py --port 8000 --workers 4
+    python serve.py --port 8000 --cascade --cascade-threshold 80
+    python serve.py --port 8000 --prediction-log prediction_log
+"""
+import argparse
+import json
+import signal
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import UnidentifiedImageError
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from cascade import CASCADE, CASCADE_THRESHOLD, Cascade, cascade_version, load_student
+from inference import BACKEND, backend_model_path, format_prediction, load_backend, model_version, preprocess_image
+from metrics import IMAGES_PREDICTED, MODEL_LOAD_SECONDS, PREDICTIONS, stage_timer
+from micro_batching import MAX_BATCH_SIZE, MAX_WAIT_MS, MicroBatcher
+from prediction_cache import image_digest
+from prediction_log import LOG_DIR, PredictionLog
+from preprocessing import load_image
+from quality_gate import GATE_MODE, QualityGate
+from tta import TTA_BANDS, parse_bands, tta_version, with_tta
+from worker_pool import WORKERS, WorkerPool
+
+# Largest accepted upload
+MAX_UPLOAD_BYTES = 50 * 2**20
+
+def prediction_response(result, version):
+    predicted_class, confidence, all_predictions = result
+    return {
+        "predicted_class": predicted_class,
+        "confidence": float(confidence),
+        "all_predictions": [{"class": name, "probability": float(prob)} for name, prob in all_predictions],
+        "model_version": version,
+    }
+
+def quality_response(issues):
+    return [{"check": check, "message": message} for check, message in issues]
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    server_version = "RiceDiseaseService/1.0"
+
+    def do_GET(self):
+        if self.path == "/health":
+            pool = self.server.worker_pool
+            if pool is not None and not pool.healthy:
+                self._send_json(503, {"status": "degraded", "model_version": self.server.model_version,
+                                      "workers": pool.health()})
+            else:
+                self._send_json(200, {"status": "ok", "model_version": self.server.model_version})
+        elif self.path == "/metrics":
+            body = generate_latest()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE_LATEST)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self._send_json(404, {"error": "not found"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0:
+            self._send_json(400, {"error": "empty request body, expected image bytes"})
+            return
+        if length > MAX_UPLOAD_BYTES:
+            self._send_json(413, {"error": f"image larger than {MAX_UPLOAD_BYTES} bytes"})
+            return
+        data = self.rfile.read(length)
+        try:
+            with stage_timer("decode"):
+                image = load_image(data)
+        except (UnidentifiedImageError, OSError, ValueError) as e:
+            self._send_json(400, {"error": f"could not decode image: {e}"})
+            return
+        issues = self.server.quality_gate.check(image)
+        if issues and self.server.quality_gate.rejects:
+            self._send_json(422, {"error": "unusable image", "quality_issues": quality_response(issues)})
+            return
+        try:
+            with stage_timer("preprocess"):
+                batch = preprocess_image(image)
+            with stage_timer("inference"):
+                probabilities = self.server.predict(batch)[0]
+            with stage_timer("postprocess"):
+                result = format_prediction(probabilities, self.server.class_names)
+        except (TimeoutError, RuntimeError) as e:
+            # A worker that timed out or is down for good, or a stopped micro-batcher
+            self._send_json(503, {"error": f"model unavailable: {str(e) or type(e).__name__}"})
+            return
+        except Exception as e:
+            self.log_error("prediction failed: %r", e)
+            self._send_json(500, {"error": "prediction failed"})
+            return
+        IMAGES_PREDICTED.inc()
+        PREDICTIONS.labels(result[0]).inc()
+        self._send_json(200, {**prediction_response(result, self.server.model_version),
+                              "quality_issues": quality_response(issues)})
+        # Hashed and queued after the response is sent, so logging adds nothing to the client's latency
+        if self.server.prediction_log is not None:
+            self.server.prediction_log.log(image_digest(data), result, self.server.model_version,
+                                           self.server.class_names)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+def create_server(host, port, predictor, class_names, version, quiet=False, tta_bands=TTA_BANDS, prediction_log=None,
+                  quality_gate=None, worker_pool=None):
+    """HTTP server answering with predictor, a MicroBatcher or WorkerPool, logging to prediction_log if given.
+
+    /health answers 503 once a worker of worker_pool is down for good.
+    """
+    server = ThreadingHTTPServer((host, port), PredictionHandler)
+    server.daemon_threads = True
+    server.predictor = predictor
+    # Extra TTA views of unsure images go through the same predictor
+    server.predict = with_tta(predictor.predict, tta_bands)
+    server.class_names = class_names
+    server.model_version = tta_version(version, tta_bands)
+    server.quiet = quiet
+    server.prediction_log = prediction_log
+    server.quality_gate = quality_gate or QualityGate()
+    server.worker_pool = worker_pool
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--backend", default=BACKEND)
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="run inference in this many core-pinned processes instead of in-process micro-batching")
+    parser.add_argument("--cascade", action="store_true", default=CASCADE,
+                        help="answer with the distilled student model when it is confident (see cascade.py)")
+    parser.add_argument("--cascade-threshold", type=float, default=CASCADE_THRESHOLD,
+                        help="student confidence (%%) needed to skip the full model")
+    parser.add_argument("--tta-bands", type=parse_bands, default=TTA_BANDS,
+                        help='test-time augmentation per confidence band, e.g. "60:8,80:4" (see tta.py)')
+    parser.add_argument("--prediction-log", default=LOG_DIR,
+                        help="append every prediction to Parquet files in this directory (see prediction_log.py)")
+    parser.add_argument("--quality-gate", choices=["off", "flag", "reject"], default=GATE_MODE,
+                        help="check blur, exposure and leaf colour before inference (see quality_gate.py)")
+    parser.add_argument("--quiet", action="store_true", help="don't log every request")
+    args = parser.parse_args()
+
+    with open('class_names.json', 'r') as f:
+        class_names = json.load(f)
+    version = model_version(backend_model_path(args.backend))
+    start = time.perf_counter()
+    pool = None
+    if args.workers:
+        pool = WorkerPool(args.workers, len(class_names), args.backend, max_batch_size=args.max_batch_size)
+    if args.cascade:
+        # The student answers in-process; only its unsure images reach the full model
+        teacher_fn = pool.predict if pool else load_backend(args.backend)[1]
+        predictor = MicroBatcher(Cascade(load_student(), teacher_fn, args.cascade_threshold).predict,
+                                 args.max_batch_size, args.max_wait_ms)
+        version = cascade_version(version)
+    elif pool:
+        predictor = pool
+    else:
+        _, predict_fn = load_backend(args.backend)
+        predictor = MicroBatcher(predict_fn, args.max_batch_size, args.max_wait_ms)
+    MODEL_LOAD_SECONDS.labels(args.backend).set(time.perf_counter() - start)
+
+    prediction_log = PredictionLog(args.prediction_log) if args.prediction_log else None
+    server = create_server(args.host, args.port, predictor, class_names, version, args.quiet, args.tta_bands,
+                           prediction_log, QualityGate(args.quality_gate), pool)
+    print(f"Serving {args.backend} model {server.model_version} on http://{args.host}:{args.port}")
+    # A process manager stops the service with SIGTERM; shut down the same way as on Ctrl+C, so the prediction
+    # log writes its queued rows. shutdown() waits for serve_forever() to return, so it can't run on this thread.
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown, daemon=True).start())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        predictor.stop()
+        if pool and predictor is not pool:
+            pool.stop()
+        if prediction_log is not None:
+            prediction_log.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""Pre-decoded, sharded copy of the dataset, read through memory mapping.
+
+Training and evaluation decode and resize the same JPEGs on every pass.
+This packs dataset/<class>/ into fixed-size shards of resized 224x224x3
+uint8 images plus an index of labels and file metadata, so later runs map
+the pixels straight from disk instead of decoding them:
+
+    python shard_dataset.py --dataset dataset/ --output shards/
+
+    from shard_dataset import make_shard_datasets
+    train_ds, val_ds, class_names = make_shard_datasets('shards/', batch_size=32)
+
+Conversion is incremental: files whose size, modification time or content
+changed are re-encoded, new files are appended and deleted files dropped.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from training_data import (BATCH_SIZE, IMG_HEIGHT, IMG_WIDTH, VALIDATION_SPLIT, list_image_files, load_image,
+                           prepare_batches)
+
+SHARD_SIZE = 1024
+# Rewrite the shards once more than this fraction of their slots belong to deleted or changed files
+COMPACT_THRESHOLD = 0.25
+INDEX_NAME = "index.json"
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _shard_name(shard, generation=0):
+    # Every compaction writes a new generation of files, so the shards the index points to are never overwritten
+    if generation == 0:
+        return f"shard-{shard:05d}.u8"
+    return f"shard-{shard:05d}.g{generation}.u8"
+
+class ShardedDataset:
+    """Read-only view of a shard directory.
+
+    Images are (H, W, 3) uint8 views into memory-mapped shard files, in the
+    same order as list_image_files: classes alphabetically, files sorted
+    within each class.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, INDEX_NAME), "r") as f:
+            index = json.load(f)
+        self.image_size = tuple(index["image_size"])
+        self.class_names = index["class_names"]
+        self._shard_counts = index["shards"]
+        self._generation = index.get("generation", 0)
+        records = sorted(index["records"].items(), key=lambda item: (self.class_names.index(item[1]["class"]), item[0]))
+        self.paths = [path for path, _ in records]
+        self.labels = np.array([self.class_names.index(r["class"]) for _, r in records], dtype=np.int64)
+        self._shard_of = np.array([r["shard"] for _, r in records], dtype=np.int64)
+        self._offset_of = np.array([r["offset"] for _, r in records], dtype=np.int64)
+        self._shards = {}
+
+    def __len__(self):
+        return len(self.paths)
+
+    def _shard(self, shard):
+        if shard not in self._shards:
+            height, width = self.image_size
+            self._shards[shard] = np.memmap(os.path.join(self.directory, _shard_name(shard, self._generation)),
+                                            dtype=np.uint8, mode="r",
+                                            shape=(self._shard_counts[shard], height, width, 3))
+        return self._shards[shard]
+
+    def image(self, i):
+        return self._shard(self._shard_of[i])[self._offset_of[i]]
+
+    def images(self, indices):
+        """Gather several images into one (N, H, W, 3) uint8 batch"""
+        indices = np.asarray(indices)
+        height, width = self.image_size
+        batch = np.empty((len(indices), height, width, 3), dtype=np.uint8)
+        shards = self._shard_of[indices]
+        for shard in np.unique(shards):
+            positions = np.flatnonzero(shards == shard)
+            batch[positions] = self._shard(shard)[self._offset_of[indices[positions]]]
+        return batch
+
+    def split(self, validation_split=VALIDATION_SPLIT):
+        """(train_indices, val_indices) with the first validation_split of every class held out"""
+        train, val = [], []
+        for label in range(len(self.class_names)):
+            members = np.flatnonzero(self.labels == label)
+            split = int(validation_split * len(members))
+            val.append(members[:split])
+            train.append(members[split:])
+        return np.concatenate(train), np.concatenate(val)
+
+def _batches(dataset, indices, batch_size, training, seed):
+    num_classes = len(dataset.class_names)
+    one_hot = np.eye(num_classes, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+
+    def generate():
+        order = rng.permutation(indices) if training else indices
+        for start in range(0, len(order), batch_size):
+            # Sorted so each batch reads the shard files front to back
+            batch = np.sort(order[start:start + batch_size])
+            yield dataset.images(batch), one_hot[dataset.labels[batch]]
+
+    height, width = dataset.image_size
+    ds = tf.data.Dataset.from_generator(generate, output_signature=(
+        tf.TensorSpec((None, height, width, 3), tf.uint8),
+        tf.TensorSpec((None, num_classes), tf.float32),
+    ))
+    return prepare_batches(ds, training)
+
+def make_shard_datasets(shard_dir, batch_size=BATCH_SIZE, validation_split=VALIDATION_SPLIT, seed=None):
+    """Like training_data.make_datasets, but reading pre-decoded images from shards"""
+    dataset = ShardedDataset(shard_dir)
+    train_indices, val_indices = dataset.split(validation_split)
+    train_ds = _batches(dataset, train_indices, batch_size, True, seed)
+    val_ds = _batches(dataset, val_indices, batch_size, False, seed)
+    return train_ds, val_ds, dataset.class_names
+
+def _encode(paths, batch_size=BATCH_SIZE):
+    """Decode and resize files exactly as training_data does, in parallel"""
+    ds = tf.data.Dataset.from_tensor_slices(paths)
+    ds = ds.map(lambda path: load_image(path, (IMG_HEIGHT, IMG_WIDTH)), num_parallel_calls=tf.data.AUTOTUNE)
+    for batch in ds.batch(batch_size).prefetch(tf.data.AUTOTUNE):
+        yield batch.numpy()
+
+class ShardWriter:
+    """Index and shard files of a shard directory, updated in place"""
+
+    def __init__(self, directory, shard_size=SHARD_SIZE):
+        self.directory = directory
+        self.index_path = os.path.join(directory, INDEX_NAME)
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r") as f:
+                self.index = json.load(f)
+            if tuple(self.index["image_size"]) != (IMG_HEIGHT, IMG_WIDTH):
+                raise ValueError(f"{directory} holds {self.index['image_size']} images, not {[IMG_HEIGHT, IMG_WIDTH]}")
+        else:
+            self.index = {"image_size": [IMG_HEIGHT, IMG_WIDTH], "shard_size": shard_size, "generation": 0,
+                          "class_names": [], "shards": [], "records": {}}
+        self.image_bytes = IMG_HEIGHT * IMG_WIDTH * 3
+
+    @property
+    def records(self):
+        return self.index["records"]
+
+    def dead_fraction(self):
+        slots = sum(self.index["shards"])
+        return 1 - len(self.records) / slots if slots else 0.0
+
+    def append(self, images, metadata):
+        """Write images into the last shard, starting new ones as shards fill up"""
+        shards = self.index["shards"]
+        shard_size = self.index["shard_size"]
+        start = 0
+        while start < len(images):
+            if not shards or shards[-1] >= shard_size:
+                shards.append(0)
+            shard, offset = len(shards) - 1, shards[-1]
+            count = min(shard_size - offset, len(images) - start)
+            path = os.path.join(self.directory, _shard_name(shard, self.index.get("generation", 0)))
+            with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+                f.seek(offset * self.image_bytes)
+                f.write(np.ascontiguousarray(images[start:start + count]).tobytes())
+                f.truncate()
+            for i, (rel_path, record) in enumerate(metadata[start:start + count]):
+                self.records[rel_path] = dict(record, shard=shard, offset=offset + i)
+            shards[-1] += count
+            start += count
+
+    def save(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def compact(self):
+        """Rewrite the shards with only live records, dropping slots of deleted or changed files.
+
+        The live records are copied into a new generation of shard files and
+        the index is swapped to them in one os.replace, so an interrupted
+        compaction leaves the old shards and index intact. The old files are
+        only deleted after the swap.
+        """
+        old = ShardedDataset(self.directory)
+        generation = self.index.get("generation", 0) + 1
+        compact_dir = os.path.join(self.directory, ".compact")
+        shutil.rmtree(compact_dir, ignore_errors=True)
+        writer = ShardWriter(compact_dir, self.index["shard_size"])
+        writer.index["class_names"] = self.index["class_names"]
+        writer.index["generation"] = generation
+        for start in range(0, len(old), self.index["shard_size"]):
+            indices = np.arange(start, min(start + self.index["shard_size"], len(old)))
+            metadata = []
+            for i in indices:
+                record = dict(self.records[old.paths[i]])
+                del record["shard"], record["offset"]
+                metadata.append((old.paths[i], record))
+            writer.append(old.images(indices), metadata)
+        del old
+        live = set()
+        for shard in range(len(writer.index["shards"])):
+            name = _shard_name(shard, generation)
+            os.replace(os.path.join(compact_dir, name), os.path.join(self.directory, name))
+            live.add(name)
+        self.index = writer.index
+        self.save()
+        # Old generations, and files of an earlier compaction that was interrupted before its swap
+        for name in os.listdir(self.directory):
+            if name.startswith("shard-") and name.endswith(".u8") and name not in live:
+                os.remove(os.path.join(self.directory, name))
+        shutil.rmtree(compact_dir, ignore_errors=True)
+
+def convert(dataset_path, output_dir, shard_size=SHARD_SIZE, batch_size=BATCH_SIZE):
+    """Bring output_dir up to date with dataset_path; returns counts of what changed"""
+    files, labels, _, _, class_names = list_image_files(dataset_path, validation_split=0)
+    writer = ShardWriter(output_dir, shard_size)
+    writer.index["class_names"] = class_names
+    records = writer.records
+
+    pending, seen = [], set()
+    unchanged = 0
+    for path, label in zip(files, labels):
+        rel_path = os.path.relpath(path, dataset_path)
+        seen.add(rel_path)
+        stat = os.stat(path)
+        record = {"class": class_names[label], "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        old = records.get(rel_path)
+        if old is not None and old["size"] == stat.st_size and old["mtime_ns"] == stat.st_mtime_ns:
+            unchanged += 1
+            continue
+        record["hash"] = _file_digest(path)
+        if old is not None and old["hash"] == record["hash"] and old["class"] == record["class"]:
+            # Touched but not modified: keep the pixels, refresh the metadata
+            old.update(record)
+            unchanged += 1
+            continue
+        records.pop(rel_path, None)
+        pending.append((path, rel_path, record))
+
+    deleted = [rel_path for rel_path in records if rel_path not in seen]
+    for rel_path in deleted:
+        del records[rel_path]
+
+    for start in range(0, len(pending), shard_size):
+        chunk = pending[start:start + shard_size]
+        images = np.concatenate(list(_encode([path for path, _, _ in chunk], batch_size)))
+        writer.append(images, [(rel_path, record) for _, rel_path, record in chunk])
+        # Save after every chunk so an interrupted conversion keeps what it encoded
+        writer.save()
+    writer.save()
+
+    compacted = writer.dead_fraction() > COMPACT_THRESHOLD
+    if compacted:
+        writer.compact()
+    return {"encoded": len(pending), "unchanged": unchanged, "deleted": len(deleted), "compacted": compacted,
+            "images": len(records), "shards": len(writer.index["shards"])}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dataset", default="dataset/")
+    parser.add_argument("--output", default="shards/")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE, help="images per shard file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    result = convert(args.dataset, args.output, args.shard_size)
+    print(f"{result['images']} images in {result['shards']} shards: {result['encoded']} encoded, "
+          f"{result['unchanged']} unchanged, {result['deleted']} deleted"
+          f"{', compacted' if result['compacted'] else ''} in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
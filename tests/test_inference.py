@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("tensorflow")
+
+from inference import (build_predict_fn, build_serving_model, load_backend, predict_disease, predict_diseases,
+                       preprocess_images)
+
+CLASS_NAMES = ["Bacterial Blight", "Brown Spot", "Healthy Rice Leaf", "Leaf Blast", "Leaf Scald", "Leaf Smut",
+               "Sheath Blight"]
+
+@pytest.fixture(scope="module")
+def model_path(tmp_path_factory):
+    # A tiny stand-in with the real model's input and output shape, saved and loaded like the real one
+    from tensorflow import keras
+    keras.utils.set_random_seed(0)
+    model = keras.Sequential([
+        keras.layers.Input((224, 224, 3)),
+        keras.layers.Conv2D(8, 3, strides=4, activation="relu"),
+        keras.layers.BatchNormalization(),
+        keras.layers.GlobalAveragePooling2D(),
+        keras.layers.Dense(len(CLASS_NAMES), activation="softmax"),
+    ])
+    path = tmp_path_factory.mktemp("model") / "stand_in.keras"
+    model.save(path)
+    return str(path)
+
+@pytest.fixture(scope="module")
+def images():
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, (rng.integers(100, 600), rng.integers(100, 600), 3), dtype=np.uint8)
+            for _ in range(12)]
+
+@pytest.mark.parametrize("batch_size", [32, 5])
+def test_batched_predictions_equal_single_image_ones(model_path, images, batch_size):
+    _, predict_fn = load_backend("keras", model_path)
+    batched = predict_diseases(predict_fn, images, CLASS_NAMES, batch_size)
+    assert batched == [predict_disease(predict_fn, image, CLASS_NAMES) for image in images]
+
+def test_uint8_serving_model_matches_float_preprocessing(model_path, images):
+    import cv2
+    from tensorflow import keras
+    model = keras.models.load_model(model_path)
+    # preprocess_image as it was before the uint8 pipeline: resize, then img / 255.0 on the host
+    expected = model.predict(np.stack([cv2.resize(image, (224, 224)) / 255.0 for image in images]), verbose=0)
+    actual = build_predict_fn(build_serving_model(model))(preprocess_images(images))
+    np.testing.assert_allclose(actual, expected, atol=1e-5)
+    assert (actual.argmax(axis=1) == expected.argmax(axis=1)).all()
@@ -0,0 +1,88 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from micro_batching import MicroBatcher
+
+class RecordingModel:
+    """predict_fn that returns each image's first pixel and records the batch sizes it saw"""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def __call__(self, batch):
+        self.batch_sizes.append(len(batch))
+        return batch[:, 0, 0, :1].astype(np.float32)
+
+def image(value):
+    return np.full((1, 2, 2, 3), value, dtype=np.uint8)
+
+@pytest.fixture
+def model():
+    return RecordingModel()
+
+def test_full_batch_runs_without_waiting_for_the_deadline(model):
+    batcher = MicroBatcher(model, max_batch_size=4, max_wait_ms=10000)
+    try:
+        start = time.monotonic()
+        futures = [batcher.submit(image(i)) for i in range(4)]
+        results = [future.result(5) for future in futures]
+        assert time.monotonic() - start < 5
+    finally:
+        batcher.stop()
+    assert model.batch_sizes == [4]
+    assert [int(result[0, 0]) for result in results] == [0, 1, 2, 3]
+
+def test_partial_batch_runs_at_the_deadline(model):
+    batcher = MicroBatcher(model, max_batch_size=32, max_wait_ms=100)
+    try:
+        start = time.monotonic()
+        futures = [batcher.submit(image(i)) for i in range(3)]
+        results = [future.result(5) for future in futures]
+        waited = time.monotonic() - start
+    finally:
+        batcher.stop()
+    assert model.batch_sizes == [3]
+    assert 0.05 <= waited < 5
+    assert [int(result[0, 0]) for result in results] == [0, 1, 2]
+
+def test_requests_beyond_the_batch_size_go_into_the_next_batch(model):
+    gate = threading.Event()
+
+    def slow_model(batch):
+        gate.wait(5)
+        return model(batch)
+
+    batcher = MicroBatcher(slow_model, max_batch_size=2, max_wait_ms=1)
+    try:
+        first = batcher.submit(image(0))
+        time.sleep(0.05)
+        # Queued while the first batch is still running
+        futures = [batcher.submit(image(i)) for i in range(1, 6)]
+        gate.set()
+        results = [future.result(5) for future in [first] + futures]
+    finally:
+        batcher.stop()
+    assert model.batch_sizes == [1, 2, 2, 1]
+    assert [int(result[0, 0]) for result in results] == [0, 1, 2, 3, 4, 5]
+
+def test_model_errors_fail_every_request_of_the_batch():
+    def broken(batch):
+        raise ValueError("boom")
+
+    batcher = MicroBatcher(broken, max_batch_size=4, max_wait_ms=10000)
+    try:
+        futures = [batcher.submit(image(i)) for i in range(4)]
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result(5)
+    finally:
+        batcher.stop()
+
+def test_submit_after_stop_fails(model):
+    batcher = MicroBatcher(model)
+    batcher.stop()
+    with pytest.raises(RuntimeError):
+        batcher.submit(image(0))
@@ -0,0 +1,102 @@
+import json
+import threading
+
+import pytest
+
+from model_registry import ModelRegistry, ModelWatcher
+
+@pytest.fixture
+def files(tmp_path):
+    class_names = tmp_path / "class_names.json"
+    class_names.write_text(json.dumps(["a", "b"]))
+    models = []
+    for name in ("m1.keras", "m2.keras", "m3.keras"):
+        path = tmp_path / name
+        path.write_bytes(name.encode())
+        models.append(str(path))
+    return models, str(class_names)
+
+@pytest.fixture
+def registry(tmp_path, files):
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    models, class_names = files
+    for i, model in enumerate(models, 1):
+        registry.publish(model, class_names, f"v{i}")
+    registry.activate("v1")
+    return registry
+
+class Model:
+    def __init__(self, version):
+        self.version = version
+        self.closed = threading.Event()
+
+def watcher_for(registry):
+    watcher = ModelWatcher(lambda model_path, class_names_path, version: Model(version), registry,
+                           close_fn=lambda model: model.closed.set())
+    return watcher.load_initial()
+
+def test_publish_stores_the_model_under_the_keras_name(registry):
+    assert registry.versions() == ["v1", "v2", "v3"]
+    assert registry.model_path("v2", "keras").endswith("v2/rice_disease_classifier_final.keras")
+    with open(registry.model_path("v2", "keras"), "rb") as f:
+        assert f.read() == b"m2.keras"
+
+def test_publishing_a_version_twice_fails(registry, files):
+    models, class_names = files
+    with pytest.raises(ValueError):
+        registry.publish(models[0], class_names, "v1")
+
+def test_activate_and_rollback_keep_a_history(registry):
+    registry.activate("v2")
+    registry.activate("v3")
+    assert registry.active()["version"] == "v3"
+    assert registry.active()["history"] == ["v1", "v2"]
+    assert registry.rollback() == "v2"
+    assert registry.rollback() == "v1"
+    with pytest.raises(ValueError):
+        registry.rollback()
+
+def test_activating_an_unknown_version_fails(registry):
+    with pytest.raises(ValueError):
+        registry.activate("v9")
+    assert registry.active()["version"] == "v1"
+
+def test_watcher_swaps_and_rolls_back_without_reloading(registry):
+    watcher = watcher_for(registry)
+    first = watcher.current
+    registry.activate("v2")
+    assert watcher.poll()
+    assert watcher.version == "v2" and watcher.previous is first
+    assert not watcher.poll()
+    registry.rollback()
+    assert watcher.poll()
+    assert watcher.current is first and watcher.version == "v1"
+
+def test_watcher_keeps_serving_when_a_version_fails_to_load(registry):
+    watcher = watcher_for(registry)
+    watcher.load_fn = lambda *args: (_ for _ in ()).throw(ValueError("bad model"))
+    registry.activate("v2")
+    assert not watcher.poll()
+    assert watcher.version == "v1" and "bad model" in watcher.error
+    # A failed version isn't retried on every poll
+    assert not watcher.poll()
+
+def test_retired_model_is_closed_only_after_its_last_user(registry):
+    watcher = watcher_for(registry)
+    with watcher.serving() as model:
+        assert model.version == "v1"
+        for version in ("v2", "v3"):
+            registry.activate(version)
+            watcher.poll()
+        # v1 is neither current nor previous any more, but still in use
+        assert not model.closed.wait(0.2)
+    assert model.closed.wait(5)
+
+def test_unused_retired_model_is_closed_at_once(registry):
+    watcher = watcher_for(registry)
+    first = watcher.current
+    for version in ("v2", "v3"):
+        registry.activate(version)
+        watcher.poll()
+    assert first.closed.wait(5)
+    assert watcher.previous.version == "v2" and not watcher.previous.closed.is_set()
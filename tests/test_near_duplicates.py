@@ -0,0 +1,60 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from near_duplicates import NearDuplicateIndex, hamming, perceptual_hash
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def leaf():
+    # The Brown Spot leaf in the README's prediction screenshot
+    screenshot = Image.open(os.path.join(REPO_ROOT, "images", "predict.png")).convert("RGB")
+    return screenshot.crop((36, 91, 873, 600))
+
+def recompressed(image, quality):
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return Image.open(io.BytesIO(buffer.getvalue())).convert("RGB")
+
+def test_hash_survives_recompression_and_resizing(leaf):
+    original = perceptual_hash(leaf)
+    assert hamming(original, perceptual_hash(recompressed(leaf, 40))) <= 4
+    assert hamming(original, perceptual_hash(leaf.resize((leaf.width // 2, leaf.height // 2)))) <= 4
+    assert hamming(original, perceptual_hash(leaf.transpose(Image.FLIP_TOP_BOTTOM))) > 10
+
+def test_search_returns_the_closest_match_within_reach():
+    index = NearDuplicateIndex(capacity=8, max_distance=4)
+    index.add(0b0000, "zero")
+    index.add(0b1111_0000, "far")
+    assert index.search(0b0011) == ("zero", 2)
+    assert index.search(0b1111_1111) == ("far", 4)
+    assert index.search(0b1111_1111_0000_0000) is None
+    assert (index.hits, index.misses) == (2, 1)
+
+def test_ring_buffer_overwrites_the_oldest_hash():
+    index = NearDuplicateIndex(capacity=3, max_distance=0)
+    for value in range(1, 5):
+        index.add(value << 10, value)
+    assert len(index) == 3
+    assert index.search(1 << 10) is None
+    assert [index.search(value << 10)[0] for value in (2, 3, 4)] == [2, 3, 4]
+
+def test_negative_distance_turns_reuse_off():
+    index = NearDuplicateIndex(capacity=4, max_distance=-1)
+    index.add(7, "seven")
+    assert index.search(7) is None
+    assert index.match_batch([7, 7]) == [None, None]
+
+def test_match_batch_reuses_the_index_and_earlier_images_of_the_batch():
+    index = NearDuplicateIndex(capacity=4, max_distance=2)
+    index.add(0b1, "stored")
+    far = 0xFFFF_0000
+    matches = index.match_batch([0b11, far, far | 0b1, 0xFF00_FF00_0000])
+    assert matches[0] == ("stored", 1)
+    # The first unseen image goes through the model, its near-duplicate points at its position
+    assert matches[1] is None
+    assert matches[2] == (1, 1)
+    assert matches[3] is None
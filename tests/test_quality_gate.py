@@ -0,0 +1,45 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image, ImageFilter
+
+from quality_gate import QualityGate, measure
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def gate():
+    return QualityGate("reject")
+
+@pytest.fixture
+def leaf():
+    # The Brown Spot leaf in the README's prediction screenshot
+    screenshot = Image.open(os.path.join(REPO_ROOT, "images", "predict.png")).convert("RGB")
+    return screenshot.crop((36, 91, 873, 600))
+
+def checks(gate, image):
+    return {check for check, _ in gate.reasons(measure(image))}
+
+def test_leaf_photo_passes(gate, leaf):
+    assert checks(gate, leaf) == set()
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_random_noise_is_flagged(gate, seed):
+    noise = np.random.default_rng(seed).integers(0, 256, (768, 1024, 3), dtype=np.uint8)
+    assert checks(gate, Image.fromarray(noise))
+
+def test_green_noise_is_flagged(gate):
+    noise = np.random.default_rng(0).normal((60, 140, 40), 40, (768, 1024, 3)).clip(0, 255).astype(np.uint8)
+    assert "noisy" in checks(gate, Image.fromarray(noise))
+
+@pytest.mark.parametrize("color", [(60, 140, 40), (128, 128, 128), (200, 180, 60), (255, 255, 255), (0, 0, 0)])
+def test_flat_colour_is_flagged(gate, color):
+    assert "blurry" in checks(gate, Image.new("RGB", (640, 480), color))
+
+def test_blurred_leaf_is_flagged(gate, leaf):
+    assert "blurry" in checks(gate, leaf.filter(ImageFilter.GaussianBlur(max(leaf.size) / 50)))
+
+def test_off_mode_checks_nothing():
+    noise = np.random.default_rng(0).integers(0, 256, (64, 64, 3), dtype=np.uint8)
+    assert QualityGate("off").check(noise) == []
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from tta import VIEWS, augmented_views, parse_bands, refine, tta_version, views_for, with_tta
+
+@pytest.fixture
+def batch():
+    return np.random.default_rng(0).integers(0, 256, (3, 224, 224, 3), dtype=np.uint8)
+
+def test_views_are_the_expected_pixel_mappings(batch):
+    views = augmented_views(batch, len(VIEWS))
+    assert views.shape == (3, len(VIEWS), 224, 224, 3)
+    expected = {
+        "identity": batch,
+        "hflip": batch[:, :, ::-1],
+        "vflip": batch[:, ::-1],
+        "rot180": batch[:, ::-1, ::-1],
+        "rot90": np.rot90(batch, 1, axes=(1, 2)),
+        "rot270": np.rot90(batch, -1, axes=(1, 2)),
+    }
+    for name, pixels in expected.items():
+        np.testing.assert_array_equal(views[:, VIEWS.index(name)], pixels)
+
+def test_crop_views_zoom_into_the_centre(batch):
+    views = augmented_views(batch, len(VIEWS))
+    crop = views[:, VIEWS.index("crop")]
+    # The centre stays put, the corners come from inside the image
+    np.testing.assert_array_equal(crop[:, 111:113, 111:113], batch[:, 111:113, 111:113])
+    assert not np.array_equal(crop[:, 0, 0], batch[:, 0, 0])
+    np.testing.assert_array_equal(views[:, VIEWS.index("crop_hflip")], crop[:, :, ::-1])
+
+def test_bands_are_parsed_sorted_and_clamped():
+    assert parse_bands("80:4,60:8") == [(60.0, 8), (80.0, 4)]
+    assert parse_bands("50:99") == [(50.0, len(VIEWS))]
+    assert parse_bands("") == []
+
+def test_views_follow_the_confidence_band():
+    bands = [(60.0, 8), (80.0, 4)]
+    assert views_for(45, bands) == 8
+    assert views_for(70, bands) == 4
+    assert views_for(80, bands) == 1
+
+def test_refine_averages_extra_views_of_unsure_rows_only(batch):
+    calls = []
+
+    def predict_fn(views):
+        calls.append(len(views))
+        return np.tile([0.5, 0.5], (len(views), 1))
+
+    probabilities = np.array([[0.95, 0.05], [0.7, 0.3], [0.55, 0.45]])
+    refined = refine(predict_fn, batch, probabilities, bands=[(60.0, 8), (80.0, 4)])
+    # One forward pass for all extra views: 3 for the 4-view row, 7 for the 8-view row
+    assert calls == [10]
+    np.testing.assert_allclose(refined[0], [0.95, 0.05])
+    np.testing.assert_allclose(refined[1], (np.array([0.7, 0.3]) + 3 * 0.5) / 4)
+    np.testing.assert_allclose(refined[2], (np.array([0.55, 0.45]) + 7 * 0.5) / 8)
+    np.testing.assert_allclose(probabilities[1], [0.7, 0.3])
+
+def test_refine_skips_the_model_when_every_row_is_confident(batch):
+    def predict_fn(views):
+        raise AssertionError("no extra views expected")
+
+    probabilities = np.tile([0.9, 0.1], (3, 1))
+    np.testing.assert_array_equal(refine(predict_fn, batch, probabilities, bands=[(60.0, 8)]), probabilities)
+
+def test_without_bands_tta_is_off():
+    def predict_fn(batch):
+        return batch
+
+    assert with_tta(predict_fn, []) is predict_fn
+    assert tta_version("abc", []) == "abc"
+    assert tta_version("abc", [(60.0, 8)]) == "abc+tta60:8"
@@ -0,0 +1,67 @@
+import os
+import threading
+
+import numpy as np
+
+# Threads the TFLite interpreter may use; None lets it decide
+TFLITE_THREADS = int(os.environ["RICE_TFLITE_THREADS"]) if os.environ.get("RICE_TFLITE_THREADS") else None
+
+def _interpreter_class():
+    """Prefer the standalone LiteRT / tflite-runtime packages, which don't need full TensorFlow"""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    import tensorflow as tf
+    return tf.lite.Interpreter
+
+def build_tflite_predict_fn(model_path, num_threads=TFLITE_THREADS):
+    """Load a .tflite classifier and return a predict_fn taking uint8 image batches.
+
+    The exported models expect the notebook's 1/255-rescaled input. Float
+    models get the rescaled pixels; quantized models get the pixels mapped
+    through the input tensor's scale and zero point, and their output is
+    dequantized back to probabilities.
+    """
+    interpreter = _interpreter_class()(model_path=model_path, num_threads=num_threads)
+    interpreter.allocate_tensors()
+    input_detail = interpreter.get_input_details()[0]
+    output_detail = interpreter.get_output_details()[0]
+    input_index = input_detail["index"]
+    output_index = output_detail["index"]
+    input_dtype = input_detail["dtype"]
+    input_scale, input_zero_point = input_detail["quantization"]
+    output_scale, output_zero_point = output_detail["quantization"]
+    # The interpreter isn't thread-safe and Streamlit serves sessions from threads
+    lock = threading.Lock()
+    state = {"batch_size": int(input_detail["shape"][0])}
+
+    def to_input(batch):
+        if input_dtype == np.float32:
+            return batch.astype(np.float32) * np.float32(1.0 / 255)
+        info = np.iinfo(input_dtype)
+        quantized = np.round(batch.astype(np.float32) / (255.0 * input_scale)) + input_zero_point
+        return np.clip(quantized, info.min, info.max).astype(input_dtype)
+
+    def predict_fn(batch):
+        batch = np.asarray(batch)
+        with lock:
+            if len(batch) != state["batch_size"]:
+                interpreter.resize_tensor_input(input_index, [len(batch), *batch.shape[1:]])
+                interpreter.allocate_tensors()
+                state["batch_size"] = len(batch)
+            interpreter.set_tensor(input_index, to_input(batch))
+            interpreter.invoke()
+            output = interpreter.get_tensor(output_index).copy()
+        if output_scale:
+            output = (output.astype(np.float32) - output_zero_point) * output_scale
+        return output
+
+    predict_fn(np.zeros((1, *input_detail["shape"][1:]), np.uint8))
+    return predict_fn
@@ -0,0 +1,155 @@
+"""tf.data input pipeline for training, replacing ImageDataGenerator.flow_from_directory.
+
+Reads the same dataset/<class>/ layout with the same class order, the same
+per-class 80/20 validation split and the same augmentation set as the
+notebook, but decodes and augments images in parallel, caches the decoded
+images after the first epoch and prefetches batches while the model trains.
+
+    from training_data import make_datasets
+    train_ds, val_ds, class_names = make_datasets('dataset/', batch_size=32)
+    model.fit(train_ds, validation_data=val_ds, epochs=EPOCHS)
+"""
+import math
+import os
+
+import tensorflow as tf
+
+IMG_HEIGHT = 224
+IMG_WIDTH = 224
+BATCH_SIZE = 32
+VALIDATION_SPLIT = 0.2
+
+# Same file types flow_from_directory picks up (minus TIFF, which tf.io can't decode)
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".ppm")
+
+# The notebook's ImageDataGenerator settings
+AUGMENTATION = {
+    "rotation_range": 20,
+    "width_shift_range": 0.2,
+    "height_shift_range": 0.2,
+    "shear_range": 0.2,
+    "zoom_range": 0.2,
+    "horizontal_flip": True,
+    "vertical_flip": True,
+}
+
+def list_image_files(dataset_path, class_names=None, validation_split=VALIDATION_SPLIT):
+    """Return (train_files, train_labels, val_files, val_labels, class_names).
+
+    Mirrors flow_from_directory: classes are the sub-directories in
+    alphabetical order unless class_names is given, files are sorted within
+    each class, and the first validation_split of every class is the
+    validation subset.
+    """
+    if class_names is None:
+        class_names = sorted(d for d in os.listdir(dataset_path) if os.path.isdir(os.path.join(dataset_path, d)))
+    train_files, train_labels, val_files, val_labels = [], [], [], []
+    for label, class_name in enumerate(class_names):
+        class_dir = os.path.join(dataset_path, class_name)
+        files = []
+        for root, _, names in sorted(os.walk(class_dir)):
+            files.extend(os.path.join(root, name) for name in sorted(names) if name.lower().endswith(IMAGE_EXTENSIONS))
+        split = int(validation_split * len(files))
+        val_files += files[:split]
+        val_labels += [label] * split
+        train_files += files[split:]
+        train_labels += [label] * (len(files) - split)
+    return train_files, train_labels, val_files, val_labels, list(class_names)
+
+def load_image(path, target_size=(IMG_HEIGHT, IMG_WIDTH)):
+    """Decode and resize one image file to uint8, like load_img(target_size=...)"""
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    image = tf.image.resize(image, target_size, method="nearest")
+    return tf.cast(image, tf.uint8)
+
+def _affine_transforms(batch_size, height, width, augmentation):
+    """Random output-to-input affine transforms, built like ImageDataGenerator.get_random_transform"""
+    def uniform(limit):
+        return tf.random.uniform([batch_size], -limit, limit)
+
+    theta = uniform(augmentation["rotation_range"] * math.pi / 180)
+    tx = uniform(augmentation["height_shift_range"]) * height
+    ty = uniform(augmentation["width_shift_range"]) * width
+    shear = uniform(augmentation["shear_range"] * math.pi / 180)
+    zoom = augmentation["zoom_range"]
+    zx = tf.random.uniform([batch_size], 1 - zoom, 1 + zoom)
+    zy = tf.random.uniform([batch_size], 1 - zoom, 1 + zoom)
+
+    zeros = tf.zeros([batch_size])
+    ones = tf.ones([batch_size])
+
+    def matrix(rows):
+        return tf.stack([tf.stack(row, axis=-1) for row in rows], axis=-2)
+
+    # Same matrices, order and centering as keras' apply_affine_transform. Keras then swaps
+    # the first two axes before scipy's (row, col) affine_transform, so the composed
+    # matrix is really in (x, y) = (col, row) order, which is what ImageProjectiveTransformV3
+    # expects. (That swap also makes the "height" shift move along x; both ranges are 0.2.)
+    rotation = matrix([[tf.cos(theta), -tf.sin(theta), zeros], [tf.sin(theta), tf.cos(theta), zeros], [zeros, zeros, ones]])
+    shift = matrix([[ones, zeros, tx], [zeros, ones, ty], [zeros, zeros, ones]])
+    shearing = matrix([[ones, -tf.sin(shear), zeros], [zeros, tf.cos(shear), zeros], [zeros, zeros, ones]])
+    zooming = matrix([[zx, zeros, zeros], [zeros, zy, zeros], [zeros, zeros, ones]])
+    center = matrix([[ones, zeros, ones * (height / 2 - 0.5)], [zeros, ones, ones * (width / 2 - 0.5)], [zeros, zeros, ones]])
+    uncenter = matrix([[ones, zeros, -ones * (height / 2 - 0.5)], [zeros, ones, -ones * (width / 2 - 0.5)], [zeros, zeros, ones]])
+    transform = center @ rotation @ shift @ shearing @ zooming @ uncenter
+    return tf.reshape(transform, [batch_size, 9])[:, :8]
+
+def augment_batch(images, augmentation=AUGMENTATION):
+    """Apply random rotation, shift, shear, zoom and flips to a float batch, filling with nearest pixels"""
+    shape = tf.shape(images)
+    batch_size, height, width = shape[0], shape[1], shape[2]
+    transforms = _affine_transforms(batch_size, tf.cast(height, tf.float32), tf.cast(width, tf.float32), augmentation)
+    images = tf.raw_ops.ImageProjectiveTransformV3(
+        images=images,
+        transforms=transforms,
+        output_shape=tf.stack([height, width]),
+        fill_value=0.0,
+        interpolation="BILINEAR",
+        fill_mode="NEAREST",
+    )
+    if augmentation["horizontal_flip"]:
+        flip = tf.random.uniform([batch_size, 1, 1, 1]) < 0.5
+        images = tf.where(flip, tf.reverse(images, axis=[2]), images)
+    if augmentation["vertical_flip"]:
+        flip = tf.random.uniform([batch_size, 1, 1, 1]) < 0.5
+        images = tf.where(flip, tf.reverse(images, axis=[1]), images)
+    return images
+
+def files_dataset(files, labels, num_classes, batch_size=BATCH_SIZE, training=False, cache="", seed=None):
+    """Batches of one list of files, built like make_datasets' training or validation subset"""
+    ds = tf.data.Dataset.from_tensor_slices((files, labels))
+    ds = ds.map(lambda path, label: (load_image(path), tf.one_hot(label, num_classes)),
+                num_parallel_calls=tf.data.AUTOTUNE, deterministic=not training)
+    if cache is not None:
+        # Decoded uint8 images: ~150 KB each in memory, or a file prefix for an on-disk cache
+        ds = ds.cache(cache)
+    if training:
+        # An in-memory cache already holds every image, so a full shuffle buffer only adds references
+        buffer_size = len(files) if cache == "" else min(len(files), 1024)
+        ds = ds.shuffle(max(buffer_size, 1), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size, num_parallel_calls=tf.data.AUTOTUNE)
+    return prepare_batches(ds, training)
+
+def prepare_batches(ds, training):
+    """Rescale (uint8 images, labels) batches by 1/255, augment them when training, and prefetch"""
+    ds = ds.map(lambda images, y: (tf.cast(images, tf.float32) * (1.0 / 255), y), num_parallel_calls=tf.data.AUTOTUNE)
+    if training:
+        ds = ds.map(lambda images, y: (augment_batch(images), y), num_parallel_calls=tf.data.AUTOTUNE)
+    return ds.prefetch(tf.data.AUTOTUNE)
+
+def make_datasets(dataset_path, batch_size=BATCH_SIZE, validation_split=VALIDATION_SPLIT, class_names=None,
+                  cache="", seed=None):
+    """Build (train_ds, val_ds, class_names) yielding 1/255-rescaled images and one-hot labels.
+
+    cache="" caches decoded images in memory, a path caches them on disk and
+    None disables caching. Validation batches are neither shuffled nor
+    augmented, as with the notebook's val_datagen.
+    """
+    train_files, train_labels, val_files, val_labels, class_names = list_image_files(
+        dataset_path, class_names, validation_split
+    )
+    num_classes = len(class_names)
+    val_cache = cache + "_val" if cache else cache
+    train_ds = files_dataset(train_files, train_labels, num_classes, batch_size, True, cache, seed)
+    val_ds = files_dataset(val_files, val_labels, num_classes, batch_size, False, val_cache, seed)
+    return train_ds, val_ds, class_names
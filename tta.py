@@ -0,0 +1,111 @@
+"""Test-time augmentation for low-confidence predictions.
+
+An image the model is unsure about is classified again as several flipped,
+rotated and cropped views, and the view probabilities are averaged. Every
+view is a fixed pixel mapping of the 224x224 input, so the views of a
+whole batch come out of a single NumPy gather. The extra views of every
+unsure image then go through the model in one batched forward pass. How
+many views an image gets depends on its confidence band, so confident
+images cost nothing extra.
+"""
+import os
+
+import numpy as np
+
+from inference import BATCH_SIZE, IMG_SIZE, run_batches
+from metrics import TTA_VIEWS, stage_timer
+
+# Views in the order they are used: a band with n views takes the first n. The training
+# augmentation flips both ways and zooms, so those come first; quarter turns are last.
+VIEWS = ("identity", "hflip", "vflip", "crop", "rot180", "rot90", "rot270", "crop_hflip")
+# Share of each side kept by the crop views
+CROP_FRACTION = 0.875
+
+def parse_bands(spec):
+    """Parse "60:8,80:4" into [(60.0, 8), (80.0, 4)]: below 60% use 8 views, below 80% use 4"""
+    bands = []
+    for part in spec.split(","):
+        if part.strip():
+            upper, views = part.split(":")
+            bands.append((float(upper), min(max(int(views), 1), len(VIEWS))))
+    return sorted(bands)
+
+# Confidence bands that get TTA, as "upper bound %:views" pairs; empty turns TTA off.
+# Bands can reuse the page's 60%/80% marks, e.g. RICE_TTA_BANDS=60:8,80:4
+TTA_BANDS = parse_bands(os.environ.get("RICE_TTA_BANDS", ""))
+
+def _view_coordinates(size=IMG_SIZE, crop_fraction=CROP_FRACTION):
+    """Source (row, col) index arrays of shape (len(VIEWS), H, W) for every view"""
+    width, height = size
+    if width != height:
+        raise ValueError("Rotated views need a square model input")
+    last = height - 1
+    rows, cols = np.mgrid[0:height, 0:width]
+    offset = (1 - crop_fraction) * last / 2
+    crop_rows = np.round(offset + rows * crop_fraction).astype(rows.dtype)
+    crop_cols = np.round(offset + cols * crop_fraction).astype(cols.dtype)
+    mappings = {
+        "identity": (rows, cols),
+        "hflip": (rows, last - cols),
+        "vflip": (last - rows, cols),
+        "crop": (crop_rows, crop_cols),
+        "rot180": (last - rows, last - cols),
+        "rot90": (cols, last - rows),
+        "rot270": (last - cols, rows),
+        "crop_hflip": (crop_rows, last - crop_cols),
+    }
+    return (np.stack([mappings[view][0] for view in VIEWS]),
+            np.stack([mappings[view][1] for view in VIEWS]))
+
+_ROWS, _COLS = _view_coordinates()
+
+def augmented_views(batch, num_views):
+    """All views of a uint8 (N, H, W, 3) batch as one (N, num_views, H, W, 3) array, in one gather"""
+    return batch[:, _ROWS[:num_views], _COLS[:num_views]]
+
+def views_for(confidence, bands=TTA_BANDS):
+    """Views used for a prediction of this confidence (%); 1 means no TTA"""
+    for upper, views in bands:
+        if confidence < upper:
+            return views
+    return 1
+
+def refine(predict_fn, batch, probabilities, bands=TTA_BANDS, batch_size=BATCH_SIZE):
+    """Average in extra views for the rows of probabilities whose confidence falls in a TTA band.
+
+    The plain prediction counts as the identity view, so only the extra
+    views of the unsure images are run, all in one forward pass.
+    """
+    probabilities = np.array(probabilities, copy=True)
+    views = np.array([views_for(confidence, bands) for confidence in probabilities.max(axis=1) * 100])
+    groups = [(count, np.flatnonzero(views == count)) for count in np.unique(views[views > 1])]
+    if not groups:
+        return probabilities
+    with stage_timer("tta"):
+        extra = np.concatenate([augmented_views(batch[rows], count)[:, 1:].reshape((-1,) + batch.shape[1:])
+                                for count, rows in groups])
+        extra_probabilities = run_batches(predict_fn, extra, batch_size)
+    start = 0
+    for count, rows in groups:
+        end = start + len(rows) * (count - 1)
+        per_view = extra_probabilities[start:end].reshape(len(rows), count - 1, -1)
+        probabilities[rows] = (probabilities[rows] + per_view.sum(axis=1)) / count
+        start = end
+    TTA_VIEWS.inc(len(extra))
+    return probabilities
+
+def with_tta(predict_fn, bands=TTA_BANDS, batch_size=BATCH_SIZE):
+    """predict_fn that refines its unsure rows with TTA; predict_fn itself when no bands are set"""
+    if not bands:
+        return predict_fn
+
+    def predict_with_tta(batch):
+        return refine(predict_fn, batch, predict_fn(batch), bands, batch_size)
+
+    return predict_with_tta
+
+def tta_version(version, bands=TTA_BANDS):
+    """Model version for cache keys, so predictions with and without TTA aren't mixed"""
+    if not bands:
+        return version
+    return version + "+tta" + ",".join(f"{upper:g}:{views}" for upper, views in bands)
@@ -0,0 +1,191 @@
+"""Disease timeline for field walk-through videos and timelapses.
+
+Frames are decoded with OpenCV as a stream, so memory does not grow with
+clip length. Frames are sampled at a fixed rate; frames between samples
+are skipped with grab() and never decoded. A sampled frame that barely
+differs from the last analysed one (mean absolute difference of small
+grayscale thumbnails) reuses that frame's prediction. The remaining frames
+go through the model in batches. The result is one row per fixed-length
+segment of the clip.
+
+Usage:
+    python video_analysis.py walkthrough.mp4 --sample-fps 2 --segment-seconds 5 --report timeline.json
+"""
+import argparse
+import json
+import os
+import resource
+import time
+
+import numpy as np
+
+from inference import BACKEND, IMG_SIZE, load_backend
+from metrics import stage_timer
+
+VIDEO_TYPES = ['mp4', 'mov', 'avi', 'mkv', 'webm']
+# Frames analysed per second of video
+SAMPLE_FPS = float(os.environ.get("RICE_VIDEO_SAMPLE_FPS", "2"))
+# Sampled frames whose thumbnail differs from the last analysed frame by less than this
+# (mean absolute difference, 0-255) reuse its prediction; 0 analyses every sampled frame
+DIFF_THRESHOLD = float(os.environ.get("RICE_VIDEO_DIFF_THRESHOLD", "3"))
+SEGMENT_SECONDS = float(os.environ.get("RICE_VIDEO_SEGMENT_SECONDS", "5"))
+VIDEO_BATCH_SIZE = int(os.environ.get("RICE_VIDEO_BATCH_SIZE", "16"))
+THUMBNAIL_SIZE = (32, 32)
+
+def sample_frames(path, sample_fps=SAMPLE_FPS, stats=None):
+    """Yield (timestamp_seconds, RGB frame) at about sample_fps, decoding only the sampled frames"""
+    import cv2
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video {path}")
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    step = max(1, round(fps / sample_fps)) if sample_fps > 0 else 1
+    if stats is not None:
+        stats["video_fps"] = fps
+    index = 0
+    try:
+        while capture.grab():
+            if index % step == 0:
+                ok, frame = capture.retrieve()
+                if not ok:
+                    break
+                if stats is not None:
+                    stats["sampled"] = stats.get("sampled", 0) + 1
+                yield index / fps, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            index += 1
+    finally:
+        if stats is not None:
+            stats["frames"] = index
+            stats["duration_seconds"] = index / fps
+        capture.release()
+
+def thumbnail(frame):
+    import cv2
+    gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+    return cv2.resize(gray, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+def predict_frames(predict_fn, frames, diff_threshold=DIFF_THRESHOLD, batch_size=VIDEO_BATCH_SIZE, stats=None):
+    """Yield (timestamp, probabilities, analysed) for each sampled frame, batching the frames that changed.
+
+    Near-duplicate frames get the probabilities of the last analysed frame
+    and analysed=False.
+    """
+    import cv2
+    batch = np.empty((batch_size, IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.uint8)
+    # (timestamp, index of the batch slot whose prediction the frame uses)
+    pending = []
+    last_thumbnail = None
+    last_probabilities = None
+    filled = 0
+
+    def flush():
+        nonlocal last_probabilities, filled
+        with stage_timer("inference"):
+            probabilities = predict_fn(batch[:filled]) if filled else None
+        for timestamp, slot in pending:
+            if slot is None:
+                yield timestamp, last_probabilities, False
+            else:
+                last_probabilities = probabilities[slot]
+                yield timestamp, last_probabilities, True
+        pending.clear()
+        filled = 0
+
+    for timestamp, frame in frames:
+        with stage_timer("preprocess"):
+            small = thumbnail(frame)
+            duplicate = (last_thumbnail is not None and diff_threshold > 0
+                         and np.abs(small - last_thumbnail).mean() < diff_threshold)
+            if not duplicate:
+                last_thumbnail = small
+                cv2.resize(frame, IMG_SIZE, dst=batch[filled], interpolation=cv2.INTER_AREA)
+        if duplicate:
+            pending.append((timestamp, None))
+            if stats is not None:
+                stats["duplicates"] = stats.get("duplicates", 0) + 1
+            continue
+        pending.append((timestamp, filled))
+        filled += 1
+        if filled == batch_size:
+            yield from flush()
+    yield from flush()
+
+def segment_timeline(predictions, class_names, segment_seconds=SEGMENT_SECONDS):
+    """Average the frame probabilities of each segment into (start, end, top class, confidence, ...) rows"""
+    segments = {}
+    for timestamp, probabilities, analysed in predictions:
+        segment = segments.setdefault(int(timestamp // segment_seconds), {"sum": 0.0, "frames": 0, "analysed": 0})
+        segment["sum"] = segment["sum"] + probabilities
+        segment["frames"] += 1
+        segment["analysed"] += int(analysed)
+    timeline = []
+    for number in sorted(segments):
+        segment = segments[number]
+        mean = segment["sum"] / segment["frames"]
+        top = int(np.argmax(mean))
+        timeline.append({
+            "start": number * segment_seconds,
+            "end": (number + 1) * segment_seconds,
+            "predicted_class": class_names[top],
+            "confidence": float(mean[top] * 100),
+            "frames": segment["frames"],
+            "analysed": segment["analysed"],
+            "probabilities": {name: float(p * 100) for name, p in zip(class_names, mean)},
+        })
+    return timeline
+
+def analyze_video(predict_fn, path, class_names, sample_fps=SAMPLE_FPS, diff_threshold=DIFF_THRESHOLD,
+                  segment_seconds=SEGMENT_SECONDS, batch_size=VIDEO_BATCH_SIZE):
+    """Timeline and throughput stats for one video file"""
+    stats = {}
+    start = time.perf_counter()
+    frames = sample_frames(path, sample_fps, stats)
+    timeline = segment_timeline(predict_frames(predict_fn, frames, diff_threshold, batch_size, stats),
+                                class_names, segment_seconds)
+    elapsed = time.perf_counter() - start
+    sampled = stats.get("sampled", 0)
+    # Every key is set even when no frame could be read, so callers can always report them
+    stats.update({
+        "frames": stats.get("frames", 0),
+        "duration_seconds": stats.get("duration_seconds", 0.0),
+        "sampled": sampled,
+        "duplicates": stats.get("duplicates", 0),
+        "analysed": sampled - stats.get("duplicates", 0),
+        "elapsed_seconds": elapsed,
+        # Frames of video gone through per second of wall time: decoding, skipping and inference together
+        "throughput_fps": stats.get("frames", 0) / elapsed if elapsed else 0.0,
+        "realtime_factor": stats.get("duration_seconds", 0) / elapsed if elapsed else 0.0,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    })
+    return timeline, stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("video")
+    parser.add_argument("--backend", default=BACKEND)
+    parser.add_argument("--sample-fps", type=float, default=SAMPLE_FPS)
+    parser.add_argument("--diff-threshold", type=float, default=DIFF_THRESHOLD)
+    parser.add_argument("--segment-seconds", type=float, default=SEGMENT_SECONDS)
+    parser.add_argument("--batch-size", type=int, default=VIDEO_BATCH_SIZE)
+    parser.add_argument("--report", help="write the timeline and stats as JSON")
+    args = parser.parse_args()
+
+    with open('class_names.json', 'r') as f:
+        class_names = json.load(f)
+    _, predict_fn = load_backend(args.backend)
+    timeline, stats = analyze_video(predict_fn, args.video, class_names, args.sample_fps, args.diff_threshold,
+                                    args.segment_seconds, args.batch_size)
+
+    for segment in timeline:
+        print(f"{segment['start']:>7.1f}-{segment['end']:<7.1f}s {segment['predicted_class']:<20}"
+              f"{segment['confidence']:>6.1f}%  ({segment['analysed']}/{segment['frames']} frames analysed)")
+    print(f"\n{stats['frames']} frames ({stats['duration_seconds']:.0f}s of video), {stats['sampled']} sampled, "
+          f"{stats['duplicates']} near-duplicates skipped, {stats['analysed']} analysed in {stats['elapsed_seconds']:.1f}s: "
+          f"{stats['throughput_fps']:.0f} video frames/s end to end, {stats['realtime_factor']:.1f}x realtime, "
+          f"peak RSS {stats['peak_rss_mb']:.0f} MB")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump({"timeline": timeline, "stats": stats}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from inference import BACKEND, IMG_SIZE
+from metrics import WORKER_RESTARTS
+
+# Worker-pool mode: number of inference processes (0 keeps the single in-process model)
+WORKERS = int(os.environ.get("RICE_WORKERS", "0"))
+# Threads per worker; by default each worker gets as many intra-op threads as pinned cores
+INTRA_OP_THREADS = int(os.environ.get("RICE_INTRA_OP_THREADS", "0"))
+INTER_OP_THREADS = int(os.environ.get("RICE_INTER_OP_THREADS", "1"))
+WORKER_BATCH_SIZE = int(os.environ.get("RICE_WORKER_BATCH_SIZE", "16"))
+# Longest wait for a worker's answer before predict() gives up
+WORKER_TIMEOUT = float(os.environ.get("RICE_WORKER_TIMEOUT", "120"))
+# Times each worker is restarted after dying (crash, OOM kill) before it is left down
+WORKER_MAX_RESTARTS = int(os.environ.get("RICE_WORKER_MAX_RESTARTS", "3"))
+# How often the result collector checks that the worker processes are alive
+LIVENESS_INTERVAL = 1.0
+
+def core_slices(num_workers, cores=None):
+    """Split the available cores into num_workers contiguous, non-overlapping slices"""
+    cores = sorted(cores if cores is not None else os.sched_getaffinity(0))
+    num_workers = max(1, min(num_workers, len(cores)))
+    per_worker, extra = divmod(len(cores), num_workers)
+    slices, start = [], 0
+    for i in range(num_workers):
+        end = start + per_worker + (1 if i < extra else 0)
+        slices.append(cores[start:end])
+        start = end
+    return slices
+
+def configure_threads(intra_op_threads, inter_op_threads):
+    """Set TensorFlow's thread pools; must run before any op executes in the process"""
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+
+def _worker_main(worker_id, cores, backend, model_path, intra_op_threads, inter_op_threads, max_batch_size,
+                 shm_name, num_slots, num_classes, requests, results):
+    os.sched_setaffinity(0, cores)
+    intra_op_threads = intra_op_threads or len(cores)
+    os.environ["RICE_TFLITE_THREADS"] = str(intra_op_threads)
+    configure_threads(intra_op_threads, inter_op_threads)
+
+    from inference import load_backend
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    inputs, outputs = _slot_views(shm, num_slots, num_classes)
+    try:
+        _, predict_fn = load_backend(backend, model_path)
+    except Exception as e:
+        results.put(("failed", worker_id, repr(e)))
+        shm.close()
+        return
+    results.put(("ready", worker_id, None))
+
+    while True:
+        slot = requests.get()
+        if slot is None:
+            break
+        slots = [slot]
+        stop = False
+        while len(slots) < max_batch_size:
+            try:
+                slot = requests.get_nowait()
+            except queue.Empty:
+                break
+            if slot is None:
+                stop = True
+                break
+            slots.append(slot)
+        try:
+            outputs[slots] = predict_fn(inputs[slots])
+            for slot in slots:
+                results.put(("done", slot, None))
+        except Exception as e:
+            for slot in slots:
+                results.put(("error", slot, repr(e)))
+        if stop:
+            break
+
+    del inputs, outputs
+    shm.close()
+
+def _slot_views(shm, num_slots, num_classes):
+    input_shape = (num_slots, IMG_SIZE[1], IMG_SIZE[0], 3)
+    input_bytes = int(np.prod(input_shape))
+    inputs = np.ndarray(input_shape, dtype=np.uint8, buffer=shm.buf[:input_bytes])
+    outputs = np.ndarray((num_slots, num_classes), dtype=np.float32, buffer=shm.buf[input_bytes:])
+    return inputs, outputs
+
+class WorkerPool:
+    """N inference processes, each pinned to its own slice of cores, with a request queue each.
+
+    Preprocessed uint8 images are written into slots of a shared-memory block
+    and only slot numbers travel through the queues, so image data is never
+    pickled. Each image goes to the worker with the fewest images in flight,
+    and each worker drains up to max_batch_size waiting slots per forward
+    pass. predict() has the same contract as a predict_fn, so a pool can be
+    used anywhere a model is.
+
+    A worker that dies fails the images sent to it and is restarted up to
+    max_restarts times; after that it stays down and healthy turns False.
+    A request that times out gives up its slots, which go back to the pool
+    once the worker answers for them or dies, never while it may still
+    write into them.
+    Each worker has its own queue because a process killed while waiting on
+    a shared one would leave its lock held for all the others.
+    """
+
+    def __init__(self, num_workers, num_classes, backend=BACKEND, intra_op_threads=INTRA_OP_THREADS,
+                 inter_op_threads=INTER_OP_THREADS, max_batch_size=WORKER_BATCH_SIZE, num_slots=None,
+                 start_timeout=300, model_path=None, result_timeout=WORKER_TIMEOUT, max_restarts=WORKER_MAX_RESTARTS):
+        slices = core_slices(num_workers)
+        self.num_workers = len(slices)
+        self.num_classes = num_classes
+        self.result_timeout = result_timeout
+        self.max_restarts = max_restarts
+        self.restarts = 0
+        num_slots = num_slots or self.num_workers * max_batch_size * 2
+        input_bytes = num_slots * IMG_SIZE[0] * IMG_SIZE[1] * 3
+        self._shm = shared_memory.SharedMemory(create=True, size=input_bytes + num_slots * num_classes * 4)
+        self._inputs, self._outputs = _slot_views(self._shm, num_slots, num_classes)
+        self._free_slots = queue.Queue()
+        for slot in range(num_slots):
+            self._free_slots.put(slot)
+        self._futures = {}
+        # Slots of timed-out requests, freed once their worker answers or dies
+        self._abandoned = set()
+        self._lock = threading.Lock()
+        self._stopping = False
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._results = self._ctx.Queue()
+        self._slices = slices
+        self._worker_options = (backend, model_path, intra_op_threads, inter_op_threads, max_batch_size,
+                                self._shm.name, num_slots, num_classes)
+        # Per worker: process, request queue, "starting", "ready" or "down", restarts, and slots sent to it
+        self._processes = [None] * self.num_workers
+        self._requests = [None] * self.num_workers
+        self._states = ["starting"] * self.num_workers
+        self._restarts = [0] * self.num_workers
+        self._in_flight = [set() for _ in range(self.num_workers)]
+        for worker_id in range(self.num_workers):
+            self._requests[worker_id] = self._ctx.Queue()
+            self._start_worker(worker_id)
+        try:
+            self._wait_ready(start_timeout)
+        except Exception:
+            self.stop()
+            raise
+        self._collector = threading.Thread(target=self._collect, name="worker-pool-results", daemon=True)
+        self._collector.start()
+
+    def _start_worker(self, worker_id):
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self._slices[worker_id], *self._worker_options, self._requests[worker_id], self._results),
+            daemon=True,
+        )
+        process.start()
+        self._processes[worker_id] = process
+
+    def _wait_ready(self, timeout):
+        for _ in self._processes:
+            status, worker_id, error = self._results.get(timeout=timeout)
+            if status == "failed":
+                raise RuntimeError(f"Inference worker {worker_id} failed to load the model: {error}")
+            self._states[worker_id] = "ready"
+
+    @property
+    def healthy(self):
+        """False once a worker is down for good; a worker being restarted still counts"""
+        return "down" not in self._states
+
+    def health(self):
+        return {
+            "healthy": self.healthy,
+            "workers": self.num_workers,
+            "ready": self._states.count("ready"),
+            "down": self._states.count("down"),
+            "restarts": self.restarts,
+        }
+
+    def submit(self, image):
+        """Queue one (H, W, 3) uint8 image and return a Future for its probabilities"""
+        try:
+            slot = self._free_slots.get(timeout=self.result_timeout)
+        except queue.Empty:
+            raise TimeoutError("No free slot: every image sent to the inference workers is still in flight")
+        self._inputs[slot] = image
+        future = Future()
+        with self._lock:
+            workers = [i for i, state in enumerate(self._states) if state != "down"]
+            if not workers:
+                self._free_slots.put(slot)
+                raise RuntimeError("Every inference worker is down")
+            # Ready workers first, then the one with the fewest images in flight
+            worker_id = min(workers, key=lambda i: (self._states[i] != "ready", len(self._in_flight[i])))
+            self._futures[slot] = future
+            self._in_flight[worker_id].add(slot)
+            self._requests[worker_id].put(slot)
+        return future
+
+    def predict(self, batch):
+        futures = [self.submit(image) for image in batch]
+        try:
+            return np.stack([future.result(self.result_timeout) for future in futures])
+        except TimeoutError:
+            self._abandon(futures)
+            raise
+
+    def _abandon(self, futures):
+        """Drop the futures of a timed-out request; their slots are freed once the worker is done with them"""
+        with self._lock:
+            for slot, future in list(self._futures.items()):
+                if any(future is abandoned for abandoned in futures):
+                    del self._futures[slot]
+                    self._abandoned.add(slot)
+        for future in futures:
+            future.cancel()
+
+    def _collect(self):
+        next_check = time.monotonic() + LIVENESS_INTERVAL
+        while True:
+            try:
+                message = self._results.get(timeout=LIVENESS_INTERVAL)
+            except queue.Empty:
+                message = ()
+            if message is None:
+                break
+            if message:
+                self._handle(message)
+            if time.monotonic() >= next_check:
+                self._check_workers()
+                next_check = time.monotonic() + LIVENESS_INTERVAL
+
+    def _handle(self, message):
+        status, key, detail = message
+        if status == "ready":
+            self._states[key] = "ready"
+        elif status == "failed":
+            print(f"Inference worker {key} failed to load the model after a restart: {detail}")
+            self._mark_down(key, RuntimeError(f"Inference worker {key} failed to load the model: {detail}"))
+        elif status == "done":
+            self._finish(key, result=self._outputs[key].copy())
+        else:
+            self._finish(key, error=RuntimeError(f"Inference worker error: {detail}"))
+
+    def _finish(self, slot, result=None, error=None):
+        with self._lock:
+            future = self._futures.pop(slot, None)
+            abandoned = slot in self._abandoned
+            self._abandoned.discard(slot)
+            for in_flight in self._in_flight:
+                in_flight.discard(slot)
+        if future is None:
+            if abandoned:
+                self._free_slots.put(slot)
+            return
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+        self._free_slots.put(slot)
+
+    def _check_workers(self):
+        """Fail the images of workers that died, then restart them or leave them down"""
+        if self._stopping:
+            return
+        dead = [i for i, process in enumerate(self._processes)
+                if self._states[i] != "down" and not process.is_alive()]
+        if not dead:
+            return
+        # Answers a worker sent just before dying are already in the result queue; take those first
+        while True:
+            try:
+                message = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if message is None:
+                self._results.put(None)
+                break
+            self._handle(message)
+        for worker_id in dead:
+            if self._states[worker_id] == "down":
+                continue
+            error = RuntimeError(f"Inference worker {worker_id} died (exit code {self._processes[worker_id].exitcode})")
+            if self._restarts[worker_id] < self.max_restarts:
+                print(f"{error}; restarting it")
+                self._restarts[worker_id] += 1
+                self.restarts += 1
+                WORKER_RESTARTS.inc()
+                # The queue is swapped under the lock, so every slot sent to the dead process is failed and none
+                # after; a fresh one because the old one may hold slots nobody will answer, or a lock nobody will
+                # release. The process is spawned outside the lock, so submit() doesn't wait for it.
+                with self._lock:
+                    slots = list(self._in_flight[worker_id])
+                    self._requests[worker_id] = self._ctx.Queue()
+                    self._states[worker_id] = "starting"
+                self._start_worker(worker_id)
+                for slot in slots:
+                    self._finish(slot, error=error)
+            else:
+                print(f"{error}; restarted {self.max_restarts} times already, leaving it down")
+                self._mark_down(worker_id, error)
+
+    def _mark_down(self, worker_id, error):
+        with self._lock:
+            self._states[worker_id] = "down"
+            slots = list(self._in_flight[worker_id])
+        for slot in slots:
+            self._finish(slot, error=error)
+
+    def stop(self):
+        self._stopping = True
+        for worker_id, requests in enumerate(self._requests):
+            if self._states[worker_id] != "down":
+                requests.put(None)
+        for process in self._processes:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+        if getattr(self, "_collector", None) is not None:
+            self._results.put(None)
+            self._collector.join()
+        del self._inputs, self._outputs
+        self._shm.close()
+        self._shm.unlink()